@@ -0,0 +1,154 @@
+"""
+Command line entry point.
+
+    python -m framework [--root DIR ...] build [--jobs N] [--dry-run] [--release]
+    python -m framework [--root DIR] watch [--jobs N] [--poll] [--interval SECONDS]
+    python -m framework [--root DIR] serve [--socket PATH] [--max-builds N]
+    python -m framework [--root DIR] submit MOD_ROOT [MOD_ROOT ...] [--socket PATH] [--jobs N] [--release]
+    python -m framework [--root DIR] submit --stats | --shutdown [--socket PATH]
+
+Every `--root` is a mod project directory (holding mod-config.yml and mod/), the working directory by default.
+Several roots are built in parallel, each in its own BuildContext. `serve` keeps a build daemon resident on a
+Unix socket (by default under the root's mod/build/), `submit` sends it builds of other mod roots.
+"""
+import argparse
+import json
+import sys
+
+import framework.context as context
+import framework.conf.mod_config as mod_config
+import framework.phase_logger as phase_logger
+import framework.profiler as profiler
+
+
+def _apply_overrides(args: argparse.Namespace) -> None:
+    _config = mod_config.ModConfigLoader()
+    if args.jobs is not None:
+        _config.config_dict["build"]["jobs"] = args.jobs
+    if getattr(args, "release", False):
+        _config.config_dict["build"]["release"] = True
+
+
+def dry_run() -> None:
+    import framework.asset.asset_load as asset_load
+    import framework.asset.asset_on_load as asset_on_load
+    import framework.asset.build.planner as planner
+    import framework.asset.manager.manager as manager
+
+    _manager = manager.AssetManager()
+    _loader = asset_load.AssetLoader()
+    for parsed_asset in asset_on_load.AssetParser().parsed:
+        _manager.register_asset(parsed_asset.asset.nickname, parsed_asset, "load")
+    for line in planner.BuildPlanner(_loader.conf["load"], _loader.conf["build"], _loader.compiled).dry_run():
+        print(line)
+
+
+def build(args: argparse.Namespace) -> None:
+    from concurrent.futures import ThreadPoolExecutor
+
+    if len(args.root) == 1:
+        with context.BuildContext(args.root[0]):
+            build_one(args)
+        return
+    with ThreadPoolExecutor(max_workers=len(args.root)) as _threads:
+        _futures = [_threads.submit(_build_in_context, root, args) for root in args.root]
+    for future in _futures:
+        future.result()
+
+
+def _build_in_context(root: str, args: argparse.Namespace) -> None:
+    with context.BuildContext(root):
+        build_one(args)
+
+
+def build_one(args: argparse.Namespace) -> None:
+    import framework.asset.asset
+
+    _apply_overrides(args)
+    if args.dry_run:
+        dry_run()
+        return
+    _inst = framework.asset.asset.Assets()
+    _inst.dispose()
+
+    _inst.load.logger.output()
+    phase_logger.AssetModifyPhaseLogger().output()
+    _inst.manager.logger.output()
+    _inst.build.logger.output()
+    profiler.BuildProfiler().output()
+
+
+def watch(args: argparse.Namespace) -> None:
+    import framework.asset.watch.watcher as watcher
+
+    if len(args.root) > 1:
+        raise SystemExit("watch takes a single --root.")
+    with context.BuildContext(args.root[0]):
+        _apply_overrides(args)
+        watcher.AssetWatcher(poll=args.poll, interval=args.interval).run_forever()
+
+
+def serve(args: argparse.Namespace) -> None:
+    import framework.daemon.server as server
+
+    with context.BuildContext(args.root[0]):
+        server.BuildDaemon(args.socket, args.max_builds).run_forever()
+
+
+def submit(args: argparse.Namespace) -> None:
+    import framework.daemon.client as client
+    import framework.daemon.server as server
+
+    _socket = args.socket or context.BuildContext(args.root[0]).path(server.DEFAULT_SOCKET_PATH)
+    if args.stats or args.shutdown:
+        _reports = [client.request(_socket, {"command": "stats" if args.stats else "shutdown"})]
+    else:
+        _reports = client.submit(_socket, args.mod_roots, args.jobs, args.release)
+    for report in _reports:
+        print(json.dumps(report, indent=1))
+    if not all(report["ok"] for report in _reports):
+        sys.exit(1)
+
+
+def main() -> None:
+    _parser = argparse.ArgumentParser(prog="python -m framework", description=__doc__,
+                                      formatter_class=argparse.RawDescriptionHelpFormatter)
+    _parser.add_argument("--root", action="append", metavar="DIR",
+                         help="mod project directory, may be given several times to build mods in parallel")
+    _commands = _parser.add_subparsers(dest="command", required=True)
+
+    _build = _commands.add_parser("build", help="build every asset target once")
+    _build.add_argument("--jobs", type=int, help="worker processes, overrides build.jobs")
+    _build.add_argument("--dry-run", action="store_true",
+                        help="print the build plan and what would be rebuilt, without building")
+    _build.add_argument("--release", action="store_true",
+                        help="release build, writes outputs with the build.encoding.release settings")
+    _build.set_defaults(func=build)
+
+    _watch = _commands.add_parser("watch", help="rebuild affected targets whenever sources or config change")
+    _watch.add_argument("--jobs", type=int, help="worker processes, overrides build.jobs")
+    _watch.add_argument("--poll", action="store_true", help="poll for changes instead of using inotify")
+    _watch.add_argument("--interval", type=float, default=0.25, help="polling interval in seconds")
+    _watch.set_defaults(func=watch)
+
+    _serve = _commands.add_parser("serve", help="run a resident build daemon that keeps caches warm across builds")
+    _serve.add_argument("--socket", help="unix socket to listen on")
+    _serve.add_argument("--max-builds", type=int, help="builds run at once, all cores by default")
+    _serve.set_defaults(func=serve)
+
+    _submit = _commands.add_parser("submit", help="build mod roots on a running build daemon")
+    _submit.add_argument("mod_roots", nargs="*", metavar="MOD_ROOT", help="mod project directories to build")
+    _submit.add_argument("--socket", help="unix socket of the daemon")
+    _submit.add_argument("--jobs", type=int, help="worker processes per build, overrides build.jobs")
+    _submit.add_argument("--release", action="store_true", help="release builds, see build --release")
+    _submit.add_argument("--stats", action="store_true", help="print the daemon's build count and cache hits")
+    _submit.add_argument("--shutdown", action="store_true", help="stop the daemon")
+    _submit.set_defaults(func=submit)
+
+    _args = _parser.parse_args()
+    _args.root = _args.root or [""]
+    _args.func(_args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,57 @@
+import time
+
 import framework.asset.asset_load as loader
 import framework.asset.asset_load
 import framework.asset.asset_on_load
 import framework.asset.asset_build
+import framework.asset.on_load.memo
 import framework.asset.build.build_meta_classes
 import framework.asset.manager.manager
 import framework.conf.mod_config
+import framework.profiler
+import framework.packaging.packager
+import framework.asset.atlas.atlas
 
 
 class Assets:
     load_table: dict = None
+    timings: dict[str, float] = None
 
     def __init__(self):
+        self.timings = {}
+        _start = time.perf_counter()
         self.manager = framework.asset.manager.manager.AssetManager()
 
         self.config = framework.conf.mod_config.ModConfigLoader()
 
-        self.load = framework.asset.asset_load.AssetLoader()
-        self.triggers = framework.asset.asset_on_load.AssetParser()
-
-        for parsed_asset in self.triggers.parsed:
-            self.manager.register_asset(parsed_asset.asset.nickname, parsed_asset, "load")
-
-        self.build = framework.asset.asset_build.AssetBuilder()
+        _memo = framework.asset.on_load.memo.TransformMemo()
+        _used_from = _memo.begin()
+        _built = False
+        try:
+            self.load = framework.asset.asset_load.AssetLoader()
+            self.triggers = framework.asset.asset_on_load.AssetParser()
+
+            for parsed_asset in self.triggers.parsed:
+                self.manager.register_asset(parsed_asset.asset.nickname, parsed_asset, "load")
+            _start = self._phase("load", _start)
+
+            self.build = framework.asset.asset_build.AssetBuilder()
+            _built = True
+        finally:
+            _memo.end(_used_from, prune=_built)
+        _start = self._phase("build", _start)
+        self.atlas = framework.asset.atlas.atlas.AtlasBuilder()
+        _start = self._phase("atlas", _start)
+
+        self.package = framework.packaging.packager.ModPackager()
+        self._phase("package", _start)
+
+    def _phase(self, name: str, start: float) -> float:
+        _now = time.perf_counter()
+        self.timings[name] = _now - start
+        return _now
 
     def dispose(self) -> None:
+        self.triggers.log_stats()
         self.load.dispose()
+        framework.profiler.BuildProfiler().write_report()
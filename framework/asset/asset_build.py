@@ -1,15 +1,83 @@
 from __future__ import annotations
-from PIL import Image
 
 import os
 
 import framework.phase_logger as logger
+import framework.context as context
 import framework.asset.asset_load as loader
 import framework.asset.asset_on_load as on_load
 import framework.asset.build.build_meta_classes as build_meta
 import framework.asset.build.jobs as jobs
 import framework.asset.build.build_helpers as helpers
+import framework.asset.build.cache as cache
+import framework.asset.build.scheduler as scheduler
+import framework.asset.build.planner as planner
+import framework.asset.load.compiler as compiler
+import framework.asset.build.mipmaps as mipmaps
+import framework.asset.build.encoding as encoding
+import framework.conf.mod_config as mod_config
+import framework.asset.backend.backends as backends
+import framework.asset.backend.raw_store as raw_store
+import framework.asset.on_load.memo as memo
+import framework.profiler as profiler
 import framework.asset.manager.manager as manager
+import framework.lazy as lazy
+
+Image = lazy.lazy_import("PIL.Image")
+
+
+class BuiltAssetOutput:
+    """
+    One saved job output, registered in the AssetManager as `build.<name>` so that later build targets can `use`
+    it, composite with it or mask by it exactly like a loaded asset. The image is handed over in memory by a job
+    run in this process, otherwise it is read back from its largest output file (the first level of it, when
+    that file is a mipmap strip) on first use.
+
+    ## Instance Methods:
+        * self.hand_over()
+        * self.release()
+        * self.fingerprint()
+
+    ## Instance Vars:
+        * self.nickname
+        * self.output_path
+        * self.paths
+        * self.modified_image
+    """
+    def __init__(self, nickname: str, paths: list[str], fingerprint: str, mipmap_levels: int = 1) -> None:
+        """
+        :param paths: every file the output is written as, the full scale one first.
+        """
+        self.nickname = nickname
+        self.paths = paths
+        self.output_path = paths[0]
+        self.mipmap_levels = mipmap_levels
+        self._fingerprint = fingerprint
+        self._modified_image: Image | None = None
+
+    @property
+    def modified_image(self) -> Image:
+        if self._modified_image is None:
+            with profiler.BuildProfiler().stage(f"build.{self.nickname}", "load"):
+                self._modified_image = Image.open(self.output_path)
+                # force the decode now so PIL closes the underlying file handle
+                self._modified_image.load()
+                if self.mipmap_levels > 1:
+                    _width = mipmaps.strip_level_width(self._modified_image.size[0], self.mipmap_levels)
+                    self._modified_image = self._modified_image.crop((0, 0, _width, self._modified_image.size[1]))
+        return self._modified_image
+
+    def hand_over(self, image: Image) -> None:
+        self._modified_image = image
+
+    def release(self) -> None:
+        self._modified_image = None
+
+    def fingerprint(self) -> str:
+        """
+        The fingerprint of the job that produced this output, so consumers are invalidated along with it.
+        """
+        return self._fingerprint
 
 
 class BuildAsset:
@@ -21,69 +89,217 @@ class BuildAsset:
         def __init__(self, *args) -> None:
             super().__init__(*args)
 
-    def __init__(self, yaml_dict: dict) -> None:
-        self.build_reference = list(yaml_dict.keys())[0]
-        self.output_type = yaml_dict[self.build_reference]["outputs"]["filetype"]
-        self.output_dir = helpers.BUILT_ASSETS_PATH + yaml_dict[self.build_reference]["outputs"]["dir"]
+    def __init__(self, entry: compiler.BuildEntry, plan: planner.BuildPlanner | None = None) -> None:
+        """
+        :param entry: the target's compiled entry of the `build` table.
+        :param plan: the build's plan, used to find layer stacks this target shares with others.
+        """
+        self.build_reference = entry.reference
+        self.output_type = entry.output_type
+        # optional: write each output at several scales of the composite, and/or as a Factorio mipmap strip
+        self.resolutions: dict | None = entry.resolutions
+        self.mipmaps: int = entry.mipmaps
+        self.encoding = encoding.OutputEncoding.resolve(entry.encoding)
+        self.output_dir = context.path(helpers.BUILT_ASSETS_PATH + entry.output_dir)
 
         self.logger = logger.AssetOutputPhaseLogger()
         self.manager = manager.AssetManager()
+        self.cache = cache.BuildCache()
+        self.backend = backends.get_backend()
+        self.profiler = profiler.BuildProfiler()
 
-        if not os.path.exists(self.output_dir):
-            os.makedirs(self.output_dir, exist_ok=True)
+        self.naming_scheme: helpers.BuiltAssetNamer = helpers.BuiltAssetNamer(entry.output_name)
 
-        self.naming_scheme: helpers.BuiltAssetNamer = \
-            helpers.BuiltAssetNamer(yaml_dict[self.build_reference]["outputs"]["name"])
-
-        _use_asset: str = yaml_dict[self.build_reference]["use"].strip()
-        self.base_asset: on_load.ParseAsset = self.manager.get(_use_asset)
+        self.base_asset: on_load.ParseAsset = self.manager.get(entry.use)
 
         self.jobs: list[tuple[str, jobs.AbstractAssetTask]] = []
-        for idx, job in enumerate(yaml_dict[self.build_reference]["jobs"]):
+        for idx, job in enumerate(entry.jobs):
             _self_ref = (idx, self.build_reference)
-            if list(job.keys())[0] == "composite-with":
-                _compositor = jobs.AssetCompositor(_self_ref, job["composite-with"])
+            if job.kind == "composite-with":
+                _compositor = jobs.AssetCompositor(_self_ref, job.spec)
+                _job_name = self.naming_scheme.perform_substitution(_self_ref)
+                self.jobs.append((_job_name, _compositor))
+            elif job.kind == "composite-layers":
+                _shared = plan.shared_prefixes(self.build_reference, idx) if plan is not None else None
+                _compositor = jobs.LayeredCompositor(_self_ref, job.spec, _shared)
                 _job_name = self.naming_scheme.perform_substitution(_self_ref)
                 self.jobs.append((_job_name, _compositor))
 
+        self.pending: list[tuple[str, jobs.AbstractAssetTask, str, str]] = []
+        self.skipped: list[str] = []
+        self.outputs: dict[str, BuiltAssetOutput] = {}
         for name, job in self.jobs:
-            _composited_image = self.job_runner(name, job)
-            _composited_image.save(os.path.join(self.output_dir, name) + ".png", self.output_type)
+            _output_path = os.path.join(self.output_dir, name) + ".png"
+            _spec = {"use": self.base_asset.fingerprint(), "job": job.spec()}
+            if self.resolutions or self.mipmaps > 1:
+                _spec["outputs"] = {"resolutions": self.resolutions, "mipmaps": self.mipmaps}
+            if not self.encoding.default:
+                _spec["encoding"] = self.encoding.canonical()
+            _fingerprint = self.cache.job_fingerprint(self.build_reference, self.output_type, _spec)
+            _paths = self.variant_paths(_output_path)
+            self.outputs[name] = BuiltAssetOutput(name, _paths, _fingerprint, self.mipmaps)
+            if all(self.cache.is_fresh(path, _fingerprint) for path in _paths):
+                self.skipped.append(name)
+                continue
+            self.pending.append((name, job, _output_path, _fingerprint))
 
-    def job_runner(self, name, job) -> Image:
-        _composited_image = None
-        if type(job) is jobs.AssetCompositor:
-            _composited_image = self._run_asset_compositor_job(name, job)
+    def run(self, encoder: encoding.BackgroundEncoder | None = None) -> None:
+        """
+        Run every pending job of this target in sequence, in the calling process.
+        :param encoder: [optional] writes the outputs in the background, they are written before returning otherwise.
+        :return: None
+        """
+        self.register_skipped()
+        os.makedirs(self.output_dir, exist_ok=True)
+        _composited_images = self.batch_runner([(name, job) for name, job, _, _ in self.pending])
+        for (name, job, output_path, fingerprint), composited_image in zip(self.pending, _composited_images):
+            self.outputs[name].hand_over(composited_image)
+            if encoder is None:
+                self.save(name, composited_image, output_path, fingerprint)
+            else:
+                encoder.submit(self.save, name, composited_image, output_path, fingerprint)
+
+    def save(self, name: str, image: Image, output_path: str, fingerprint: str) -> None:
+        with self.profiler.stage(f"build.{name}", "save"):
+            mipmaps.write_variants(image, self.variants(output_path), self.mipmaps, self.output_type, self.encoding)
+        for path in self.variant_paths(output_path):
+            self.cache.record(path, fingerprint)
 
-        if _composited_image is None:
+    def variants(self, output_path: str) -> list[tuple[str, float]]:
+        return mipmaps.output_variants(output_path, self.resolutions)
+
+    def variant_paths(self, output_path: str) -> list[str]:
+        return [path for path, _ in self.variants(output_path)]
+
+    def register_skipped(self) -> None:
+        for name in self.skipped:
+            self.logger.log(logger.LoggingSeverities.LOW, "Skipped %s, cached output is up to date.", name, asset=name)
+            self.manager.register_asset(name, self.outputs[name], "build")
+
+    def register_outputs(self) -> None:
+        """
+        Register every output of this target without running it, as a dry run does so later targets can plan.
+        """
+        for name in self.outputs.keys():
+            self.manager.register_asset(name, self.outputs[name], "build")
+
+    def job_payload(self, name: str, job: jobs.AbstractAssetTask, output_path: str) -> tuple:
+        """
+        Everything a worker process needs to run a job and save its output: the worker entry point, and a
+        picklable tuple of its arguments (`scheduler.composite_and_save` or `scheduler.composite_layers_and_save`).
+        Images in the raw store are sent as references the worker maps itself, rather than pickled pixels.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        if type(job) is jobs.LayeredCompositor:
+            self.logger.log(logger.LoggingSeverities.LOW, "Dispatching LayeredCompositor job on %s.", name, asset=name)
+            return scheduler.composite_layers_and_save, (
+                self._payload_image(self.base_asset),
+                [
+                    (self._payload_image(asset), self._payload_image(mask) if mask is not None else None, blend, opacity)
+                    for asset, mask, blend, opacity in job.layers
+                ],
+                job.prefix_keys(self.base_asset),
+                job.shared,
+                output_path,
+                self.variants(output_path),
+                self.mipmaps,
+                self.output_type,
+                self.encoding,
+                self.backend.name,
+                self.profiler.enabled,
+                context.current().root
+            )
+        if type(job) is not jobs.AssetCompositor:
             raise self.UnrecognisedJobClassException(f"Job type {job} unrecognised/not implemented.")
+        self.logger.log(logger.LoggingSeverities.LOW, "Dispatching AssetCompositor job on %s.", name, asset=name)
+        return scheduler.composite_and_save, (
+            self._payload_image(self.base_asset),
+            self._payload_image(job.asset_to_composite_with),
+            self._payload_image(job.composite_mask) if job.composite_mask is not None else None,
+            output_path,
+            self.variants(output_path),
+            self.mipmaps,
+            self.output_type,
+            self.encoding,
+            self.backend.name,
+            self.profiler.enabled,
+            context.current().root
+        )
 
-        self.manager.register_asset(name, self, "build")
-        return _composited_image
+    @staticmethod
+    def _payload_image(asset: on_load.ParseAsset | BuiltAssetOutput) -> Image | raw_store.StoredImage:
+        _image = asset.modified_image
+        if isinstance(asset, on_load.ParseAsset):
+            return memo.TransformMemo().ref(asset.fingerprint()) or _image
+        return _image
 
-    def _run_asset_compositor_job(self, name, job) -> Image:
-        self.logger.log(logger.LoggingSeverities.LOW, f"Running AssetCompositor job on {name}.")
-        _composited_image = None
-        if job.composite_mask is not None:
-            _composited_image = Image.composite(
-                self.base_asset.modified_image,
-                job.asset_to_composite_with.modified_image,
-                job.composite_mask.modified_image
+    def complete(self, name: str, output_path: str, fingerprint: str, stage_records: list[dict]) -> None:
+        """
+        Book-keeping for a job whose output was written by a worker process.
+        """
+        self.profiler.extend(stage_records)
+        self.manager.register_asset(name, self.outputs[name], "build")
+        for path in self.variant_paths(output_path):
+            self.cache.record(path, fingerprint)
+
+    def job_runner(self, name, job) -> Image:
+        return self.batch_runner([(name, job)])[0]
+
+    def batch_runner(self, named_jobs: list[tuple[str, jobs.AbstractAssetTask]]) -> list[Image]:
+        """
+        Run several jobs of this target at once. Every `composite-with` job shares `self.base_asset`, so the pixel
+        backend can composite all of their layers against it in a single pass; `composite-layers` jobs each build
+        up their own stack.
+        """
+        for name, job in named_jobs:
+            if type(job) not in (jobs.AssetCompositor, jobs.LayeredCompositor):
+                raise self.UnrecognisedJobClassException(f"Job type {job} unrecognised/not implemented.")
+        _compositor_jobs = [(name, job) for name, job in named_jobs if type(job) is jobs.AssetCompositor]
+        _composited = dict(zip(
+            [name for name, _ in _compositor_jobs], self._run_asset_compositor_jobs(_compositor_jobs)
+        ))
+        for name, job in named_jobs:
+            if type(job) is jobs.LayeredCompositor:
+                _composited[name] = self._run_layered_compositor_job(name, job)
+
+        for name, _ in named_jobs:
+            self.manager.register_asset(name, self.outputs[name], "build")
+        return [_composited[name] for name, _ in named_jobs]
+
+    def _run_layered_compositor_job(self, name: str, job: jobs.LayeredCompositor) -> Image:
+        self.logger.log(logger.LoggingSeverities.LOW, "Running LayeredCompositor job on %s.", name, asset=name)
+        with self.profiler.stage(f"build.{name}", "composite"):
+            return jobs.composite_layer_stack(
+                self.base_asset, job.layers, job.prefix_keys(self.base_asset), job.shared, self.backend.name
             )
-        else:
-            _composited_image = Image.alpha_composite(
-                self.base_asset.modified_image,
-                job.asset_to_composite_with.modified_image
+
+    def _run_asset_compositor_jobs(self, named_jobs: list[tuple[str, jobs.AssetCompositor]]) -> list[Image]:
+        for name, _ in named_jobs:
+            self.logger.log(logger.LoggingSeverities.LOW, "Running AssetCompositor job on %s.", name, asset=name)
+        if len(named_jobs) == 0:
+            return []
+        _base = self.base_asset.modified_image
+        _layers = [
+            (
+                job.asset_to_composite_with.modified_image,
+                job.composite_mask.modified_image if job.composite_mask is not None else None
             )
-        return _composited_image
+            for _, job in named_jobs
+        ]
+        with self.profiler.stage(f"build.{self.build_reference}", "composite"):
+            return self.backend.composite_many(_base, _layers)
 
 
 class AssetBuilder(metaclass=build_meta.AssetBuilderSingletonManager):
     def __init__(self) -> None:
         self.build_table = loader.AssetLoader().conf["build"]
-        self.built: list[BuildAsset] = []
         self.logger: logger.AssetOutputPhaseLogger = logger.AssetOutputPhaseLogger()
+        self.workers: int = scheduler.resolve_worker_count(mod_config.ModConfigLoader().build_option("jobs", 1))
+
+        self.plan = planner.BuildPlanner(
+            loader.AssetLoader().conf["load"], self.build_table, loader.AssetLoader().compiled
+        )
+        self.scheduler = scheduler.BuildScheduler(self.plan, self.workers)
+        self.built: list[BuildAsset] = self.scheduler.run()
 
-        for build_target in self.build_table.keys():
-            self.logger.log(logger.LoggingSeverities.LOW, f"Building {build_target}")
-            self.built.append(BuildAsset({build_target: self.build_table[build_target]}))
\ No newline at end of file
+        cache.BuildCache().save()
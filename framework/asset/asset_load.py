@@ -1,50 +1,116 @@
+from __future__ import annotations
+import hashlib
 import os
-import yaml
-from PIL import Image
 import framework.phase_logger as logger
+import framework.context as context
 import framework.asset.load.load_meta_classes as load_meta
 import framework.license as license
+import framework.profiler as profiler
+import framework.asset.backend.raw_store as raw_store
+import framework.conf.snapshot as snapshot
+import framework.asset.load.compiler as compiler
+import framework.lazy as lazy
+
+Image = lazy.lazy_import("PIL.Image")
 
 BUILDABLE_ASSETS_PATH = 'mod/build/assets/'
 BUILDABLE_ASSETS_CONFIG_FILE = 'assets-config.yml'
+DIGEST_CHUNK_SIZE = 1 << 20
 
 
 class LoadAsset:
     """
-    Takes a yaml dict of the specified asset from the conf file and imports the relevant data and loads the image
-    asset using PIL.Image.
+    Takes the compiled load entry of the specified asset and imports the relevant data. The image asset is
+    loaded lazily using PIL.Image: nothing is opened or decoded until `self.image` is first read, and the file
+    handle is released as soon as the pixels are decoded. Large sources are kept decoded in the RawImageStore,
+    keyed by `self.digest()`, and mapped from there on later reads instead of being decoded again.
 
     ## Instance Methods:
         * self.dispose()
+        * self.release()
+        * self.digest()
 
     ## Instance Vars:
         * self.path
         * self.nickname
+        * self.operations
         * self.image
+        * self.decoded
+        * self.decodes
         * self.finalised
     """
     class AssetAlreadyDisposedException(Exception):
         def __init__(self, *args):
             super().__init__(*args)
 
-    def __init__(self, yaml_key: dict) -> None:
-        self.nickname: str = list(yaml_key.keys())[0]
-        self.path: str = yaml_key[self.nickname]["path"]
-        self.image: Image = Image.open(os.path.join(BUILDABLE_ASSETS_PATH, self.path))
+    def __init__(self, entry: compiler.LoadEntry) -> None:
+        self.nickname: str = entry.nickname
+        self.path: str = entry.path
+        self._image: Image | None = None
+        # times the pixels were read in, more than once when streaming released them in between
+        self.decodes: int = 0
         self.finalised: bool = False
-        self.license: dict = yaml_key[self.nickname]["licensing"]
-        # self.license: license.AssetLicense = license.AssetLicense(yaml_key[self.nickname]["licensing"])
-        self.on_load: dict = yaml_key[self.nickname]["on_load"] if "on_load" in yaml_key[self.nickname].keys() else None
+        self.license: dict = entry.licensing
+        # self.license: license.AssetLicense = license.AssetLicense(entry.licensing)
+        self.operations: list[compiler.OnLoadOperation] = entry.operations
+        self._digest: str | None = None
+
+    @property
+    def image(self) -> Image:
+        if self._image is None:
+            if self.finalised:
+                raise self.AssetAlreadyDisposedException(f"{self.__repr__()} accessed after being disposed of.")
+            _store = raw_store.RawImageStore()
+            with profiler.BuildProfiler().stage(f"load.{self.nickname}", "load"):
+                if _store.sources:
+                    self._image = _store.get(self.digest())
+                if self._image is None:
+                    self._image = Image.open(context.path(BUILDABLE_ASSETS_PATH, self.path))
+                    # force the decode now so PIL closes the underlying file handle
+                    self._image.load()
+                    if _store.sources and raw_store.image_nbytes(self._image) >= _store.source_min_bytes:
+                        _store.put(self.digest(), self._image)
+            self.decodes += 1
+        return self._image
+
+    @property
+    def decoded(self) -> bool:
+        """
+        Whether the pixels are held right now, see `self.decodes` for whether they were ever read.
+        """
+        return self._image is not None
+
+    def digest(self) -> str:
+        """
+        sha256 of the source file's bytes. Computed once and remembered, the image itself is not decoded.
+        :return: hex digest string.
+        """
+        if self._digest is None:
+            _hash = hashlib.sha256()
+            with open(context.path(BUILDABLE_ASSETS_PATH, self.path), 'rb') as h:
+                for chunk in iter(lambda: h.read(DIGEST_CHUNK_SIZE), b""):
+                    _hash.update(chunk)
+            self._digest = _hash.hexdigest()
+        return self._digest
+
+    def release(self) -> None:
+        """
+        Free the decoded pixels without finalising the asset. A later read of `self.image` decodes it again.
+        :return: None
+        """
+        if self._image is not None:
+            self._image.close()
+            self._image = None
 
     def dispose(self) -> None:
         if self.finalised:
             raise self.AssetAlreadyDisposedException(f"{self.__repr__()} already disposed of.")
-        if self.image is not None:
-            self.image.close()
-            self.finalised = True
+        if self._image is not None:
+            self._image.close()
+        self.finalised = True
 
     def __repr__(self):
-        return f"{self.nickname} [{self.path}] => {self.image}"
+        return f"{self.nickname} [{self.path}] => {self._image if self.decoded else '<not decoded>'}"
 
 
 class AssetLoader(metaclass=load_meta.AssetLoaderSingletonManager):
@@ -64,6 +130,7 @@ class AssetLoader(metaclass=load_meta.AssetLoaderSingletonManager):
 
     ## Instance Vars:
         * self.conf
+        * self.compiled
         * self.assets
     """
     class NoLoadableAssetsPresentException(Exception):
@@ -74,18 +141,27 @@ class AssetLoader(metaclass=load_meta.AssetLoaderSingletonManager):
     assets: list[LoadAsset] = None
 
     def __init__(self):
-        if not os.path.exists(BUILDABLE_ASSETS_PATH):
-            raise self.NoLoadableAssetsPresentException(f"{BUILDABLE_ASSETS_PATH=} not present.")
+        if not os.path.exists(context.path(BUILDABLE_ASSETS_PATH)):
+            raise self.NoLoadableAssetsPresentException(f"{context.path(BUILDABLE_ASSETS_PATH)} not present.")
         self.logger = logger.AssetLoadPhaseLogger()
-        with open(BUILDABLE_ASSETS_PATH + BUILDABLE_ASSETS_CONFIG_FILE, 'r') as h:
-            self.conf: dict = yaml.safe_load(h)
+        with profiler.BuildProfiler().stage(BUILDABLE_ASSETS_CONFIG_FILE, "yaml"):
+            self.conf: dict = snapshot.load_yaml(context.path(BUILDABLE_ASSETS_PATH, BUILDABLE_ASSETS_CONFIG_FILE))
+        # the whole config is validated before any asset is loaded, a bad config fails here
+        self.compiled = compiler.AssetsConfigCompiler(self.conf)
         self.assets: list[LoadAsset] = []
-        for asset_key in self.conf["load"].keys():
-            self.assets.append(LoadAsset({asset_key: self.conf["load"][asset_key]}))
-            self.logger.log(logger.LoggingSeverities.LOW, f"Loaded asset {asset_key}")
+        for asset_key, entry in self.compiled.load.items():
+            self.assets.append(LoadAsset(entry))
+            self.logger.log(logger.LoggingSeverities.LOW, "Loaded asset %s", asset_key, asset=asset_key)
         self.logger.output()
 
     def dispose(self):
+        # counted from `decodes`, as a streaming build has released most of them by now
+        _decoded = len([asset for asset in self.assets if asset.decodes > 0])
+        self.logger.log(
+            logger.LoggingSeverities.LOW,
+            "Decoded %d of %d loaded assets (%d decodes), skipped %d decodes.",
+            _decoded, len(self.assets), sum(asset.decodes for asset in self.assets), len(self.assets) - _decoded
+        )
         for asset in self.assets:
             try:
                 asset.dispose()
@@ -1,16 +1,21 @@
 from __future__ import annotations
 
-import copy
-from threading import Lock
+import hashlib
+import json
 from enum import Enum
-from PIL import Image
 import framework.phase_logger as logger
 import framework.asset.asset_load as loader
+import framework.asset.load.compiler as compiler
 import framework.license as licenser
+import framework.conf.mod_config as mod_config
+import framework.asset.on_load.planner as planner
+import framework.asset.backend.backends as backends
+import framework.asset.on_load.memo as memo
+import framework.profiler as profiler
+import framework.context as context
+import framework.lazy as lazy
 
-
-def get_order_val(op_tuple: tuple) -> int:
-    return op_tuple[0]
+Image = lazy.lazy_import("PIL.Image")
 
 
 class SupportedOnLoadFunctions(Enum):
@@ -22,32 +27,24 @@ class SupportedOnLoadFunctions(Enum):
     # TODO: implement TINT/HUE/FILTER
 
 
-class AssetParserSingletonManager(type):
+class AssetParserSingletonManager(context.ContextSingletonManager):
     """
     Singleton metaclass for managing the AssetLoader singleton. Do not attempt to directly instantiate, reference
     or otherwise use this class. Its function is autonomous.
     """
-    _instances = {}
-
-    _lock: Lock = Lock()
-
-    def __call__(cls, *args, **kwargs):
-        with cls._lock:
-            if cls not in cls._instances:
-                instance = super().__call__(*args, **kwargs)
-                cls._instances[cls] = instance
-        return cls._instances[cls]
 
 
 class EffectResolution:
+    """
+    An `until_resolution` amount, `WxH`. Either side may be left out (`Wx`, `xH`, or just `W`) to keep the
+    image's own size on that side. Parsed once when the config is compiled, see `compiler.AssetsConfigCompiler`.
+    """
+    __slots__ = ("x", "y")
+
     def __init__(self, res_str: str) -> None:
-        if "x" not in res_str:
-            self.x = int(res_str)
-        else:
-            _x = res_str.split("x")[0]
-            _y = res_str.split("x")[1]
-            self.x = int(_x) if _x != "" else None
-            self.y = int(_y) if _x != "" else None
+        _x, _, _y = res_str.partition("x")
+        self.x = int(_x) if _x != "" else None
+        self.y = int(_y) if _y != "" else None
 
     def get_tup(self) -> tuple[int, int]:
         _x = self.x if self.x is not None else -1
@@ -56,6 +53,11 @@ class EffectResolution:
 
 
 class PixelBox:
+    """
+    A `by_value` amount of one to four values, widened to a `(left, top, right, bottom)` box.
+    """
+    __slots__ = ("tup",)
+
     def __init__(self, res_list: list[int]) -> None:
         self.tup = None
         if len(res_list) == 1:
@@ -69,15 +71,22 @@ class PixelBox:
 
 
 class AssetOnLoad:
-    def __init__(self, on_load_dict: dict) -> None:
-        self.operations: list[tuple[int, SupportedOnLoadFunctions, dict]] = []
-        for on_load_func in on_load_dict.keys():
-            _on_load_function = SupportedOnLoadFunctions(on_load_func)
-            _params = {
-                "amount": on_load_dict[on_load_func]["amount"]
-            }
-            self.operations.append((on_load_dict[on_load_func]["order"], _on_load_function, _params))
-        self.operations.sort(key=get_order_val)
+    def __init__(self, operations: list[compiler.OnLoadOperation]) -> None:
+        """
+        :param operations: the compiled on_load operations of a load entry, in execution order.
+        """
+        self.operations: list[compiler.OnLoadOperation] = operations
+
+    def canonical(self) -> str:
+        """
+        A stable string form of the ordered operations, independent of yaml key order and formatting.
+        :return: json string.
+        """
+        return json.dumps(
+            [(op.order, op.function.value, op.params) for op in self.operations],
+            sort_keys=True,
+            separators=(",", ":")
+        )
 
 
 class AbstractAssetManipulator:
@@ -125,7 +134,9 @@ class CropImage(AbstractAssetManipulator):
                     _val_4
                 )
             )
-            self.logger.log(logger.LoggingSeverities.LOW, f"Cropped {self.asset.nickname} by resolution")
+            self.logger.log(
+                logger.LoggingSeverities.LOW, "Cropped %s by resolution", self.asset.nickname, asset=self.asset.nickname
+            )
         elif self.pixel_box:
             self.modified_image = self.raw_image.crop(
                 (
@@ -135,7 +146,9 @@ class CropImage(AbstractAssetManipulator):
                     self.pixel_box.tup[3]
                 )
             )
-            self.logger.log(logger.LoggingSeverities.LOW, f"Cropped {self.asset.nickname} by value box")
+            self.logger.log(
+                logger.LoggingSeverities.LOW, "Cropped %s by value box", self.asset.nickname, asset=self.asset.nickname
+            )
 
 
 class ScaleImage(AbstractAssetManipulator):
@@ -155,14 +168,18 @@ class ScaleImage(AbstractAssetManipulator):
             if _tup[1] == -1:
                 _tup = (_tup[0], self.raw_image.size[1])
             self.modified_image = self.raw_image.resize(_tup)
-            self.logger.log(logger.LoggingSeverities.LOW, f"Scaled {self.asset.nickname} by resolution")
+            self.logger.log(
+                logger.LoggingSeverities.LOW, "Scaled %s by resolution", self.asset.nickname, asset=self.asset.nickname
+            )
         elif self.pixel_box:
             _tup = (
                 self.raw_image.size[0] * self.pixel_box.tup[2],
                 self.raw_image.size[1] * self.pixel_box.tup[3],
             )
             self.modified_image = self.raw_image.resize(_tup)
-            self.logger.log(logger.LoggingSeverities.LOW, f"Scaled {self.asset.nickname} by value box")
+            self.logger.log(
+                logger.LoggingSeverities.LOW, "Scaled %s by value box", self.asset.nickname, asset=self.asset.nickname
+            )
 
 
 class TileImage(AbstractAssetManipulator):
@@ -181,27 +198,19 @@ class TileImage(AbstractAssetManipulator):
                 _tup = (self.raw_image.size[0], _tup[1])
             if _tup[1] == -1:
                 _tup = (_tup[0], self.raw_image.size[1])
-            _temp_image = Image.new('RGBA', _tup)
-
-            for i in range(0, _temp_image.width, self.raw_image.size[0]):
-                for j in range(0, _temp_image.height, self.raw_image.size[1]):
-                    _temp_image.paste(self.raw_image, (i, j))
-
-            self.modified_image = copy.deepcopy(_temp_image)
-            self.logger.log(logger.LoggingSeverities.LOW, f"Tiled {self.asset.nickname} by resolution")
+            self.modified_image = backends.get_backend().tile(self.raw_image, _tup)
+            self.logger.log(
+                logger.LoggingSeverities.LOW, "Tiled %s by resolution", self.asset.nickname, asset=self.asset.nickname
+            )
         elif self.pixel_box:
             _tup = (
                 self.pixel_box.tup[2] * self.raw_image.size[0],
                 self.pixel_box.tup[3] * self.raw_image.size[1]
             )
-            _temp_image = Image.new('RGBA', _tup)
-
-            for i in range(0, _temp_image.width, self.raw_image.size[0]):
-                for j in range(0, _temp_image.height, self.raw_image.size[1]):
-                    _temp_image.paste(self.raw_image, (i, j))
-
-            self.modified_image = copy.deepcopy(_temp_image)
-            self.logger.log(logger.LoggingSeverities.LOW, f"Tiled {self.asset.nickname} by value box")
+            self.modified_image = backends.get_backend().tile(self.raw_image, _tup)
+            self.logger.log(
+                logger.LoggingSeverities.LOW, "Tiled %s by value box", self.asset.nickname, asset=self.asset.nickname
+            )
 
 
 class RotateImage(AbstractAssetManipulator):
@@ -225,50 +234,110 @@ class RotateImage(AbstractAssetManipulator):
             # _op_fill?
             # _op_resample_setting?
             self.modified_image = self.raw_image.rotate(angle=_theta)
-            self.logger.log(logger.LoggingSeverities.LOW, f"Rotated {self.asset.nickname} by value box")
+            self.logger.log(
+                logger.LoggingSeverities.LOW, "Rotated %s by value box", self.asset.nickname, asset=self.asset.nickname
+            )
 
 
 class ImageManipulatorFactory:
-    def __init__(self, asset: loader.LoadAsset, op: tuple, img: Image, logger_: logger.AssetModifyPhaseLogger) -> None:
-        _res = None
-        _val = None
-        if "until_resolution" in op[2]["amount"].keys():
-            _res = EffectResolution(op[2]["amount"]["until_resolution"])
-        elif "by_value" in op[2]["amount"].keys():
-            _val = PixelBox(op[2]["amount"]["by_value"])
-        if op[1] == SupportedOnLoadFunctions.CROP:
-            self.instance = CropImage(asset, _val, _res, img, logger_)
-        elif op[1] == SupportedOnLoadFunctions.SCALE:
-            self.instance = ScaleImage(asset, _val, _res, img, logger_)
-        elif op[1] == SupportedOnLoadFunctions.TILE:
-            self.instance = TileImage(asset, _val, _res, img, logger_)
-        elif op[1] == SupportedOnLoadFunctions.ROTATE:
-            self.instance = RotateImage(asset, _val, _res, img, logger_)
+    def __init__(
+            self,
+            asset: loader.LoadAsset,
+            op: compiler.OnLoadOperation,
+            img: Image,
+            logger_: logger.AssetModifyPhaseLogger
+    ) -> None:
+        with profiler.BuildProfiler().stage(f"load.{asset.nickname}", op.function.value):
+            if op.function == SupportedOnLoadFunctions.CROP:
+                self.instance = CropImage(asset, op.box, op.resolution, img, logger_)
+            elif op.function == SupportedOnLoadFunctions.SCALE:
+                self.instance = ScaleImage(asset, op.box, op.resolution, img, logger_)
+            elif op.function == SupportedOnLoadFunctions.TILE:
+                self.instance = TileImage(asset, op.box, op.resolution, img, logger_)
+            elif op.function == SupportedOnLoadFunctions.ROTATE:
+                self.instance = RotateImage(asset, op.box, op.resolution, img, logger_)
 
     def get_modified_image(self) -> Image:
         return self.instance.modified_image
 
 
 class ParseAsset:
+    """
+    Applies the ordered on_load operations of a LoadAsset. The work is deferred until `self.modified_image` is
+    first read, so assets that no build job uses are never decoded. An asset without on_load operations passes
+    its source image through unchanged. Results are shared through the TransformMemo, so an identical source and
+    on_load spec (in this run, or an earlier one) is a lookup rather than a recomputation.
+    """
     def __init__(self, asset: loader.LoadAsset):
         self.asset = asset
         self.license = licenser.AssetLicense(self.asset.license)
-        self.on_load = AssetOnLoad(self.asset.on_load)
-        self.modified_image: Image = None
+        self.on_load = AssetOnLoad(self.asset.operations)
+        self._modified_image: Image | None = None
         self.logger: logger.AssetModifyPhaseLogger = logger.AssetModifyPhaseLogger()
-
-        for op in self.on_load.operations:
-            _image = None
-            if self.modified_image is not None:
-                _image = self.modified_image
+        self.fused: bool = bool(mod_config.ModConfigLoader().build_option("fused_on_load", True))
+        self.streaming: bool = bool(mod_config.ModConfigLoader().build_option("streaming", False))
+
+    @property
+    def modified_image(self) -> Image:
+        if self._modified_image is None:
+            _memo = memo.TransformMemo()
+            _key = self.fingerprint()
+            self._modified_image = _memo.get(_key)
+            if self._modified_image is None:
+                self._modified_image = self._apply_on_load()
+                _memo.put(_key, self._modified_image)
+                if self.streaming and self._modified_image is not self.asset.image:
+                    # the source is not needed again once it has been transformed
+                    self.asset.release()
             else:
-                _image = self.asset.image
-
+                self.logger.log(
+                    logger.LoggingSeverities.LOW,
+                    "Reused memoised transform of %s", self.asset.nickname,
+                    asset=self.asset.nickname
+                )
+        return self._modified_image
+
+    @property
+    def transformed(self) -> bool:
+        """
+        Whether the transformed image is already held, so reading `self.modified_image` costs nothing.
+        """
+        return self._modified_image is not None
+
+    def _apply_on_load(self) -> Image:
+        _image: Image = self.asset.image
+        if self.fused:
+            return planner.FusedOnLoadPlan(self.on_load.operations).execute(self.asset, _image, self.logger)
+        for op in self.on_load.operations:
             # Implemented is:
-            # CROP, SCALE, TILE
-            # TODO: ROTATE, TRANSLATE, MAYBE TINT/FILTER
+            # CROP, SCALE, TILE, ROTATE
+            # TODO: TRANSLATE, MAYBE TINT/FILTER
             _inst = ImageManipulatorFactory(self.asset, op, _image, self.logger)
-            self.modified_image = _inst.get_modified_image()
+            _image = _inst.get_modified_image()
+        return _image
+
+    def release(self) -> None:
+        """
+        Free the transformed image and its decoded source. Reading `self.modified_image` afterwards recomputes it,
+        or fetches it from the memo's on-disk cache.
+        :return: None
+        """
+        if self._modified_image is not None:
+            memo.TransformMemo().evict(self.fingerprint())
+            self._modified_image = None
+        self.asset.release()
+        self.logger.log(
+            logger.LoggingSeverities.LOW, "Released %s", self.asset.nickname, asset=self.asset.nickname
+        )
+
+    def fingerprint(self) -> str:
+        """
+        Identifies the transformed image by its source bytes, its on_load operations and whether they are fused.
+        :return: hex digest string.
+        """
+        return hashlib.sha256(
+            f"{self.asset.digest()}:{self.on_load.canonical()}:{'fused' if self.fused else 'stepwise'}".encode()
+        ).hexdigest()
 
 
 class AssetParser(metaclass=AssetParserSingletonManager):
@@ -276,6 +345,9 @@ class AssetParser(metaclass=AssetParserSingletonManager):
         self.loaded = loader.AssetLoader()  # Get singleton instance of AssetLoader
         self.parsed = [ParseAsset(asset_) for asset_ in self.loaded.assets]
 
+    def log_stats(self) -> None:
+        memo.TransformMemo().log_stats()
+
     def save_test_images(self) -> None:
         _test_counter = 0
         self.parsed[0].logger.output()
@@ -0,0 +1,164 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+
+import framework.phase_logger as logger
+import framework.context as context
+import framework.conf.mod_config as mod_config
+import framework.asset.asset_build as asset_build
+import framework.asset.atlas.atlas_meta_classes as atlas_meta
+import framework.asset.atlas.packer as packer
+import framework.asset.build.build_helpers as helpers
+import framework.asset.build.cache as cache
+import framework.asset.build.encoding as encoding
+import framework.asset.manager.manager as manager
+import framework.packaging.packager as packager
+import framework.profiler as profiler
+import framework.lazy as lazy
+
+Image = lazy.lazy_import("PIL.Image")
+
+DEFAULT_ATLAS_DIR = 'graphics/atlas/'
+DEFAULT_ATLAS_MAX_SIZE = 8192
+DEFAULT_ATLAS_PADDING = 1
+ATLAS_SUBSTITUTION_CONTEXT: tuple[int, str] = (0, "atlas-info")
+ATLAS_FIELDS = ("filename", "x", "y", "width", "height")
+
+
+class AtlasBuilder(metaclass=atlas_meta.AtlasBuilderSingletonManager):
+    """
+    Packs the outputs of every build target that sets `outputs.atlas: <group>` into shared sheets of at most
+    `build.atlas.max_size` pixels square, after the AssetBuilder has run. Each group is written as
+    `<group>-<n>.png` sheets plus a `<group>.json` coordinate map into `build.atlas.dir`, and every sprite's
+    placement is registered as `$atlas:<sprite>:filename|x|y|width|height$` substitutions in the `atlas-info`
+    context, ready to be substituted into prototype definitions. A group whose sprites are all unchanged is not
+    repacked. Sprites packed into a sheet are left out of the mod package unless `build.atlas.keep_sprites` is set.
+
+    ## Instance Methods:
+        * self.pack()
+
+    ## Instance Vars:
+        * self.groups
+        * self.maps
+        * self.packed_paths
+    """
+    def __init__(self) -> None:
+        _config = mod_config.ModConfigLoader()
+        self.logger = logger.AssetOutputPhaseLogger()
+        self.manager = manager.AssetManager()
+        self.cache = cache.BuildCache()
+        self.profiler = profiler.BuildProfiler()
+        self.enabled = bool(_config.build_option("atlas.enabled", True))
+        self.max_size = int(_config.build_option("atlas.max_size", DEFAULT_ATLAS_MAX_SIZE))
+        self.padding = int(_config.build_option("atlas.padding", DEFAULT_ATLAS_PADDING))
+        self.output_dir = context.path(helpers.BUILT_ASSETS_PATH + _config.build_option("atlas.dir", DEFAULT_ATLAS_DIR))
+        self.keep_sprites = bool(_config.build_option("atlas.keep_sprites", False))
+        # sheets are written with the global `build.encoding` settings
+        self.encoding = encoding.OutputEncoding.resolve()
+        self.mod_name: str = _config.config_dict["info"]["name"]
+
+        self.groups: dict[str, dict[str, asset_build.BuiltAssetOutput]] = {}
+        self.maps: dict[str, dict] = {}
+        self.packed_paths: set[str] = set()
+        if self.enabled:
+            self.pack()
+
+    def _collect(self) -> dict[str, dict[str, asset_build.BuiltAssetOutput]]:
+        _builder = asset_build.AssetBuilder()
+        _groups: dict[str, dict[str, asset_build.BuiltAssetOutput]] = {}
+        for target in _builder.built:
+            _group = _builder.build_table[target.build_reference]["outputs"].get("atlas")
+            if _group is None:
+                continue
+            _groups.setdefault(str(_group), {}).update(target.outputs)
+        return _groups
+
+    def pack(self) -> None:
+        """
+        (Re)pack every atlas group from the AssetBuilder's current outputs.
+        :return: None
+        """
+        self.groups = self._collect()
+        self.packed_paths = set()
+        for group, sprites in self.groups.items():
+            self.maps[group] = self._pack_group(group, sprites)
+            self._register(self.maps[group])
+            if not self.keep_sprites:
+                self.packed_paths |= {os.path.normpath(output.output_path) for output in sprites.values()}
+        self.cache.save()
+
+    def _pack_group(self, group: str, sprites: dict[str, asset_build.BuiltAssetOutput]) -> dict:
+        _map_path = os.path.join(self.output_dir, group + ".json")
+        _fingerprint = hashlib.sha256(json.dumps(
+            [self.max_size, self.padding, sorted((name, output.fingerprint()) for name, output in sprites.items())]
+            + ([] if self.encoding.default else [self.encoding.canonical()]),
+            separators=(",", ":")
+        ).encode()).hexdigest()
+
+        _previous = None
+        if os.path.exists(_map_path):
+            with open(_map_path, 'r') as h:
+                _previous = json.load(h)
+        if _previous is not None and self.cache.is_fresh(_map_path, _fingerprint) and all(
+                self.cache.is_fresh(context.path(helpers.BUILT_ASSETS_PATH, sheet), _fingerprint)
+                for sheet in _previous["sheets"]
+        ):
+            self.logger.log(logger.LoggingSeverities.LOW, "Skipped atlas %s, cached sheets are up to date.", group)
+            return _previous
+
+        with self.profiler.stage(f"atlas.{group}", "pack"):
+            _sizes = {name: output.modified_image.size for name, output in sprites.items()}
+            _placed, _used = packer.SkylinePacker(self.max_size, self.padding).pack(_sizes)
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        _sheet_paths = [os.path.join(self.output_dir, f"{group}-{idx}.png") for idx in range(len(_used))]
+        _sheet_names = [
+            os.path.relpath(path, context.path(helpers.BUILT_ASSETS_PATH)).replace(os.sep, "/") for path in _sheet_paths
+        ]
+        # paths as the game sees them inside the packaged mod
+        _mod_paths = [
+            f"__{self.mod_name}__/" + os.path.relpath(path, context.path(packager.MOD_ROOT_PATH)).replace(os.sep, "/")
+            for path in _sheet_paths
+        ]
+        _map = {"sheets": _sheet_names, "sprites": {}}
+        for sheet_idx, sheet_path in enumerate(_sheet_paths):
+            with self.profiler.stage(f"atlas.{group}-{sheet_idx}", "compose"):
+                _sheet = Image.new("RGBA", _used[sheet_idx])
+                for rect in _placed:
+                    if rect.sheet == sheet_idx:
+                        _sheet.paste(sprites[rect.name].modified_image, (rect.x, rect.y))
+            with self.profiler.stage(f"atlas.{group}-{sheet_idx}", "save"):
+                self.encoding.save(_sheet, sheet_path, "png")
+            self.cache.record(sheet_path, _fingerprint)
+        for rect in sorted(_placed, key=lambda r: r.name):
+            _map["sprites"][rect.name] = {
+                "sheet": rect.sheet,
+                "filename": _mod_paths[rect.sheet],
+                "x": rect.x,
+                "y": rect.y,
+                "width": rect.width,
+                "height": rect.height
+            }
+
+        # sheets the group no longer fills are removed so they are not packaged
+        for stale in (_previous or {}).get("sheets", [])[len(_sheet_names):]:
+            _stale_path = context.path(helpers.BUILT_ASSETS_PATH, stale)
+            if os.path.exists(_stale_path):
+                os.remove(_stale_path)
+        with open(_map_path, 'w') as h:
+            json.dump(_map, h, indent=2)
+        self.cache.record(_map_path, _fingerprint)
+        self.logger.log(
+            logger.LoggingSeverities.LOW,
+            "Packed %d sprites into %d %s sheet(s): %s", len(_placed), len(_used), group,
+            ", ".join(f"{w}x{h}" for w, h in _used)
+        )
+        return _map
+
+    def _register(self, atlas_map: dict) -> None:
+        for name, placement in atlas_map["sprites"].items():
+            for field in ATLAS_FIELDS:
+                self.manager.register_substitution(
+                    ATLAS_SUBSTITUTION_CONTEXT, f"$atlas:{name}:{field}$", placement[field]
+                )
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+
+class PackedRect:
+    """
+    Placement of one sprite: which sheet it went into and where.
+    """
+    __slots__ = ("name", "sheet", "x", "y", "width", "height")
+
+    def __init__(self, name: str, sheet: int, x: int, y: int, width: int, height: int) -> None:
+        self.name = name
+        self.sheet = sheet
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+
+class SkylineSheet:
+    """
+    One bin of a skyline packer. The skyline is the upper outline of everything placed so far, kept as a list of
+    `[x, y, width]` segments covering the full sheet width left to right. A rect is placed on the position that
+    leaves it lowest (bottom-left), ties broken by the narrowest segment it rests on, and the skyline is raised
+    under it. Placement costs one pass over the skyline per candidate segment, so packing stays roughly
+    O(sprites x segments).
+    """
+    def __init__(self, width: int, height: int) -> None:
+        self.width = width
+        self.height = height
+        self.skyline: list[list[int]] = [[0, 0, width]]
+        self.used_width = 0
+        self.used_height = 0
+
+    def _fit(self, idx: int, width: int, height: int) -> int | None:
+        """
+        :return: the y a rect of this size would rest at with its left edge on segment `idx`, or None.
+        """
+        _x = self.skyline[idx][0]
+        if _x + width > self.width:
+            return None
+        _y = 0
+        _remaining = width
+        while _remaining > 0:
+            _y = max(_y, self.skyline[idx][1])
+            if _y + height > self.height:
+                return None
+            _remaining -= self.skyline[idx][2]
+            idx += 1
+        return _y
+
+    def insert(self, width: int, height: int) -> tuple[int, int] | None:
+        """
+        Place a rect, raising the skyline under it.
+        :return: its top left corner, or None when it does not fit.
+        """
+        _best = None
+        for idx in range(len(self.skyline)):
+            _y = self._fit(idx, width, height)
+            if _y is None:
+                continue
+            _key = (_y + height, self.skyline[idx][2])
+            if _best is None or _key < _best[0]:
+                _best = (_key, idx, _y)
+        if _best is None:
+            return None
+        _, _idx, _y = _best
+        _x = self.skyline[_idx][0]
+        self._raise(_idx, _x, _y + height, width)
+        self.used_width = max(self.used_width, _x + width)
+        self.used_height = max(self.used_height, _y + height)
+        return _x, _y
+
+    def _raise(self, idx: int, x: int, y: int, width: int) -> None:
+        self.skyline.insert(idx, [x, y, width])
+        _next = idx + 1
+        # trim or drop the segments now covered by the new one
+        while _next < len(self.skyline):
+            _segment = self.skyline[_next]
+            _overlap = x + width - _segment[0]
+            if _overlap <= 0:
+                break
+            if _overlap < _segment[2]:
+                _segment[0] += _overlap
+                _segment[2] -= _overlap
+                break
+            del self.skyline[_next]
+        # merge neighbours of equal height to keep the skyline short
+        _merged = [self.skyline[0]]
+        for segment in self.skyline[1:]:
+            if segment[1] == _merged[-1][1]:
+                _merged[-1][2] += segment[2]
+            else:
+                _merged.append(segment)
+        self.skyline = _merged
+
+
+class SkylinePacker:
+    """
+    Packs named rects into as few sheets of at most `max_size` x `max_size` as it can. Rects are placed tallest
+    first (then widest, then by name), so the result only depends on the set of sprites, not their order.
+
+    ## Instance Methods:
+        * self.pack()
+    """
+    class SpriteTooLargeError(Exception):
+        def __init__(self, *args) -> None:
+            super().__init__(*args)
+
+    def __init__(self, max_size: int, padding: int = 0) -> None:
+        self.max_size = max_size
+        self.padding = padding
+
+    def pack(self, sizes: dict[str, tuple[int, int]]) -> tuple[list[PackedRect], list[tuple[int, int]]]:
+        """
+        :param sizes: sprite name -> (width, height).
+        :return: the placements, and the used size of every sheet.
+        """
+        _sheets: list[SkylineSheet] = []
+        _placed: list[PackedRect] = []
+        for name in sorted(sizes.keys(), key=lambda n: (-sizes[n][1], -sizes[n][0], n)):
+            _width, _height = sizes[name]
+            _padded = (_width + self.padding, _height + self.padding)
+            if _width > self.max_size or _height > self.max_size:
+                raise self.SpriteTooLargeError(
+                    f"Sprite {name} ({_width}x{_height}) does not fit a {self.max_size}x{self.max_size} sheet."
+                )
+            for sheet_idx, sheet in enumerate(_sheets):
+                _position = sheet.insert(*_padded)
+                if _position is not None:
+                    break
+            else:
+                # the padding only separates neighbours, it may overhang the far edges of the sheet
+                _sheets.append(SkylineSheet(self.max_size + self.padding, self.max_size + self.padding))
+                sheet_idx = len(_sheets) - 1
+                _position = _sheets[sheet_idx].insert(*_padded)
+            _placed.append(PackedRect(name, sheet_idx, _position[0], _position[1], _width, _height))
+        _used = [
+            (max(0, sheet.used_width - self.padding), max(0, sheet.used_height - self.padding)) for sheet in _sheets
+        ]
+        return _placed, _used
@@ -0,0 +1,8 @@
+import framework.context as context
+
+
+class RawImageStoreSingletonManager(context.ContextSingletonManager):
+    """
+    Singleton metaclass for managing the RawImageStore singleton. Do not attempt to directly instantiate,
+    reference or otherwise use this class. Its function is autonomous.
+    """
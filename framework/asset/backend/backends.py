@@ -0,0 +1,313 @@
+from __future__ import annotations
+import math
+
+import framework.phase_logger as logger
+import framework.conf.mod_config as mod_config
+import framework.lazy as lazy
+
+Image = lazy.lazy_import("PIL.Image")
+ImageChops = lazy.lazy_import("PIL.ImageChops")
+numpy = lazy.optional_import("numpy")
+
+SUPPORTED_BACKENDS = ("pillow", "numpy")
+DEFAULT_BACKEND = "pillow"
+# upper bound on the uint32 working set of one vectorised composite, layers beyond it are processed in further stacks
+NUMPY_STACK_BUDGET_BYTES = 256 * 1024 * 1024
+
+# overlays are composited only over the squares of this many px (a power of two) holding a visible pixel...
+ROI_TILE_SIZE = 64
+# ...unless those cover more than this share of the canvas, where one full pass is cheaper
+ROI_MAX_COVERAGE = 0.75
+# every non-zero value to 255, so reducing a block of pixels by averaging cannot round a visible pixel away
+_OCCUPIED = [0] + [255] * 255
+
+_ALPHA_TABLES = None
+
+# colour blend of a layer over the stack below it, by ImageChops function, before the layer's alpha is applied;
+# `normal` is no blend
+BLEND_MODES: dict = {
+    "normal": None,
+    "multiply": "multiply",
+    "screen": "screen",
+    "add": "add",
+    "subtract": "subtract",
+    "darken": "darker",
+    "lighten": "lighter",
+    "overlay": "overlay",
+    "soft_light": "soft_light",
+    "hard_light": "hard_light",
+}
+
+
+def occupied_regions(overlay: Image, tiles: bool = True, tile: int = ROI_TILE_SIZE) -> list[tuple] | None:
+    """
+    The parts of the canvas an RGBA overlay can change, for region-of-interest compositing: a fully transparent
+    pixel composites to the pixel below it unchanged. That is the bounding box of its visible pixels, or with
+    `tiles`, when the box covers most of the canvas, the runs of `tile` px squares within it holding a visible
+    pixel. Squares are found by binarising the alpha and averaging it down in blocks, all in Pillow; as that is
+    a pass over the box, it only pays off for composites that cost more than a plain alpha composite.
+
+    :return: boxes covering every visible pixel, or None when they cover more than `ROI_MAX_COVERAGE` of it.
+    """
+    _width, _height = overlay.size
+    _limit = ROI_MAX_COVERAGE * _width * _height
+    # only the alpha channel of an RGBA image is scanned
+    _bbox = overlay.getbbox()
+    if _bbox is None:
+        return []
+    if (_bbox[2] - _bbox[0]) * (_bbox[3] - _bbox[1]) <= _limit:
+        return [_bbox]
+    if not tiles:
+        return None
+    _grid = (overlay if _bbox == (0, 0, _width, _height) else overlay.crop(_bbox)).getchannel('A')
+    _remaining = tile
+    while _remaining > 1:
+        _factor = min(16, _remaining)
+        _grid = _grid.point(_OCCUPIED).reduce(_factor)
+        _remaining //= _factor
+    _occupied = _grid.tobytes()
+    _columns = _grid.size[0]
+    _boxes = []
+    _area = 0
+    for row in range(_grid.size[1]):
+        _top, _bottom = _bbox[1] + row * tile, min(_bbox[1] + (row + 1) * tile, _bbox[3])
+        _start = None
+        for column in range(_columns + 1):
+            if column < _columns and _occupied[row * _columns + column]:
+                _start = column if _start is None else _start
+                continue
+            if _start is not None:
+                _boxes.append((_bbox[0] + _start * tile, _top, min(_bbox[0] + column * tile, _bbox[2]), _bottom))
+                _area += (_boxes[-1][2] - _boxes[-1][0]) * (_bottom - _top)
+                _start = None
+    if _area > _limit:
+        return None
+    return _boxes
+
+
+class PillowBackend:
+    """
+    Reference pixel backend. Tiling pastes the source across the canvas and every composite job is run through
+    `Image.alpha_composite` / `Image.composite` one pair at a time.
+
+    Unless `roi` is off, a `composite_layer()` layer is only composited over its `occupied_regions()` and the rest
+    of the buffer is left as it is, the same bytes for less work when the layer is a sparse decal on a large base.
+    A plain layer uses its bounding box; blended, faded and masked ones, which convert and combine whole canvases,
+    are split into occupied squares as well. `composite_many()` takes the whole canvas: Pillow's alpha composite
+    already copies transparent pixels through, as quickly as their bounding box can be found.
+    """
+    name: str = "pillow"
+
+    def __init__(self, roi: bool = True) -> None:
+        self.roi = roi
+
+    def regions(self, overlay: Image, tiles: bool) -> list[tuple[int, int, int, int]] | None:
+        """
+        The regions of interest of an RGBA overlay, None for the whole canvas. See `occupied_regions()`.
+        """
+        if not self.roi or overlay.mode != 'RGBA':
+            return None
+        return occupied_regions(overlay, tiles)
+
+    def tile(self, image: Image, size: tuple[int, int]) -> Image:
+        _canvas = Image.new('RGBA', size)
+        for i in range(0, _canvas.width, image.size[0]):
+            for j in range(0, _canvas.height, image.size[1]):
+                _canvas.paste(image, (i, j))
+        return _canvas
+
+    def composite_many(self, base: Image, layers: list[tuple[Image, Image | None]]) -> list[Image]:
+        """
+        Composite each `(overlay, mask)` layer onto `base` independently, returning one image per layer.
+        With a mask the base shows where the mask is opaque (`Image.composite`), without one the overlay is
+        alpha composited over the base.
+        """
+        _composited = []
+        for overlay, mask in layers:
+            if mask is not None:
+                _composited.append(Image.composite(base, overlay, mask))
+            else:
+                _composited.append(Image.alpha_composite(base, overlay))
+        return _composited
+
+    def composite_layer(self, buffer: Image, overlay: Image, mask: Image | None, blend: str, opacity: float) -> None:
+        """
+        Composite one layer onto an RGBA working buffer, in place. The overlay's colour is first blended with the
+        buffer by `blend`, its alpha scaled by `opacity`, then it is alpha composited over the buffer. As with
+        `composite_many`, the buffer is kept as it was wherever `mask` is opaque.
+        """
+        if blend not in BLEND_MODES.keys():
+            raise ValueError(f"Unsupported blend mode {blend!r}, expected one of {', '.join(BLEND_MODES.keys())}.")
+        _layer = overlay if overlay.mode == 'RGBA' else overlay.convert('RGBA')
+        _plain = BLEND_MODES[blend] is None and opacity >= 1.0 and mask is None
+        _regions = self.regions(_layer, not _plain) if _layer.size == buffer.size else None
+        if _regions is None:
+            self._composite_layer_region(buffer, _layer, mask, blend, opacity, _layer is overlay)
+            return
+        # every step below is per pixel and leaves the buffer as it is under a transparent layer pixel
+        for box in _regions:
+            _region = buffer.crop(box)
+            self._composite_layer_region(
+                _region, _layer.crop(box), mask.crop(box) if mask is not None else None, blend, opacity, False
+            )
+            buffer.paste(_region, box[:2])
+
+    @staticmethod
+    def _composite_layer_region(
+            buffer: Image, layer: Image, mask: Image | None, blend: str, opacity: float, shared: bool
+    ) -> None:
+        """
+        :param shared: whether `layer` is the caller's overlay itself, which must not be changed.
+        """
+        _layer = layer
+        if BLEND_MODES[blend] is not None:
+            _blend = getattr(ImageChops, BLEND_MODES[blend])
+            _blended = _blend(buffer.convert('RGB'), _layer.convert('RGB')).convert('RGBA')
+            _blended.putalpha(_layer.getchannel('A'))
+            _layer = _blended
+        if opacity < 1.0:
+            _layer = _layer.copy() if shared and _layer is layer else _layer
+            _layer.putalpha(_layer.getchannel('A').point([round(value * opacity) for value in range(256)]))
+        if mask is None:
+            buffer.alpha_composite(_layer)
+        else:
+            buffer.paste(Image.composite(buffer, Image.alpha_composite(buffer, _layer), mask))
+
+
+class NumpyBackend(PillowBackend):
+    """
+    Vectorised backend over the RGBA buffers. Tiling is a single `numpy.tile`, and all layers of a target are
+    stacked and blended against the shared base in one pass. The integer arithmetic mirrors Pillow's C
+    implementation, so outputs are byte-identical to `PillowBackend`. Anything other than RGBA inputs falls back
+    to the Pillow path. With `roi` on, a stack is only blended within the bounding box of its overlays' visible
+    pixels, the base is copied through around it.
+    """
+    name: str = "numpy"
+
+    def tile(self, image: Image, size: tuple[int, int]) -> Image:
+        _source = numpy.asarray(image if image.mode == 'RGBA' else image.convert('RGBA'))
+        _reps = (math.ceil(size[1] / _source.shape[0]), math.ceil(size[0] / _source.shape[1]), 1)
+        return Image.fromarray(numpy.ascontiguousarray(numpy.tile(_source, _reps)[:size[1], :size[0]]), 'RGBA')
+
+    def composite_many(self, base: Image, layers: list[tuple[Image, Image | None]]) -> list[Image]:
+        if base.mode != 'RGBA' or any(overlay.mode != 'RGBA' or overlay.size != base.size for overlay, _ in layers):
+            return super().composite_many(base, layers)
+
+        _base = numpy.asarray(base)[numpy.newaxis]
+        # the widest temporary is a uint32 colour buffer per layer
+        _stack_size = max(1, NUMPY_STACK_BUDGET_BYTES // max(1, _base.size * 4))
+
+        _composited: list[Image] = [None] * len(layers)
+        _unmasked = [idx for idx, (_, mask) in enumerate(layers) if mask is None]
+        _masked = [idx for idx, (_, mask) in enumerate(layers) if mask is not None]
+        for start in range(0, len(_unmasked), _stack_size):
+            _indices = _unmasked[start:start + _stack_size]
+            _left, _top, _right, _bottom = self._stack_box([layers[idx][0] for idx in _indices], base.size)
+            _overlays = numpy.stack([numpy.asarray(layers[idx][0])[_top:_bottom, _left:_right] for idx in _indices])
+            _blended = self._alpha_over(_base[:, _top:_bottom, _left:_right], _overlays)
+            for idx, out in zip(_indices, _blended):
+                if (_left, _top, _right, _bottom) != (0, 0) + base.size:
+                    _out = numpy.array(base)
+                    _out[_top:_bottom, _left:_right] = out
+                    out = _out
+                _composited[idx] = Image.fromarray(out, 'RGBA')
+        for start in range(0, len(_masked), _stack_size):
+            _indices = _masked[start:start + _stack_size]
+            _overlays = numpy.stack([numpy.asarray(layers[idx][0]) for idx in _indices])
+            _masks = numpy.stack([self._mask_values(layers[idx][1]) for idx in _indices]).astype(numpy.uint16)
+            for idx, out in zip(_indices, self._masked_blend(_base, _overlays, _masks[..., numpy.newaxis])):
+                _composited[idx] = Image.fromarray(out, 'RGBA')
+        return _composited
+
+    def _stack_box(self, overlays: list[Image], size: tuple[int, int]) -> tuple[int, int, int, int]:
+        """
+        The bounding box of every visible pixel of a stack of overlays, the whole canvas when `roi` is off.
+        """
+        if not self.roi:
+            return (0, 0) + size
+        _boxes = [box for box in (overlay.getbbox() for overlay in overlays) if box is not None]
+        if len(_boxes) == 0:
+            return 0, 0, 0, 0
+        return (
+            min(box[0] for box in _boxes), min(box[1] for box in _boxes),
+            max(box[2] for box in _boxes), max(box[3] for box in _boxes)
+        )
+
+    @staticmethod
+    def _mask_values(mask: Image):
+        if mask.mode == 'RGBA':
+            return numpy.asarray(mask.getchannel('A'))
+        if mask.mode == 'L':
+            return numpy.asarray(mask)
+        return numpy.asarray(mask.convert('L'))
+
+    @staticmethod
+    def _alpha_tables():
+        """
+        Lookup tables over every (source alpha, destination alpha) pair: the source colour weight in 7-bit fixed
+        point and the resulting alpha. Built once, they replace a per-pixel integer division.
+        """
+        global _ALPHA_TABLES
+        if _ALPHA_TABLES is None:
+            _src_a = numpy.arange(256, dtype=numpy.uint32)[:, numpy.newaxis]
+            _dst_a = numpy.arange(256, dtype=numpy.uint32)[numpy.newaxis, :]
+            _out_a255 = _src_a * 255 + _dst_a * (255 - _src_a)
+            _coef1 = (_src_a * (255 * 255 * 128) // numpy.maximum(_out_a255, 1)).astype(numpy.uint32)
+            _out_a = _out_a255 + 0x80
+            _out_a = (((_out_a >> 8) + _out_a) >> 8).astype(numpy.uint8)
+            _ALPHA_TABLES = (_coef1, _out_a)
+        return _ALPHA_TABLES
+
+    def _alpha_over(self, dst, src):
+        """
+        `Image.alpha_composite(dst, src)` for a stack of sources, in Pillow's 7-bit fixed point.
+        """
+        _coef1_table, _out_a_table = self._alpha_tables()
+        _src_a = src[..., 3]
+        _dst_a = numpy.broadcast_to(dst[..., 3], _src_a.shape)
+        _coef1 = _coef1_table[_src_a, _dst_a][..., numpy.newaxis]
+        _rgb = src[..., :3].astype(numpy.uint32) * _coef1
+        _rgb += dst[..., :3].astype(numpy.uint32) * (255 * 128 - _coef1)
+        _rgb += 0x80 << 7
+        _rgb += _rgb >> 8
+        _rgb >>= 15
+        _out = numpy.empty(src.shape, dtype=numpy.uint8)
+        _out[..., :3] = _rgb
+        _out[..., 3] = _out_a_table[_src_a, _dst_a]
+        # a fully transparent source pixel leaves the destination untouched
+        return numpy.where((_src_a == 0)[..., numpy.newaxis], dst, _out)
+
+    @staticmethod
+    def _masked_blend(base, overlay, mask):
+        """
+        `Image.composite(base, overlay, mask)` for a stack of overlays and masks. Every intermediate fits 16 bits.
+        """
+        _blend = overlay.astype(numpy.uint16) * (255 - mask)
+        _blend += base.astype(numpy.uint16) * mask
+        _blend += 128
+        _blend += _blend >> 8
+        _blend >>= 8
+        return _blend.astype(numpy.uint8)
+
+
+_backends: dict = {}
+
+
+def get_backend(name: str | None = None) -> PillowBackend:
+    """
+    Resolve a backend by name, falling back to Pillow when NumPy is not installed. With no name the
+    `build.backend` setting of the mod config is used.
+    """
+    if name is None:
+        name = mod_config.ModConfigLoader().build_option("backend", DEFAULT_BACKEND)
+    if name not in SUPPORTED_BACKENDS:
+        raise ValueError(f"Unsupported pixel backend {name}, expected one of {SUPPORTED_BACKENDS}.")
+    if name == "numpy" and numpy is None:
+        logger.AssetOutputPhaseLogger().log(
+            logger.LoggingSeverities.MEDIUM,
+            "NumPy backend requested but numpy is not installed, using the Pillow backend."
+        )
+        name = "pillow"
+    if name not in _backends.keys():
+        _backends[name] = NumpyBackend() if name == "numpy" else PillowBackend()
+    return _backends[name]
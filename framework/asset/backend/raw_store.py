@@ -0,0 +1,268 @@
+from __future__ import annotations
+import mmap
+import os
+import struct
+import threading
+import time
+
+import framework.phase_logger as logger
+import framework.context as context
+import framework.conf.mod_config as mod_config
+import framework.asset.backend.backend_meta_classes as backend_meta
+import framework.lazy as lazy
+
+Image = lazy.lazy_import("PIL.Image")
+
+DEFAULT_RAW_STORE_DIR = 'mod/build/.cache/raw/'
+# decoded sources smaller than this decode faster than they map, only large textures are stored
+DEFAULT_SOURCE_MIN_BYTES = 1024 * 1024
+# disk budget of the store, entries the last build did not use are removed, oldest first, to keep within it
+DEFAULT_RAW_STORE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+# entries used this long before a build started still count as used by it, for coarse filesystem timestamps
+PRUNE_SLACK_S = 2.0
+
+RAW_MAGIC = b"MRAW"
+RAW_FORMAT_VERSION = 1
+# magic, version, reserved, width, height, mode; padded so the pixels start on a 64 byte boundary
+RAW_HEADER = struct.Struct("<4sHHII8s")
+RAW_HEADER_SIZE = 64
+# modes whose `tobytes()` round-trips through `Image.frombuffer` without a palette or other side data
+STORABLE_MODES = ("L", "LA", "RGB", "RGBA")
+
+
+def image_nbytes(image: Image) -> int:
+    return image.size[0] * image.size[1] * len(image.getbands())
+
+
+class StoredImage:
+    """
+    A picklable reference to an image in the raw store, sent to worker processes in place of the pixels
+    themselves. `resolve()` maps the file in whichever process reads it.
+    """
+    __slots__ = ("path",)
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+
+def write_raw(path: str, image: Image) -> None:
+    """
+    Write an image as a header followed by its uncompressed pixels, atomically.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(_tmp_path, 'wb') as h:
+        h.write(RAW_HEADER.pack(
+            RAW_MAGIC, RAW_FORMAT_VERSION, 0, image.size[0], image.size[1], image.mode.encode("ascii")
+        ).ljust(RAW_HEADER_SIZE, b"\0"))
+        h.write(image.tobytes())
+    os.replace(_tmp_path, path)
+
+
+def open_raw(path: str) -> Image | None:
+    """
+    Map a raw store file read-only and wrap the mapping in an Image without decoding it. For L and RGBA the
+    image's pixels are the mapping itself (Pillow shares the buffer for those modes), pages are read from the OS
+    page cache as they are touched and the mapping is shared with every other process reading the same file.
+    :return: a read-only image, or None when the file is missing or not a raw store file of this version.
+    """
+    try:
+        with open(path, 'rb') as h:
+            _mapping = mmap.mmap(h.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        return None
+    if len(_mapping) < RAW_HEADER_SIZE:
+        return None
+    _magic, _version, _, _width, _height, _mode = RAW_HEADER.unpack_from(_mapping, 0)
+    _mode = _mode.rstrip(b"\0").decode("ascii")
+    if _magic != RAW_MAGIC or _version != RAW_FORMAT_VERSION or _mode not in STORABLE_MODES:
+        return None
+    if len(_mapping) != RAW_HEADER_SIZE + _width * _height * Image.getmodebands(_mode):
+        return None
+    return Image.frombuffer(
+        _mode, (_width, _height), memoryview(_mapping)[RAW_HEADER_SIZE:], "raw", _mode, 0, 1
+    )
+
+
+def touch(path: str) -> None:
+    """
+    Mark a cache file as used now, see `prune_dir()`.
+    """
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def prune_dir(
+        directory: str, suffix: str, used_since: float, max_bytes: int, keep_unused: bool = True
+) -> tuple[int, int]:
+    """
+    Remove the cache files in a directory that were not used since `used_since`, by mtime, which every read and
+    write of an entry refreshes. The oldest go first, until the rest fit in `max_bytes`, or every one of them
+    unless `keep_unused`. Files used since are kept even over budget, a running build may still have them mapped,
+    and a file that cannot be removed (mapped on Windows) is left for the next prune. Temporary files of
+    interrupted writes are always removed.
+
+    :return: the number of files removed and the bytes freed.
+    """
+    _unused = []
+    _total = 0
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            _stale_tmp = filename.endswith(".tmp")
+            if not _stale_tmp and not filename.endswith(suffix):
+                continue
+            _path = os.path.join(root, filename)
+            try:
+                _stat = os.stat(_path)
+            except FileNotFoundError:
+                continue
+            _total += _stat.st_size
+            if _stat.st_mtime < used_since:
+                # stale temporary files sort before every entry
+                _unused.append((0.0 if _stale_tmp else _stat.st_mtime, _stat.st_size, _path))
+    _removed = 0
+    _freed = 0
+    for mtime, size, path in sorted(_unused):
+        if mtime > 0.0 and keep_unused and _total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        _total -= size
+        _removed += 1
+        _freed += size
+    return _removed, _freed
+
+
+def resolve(image: Image | StoredImage | None) -> Image | None:
+    """
+    Worker-side counterpart of `RawImageStore.ref()`.
+    """
+    if isinstance(image, StoredImage):
+        return open_raw(image.path)
+    return image
+
+
+class RawImageStore(metaclass=backend_meta.RawImageStoreSingletonManager):
+    """
+    Content-addressed on-disk store of decoded and transformed images as uncompressed pixels behind a small header.
+    Reading an entry back maps the file instead of decoding a PNG, so a later build, or a worker process handed a
+    `StoredImage`, gets the pixels with no decode and (for L and RGBA) no copy.
+
+    Entries are keyed by content fingerprints (`LoadAsset.digest()` for sources, `ParseAsset.fingerprint()` for
+    transforms) and never change once written, so mapped files are never rewritten under a reader. Every use of
+    an entry refreshes its mtime. A build brackets itself with `begin()` and `end()`, and when the last running
+    build ends the entries none of them used are pruned down to `max_bytes`, or all of them unless `keep_unused`,
+    so stale fingerprints of edited sources and recipes do not pile up.
+
+    ## Instance Methods:
+        * self.get()
+        * self.put()
+        * self.ref()
+        * self.storable()
+        * self.begin()
+        * self.end()
+
+    ## Instance Vars:
+        * self.enabled
+        * self.store_dir
+        * self.sources
+        * self.source_min_bytes
+        * self.max_bytes
+        * self.keep_unused
+    """
+    enabled: bool = None
+    store_dir: str = None
+    sources: bool = None
+    source_min_bytes: int = None
+    max_bytes: int = None
+    keep_unused: bool = None
+
+    def __init__(self) -> None:
+        _config = mod_config.ModConfigLoader()
+        self.logger = logger.AssetModifyPhaseLogger()
+        self.enabled = bool(_config.build_option("raw_store.enabled", True))
+        self.store_dir = context.path(_config.build_option("raw_store.dir", DEFAULT_RAW_STORE_DIR))
+        self.sources = bool(_config.build_option("raw_store.sources", True))
+        self.source_min_bytes = int(_config.build_option("raw_store.source_min_bytes", DEFAULT_SOURCE_MIN_BYTES))
+        self.max_bytes = int(_config.build_option("raw_store.max_bytes", DEFAULT_RAW_STORE_MAX_BYTES))
+        self.keep_unused = bool(_config.build_option("raw_store.keep_unused", True))
+        # start times of the builds using the store, more than one under the build daemon
+        self._builds: list[float] = []
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.store_dir, key[:2], key + ".raw")
+
+    def storable(self, image: Image) -> bool:
+        return self.enabled and image.mode in STORABLE_MODES
+
+    def get(self, key: str) -> Image | None:
+        """
+        :return: the stored image mapped read-only, or None when there is no such entry.
+        """
+        if not self.enabled:
+            return None
+        _image = open_raw(self._path(key))
+        if _image is not None:
+            touch(self._path(key))
+        return _image
+
+    def put(self, key: str, image: Image) -> bool:
+        """
+        Store an image unless an entry for the key already exists.
+        :return: whether the image is in the store afterwards.
+        """
+        if not self.storable(image):
+            return False
+        _path = self._path(key)
+        if not os.path.exists(_path):
+            write_raw(_path, image)
+            self.logger.log(logger.LoggingSeverities.LOW, "Stored raw %s (%dx%d %s)", key, *image.size, image.mode)
+        else:
+            touch(_path)
+        return True
+
+    def ref(self, key: str) -> StoredImage | None:
+        """
+        :return: a reference a worker process can `resolve()`, or None when the key is not stored.
+        """
+        _path = self._path(key)
+        if not self.enabled or not os.path.exists(_path):
+            return None
+        touch(_path)
+        return StoredImage(_path)
+
+    def begin(self) -> float:
+        """
+        Register a build using the store.
+        :return: its start time, to hand to `end()`.
+        """
+        _started = time.time()
+        with self._lock:
+            self._builds.append(_started)
+        return _started
+
+    def end(self, started: float, prune: bool = True) -> float | None:
+        """
+        Unregister a build, and prune what it and the builds still running have not used.
+        :param prune: False when the build failed, as it may not have reached everything it uses.
+        :return: the time since which cache files count as used, None when nothing is to be pruned.
+        """
+        with self._lock:
+            self._builds.remove(started)
+            _used_since = min(self._builds + [started]) - PRUNE_SLACK_S
+        if not prune:
+            return None
+        if not self.enabled or not os.path.isdir(self.store_dir):
+            return _used_since
+        _removed, _freed = prune_dir(self.store_dir, ".raw", _used_since, self.max_bytes, self.keep_unused)
+        if _removed > 0:
+            self.logger.log(
+                logger.LoggingSeverities.LOW, "Pruned %d raw store files (%d bytes) unused by the last build",
+                _removed, _freed
+            )
+        return _used_since
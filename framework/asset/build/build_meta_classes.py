@@ -1,37 +1,23 @@
 from __future__ import annotations
-from threading import Lock
+import framework.context as context
 
 
-class AssetBuilderSingletonManager(type):
+class AssetBuilderSingletonManager(context.ContextSingletonManager):
     """
     Singleton metaclass for managing the AssetBuilder singleton.
     """
-    _instances = {}
 
-    _lock: Lock = Lock()
 
-    def __call__(cls, *args, **kwargs):
-        with cls._lock:
-            if cls not in cls._instances:
-                instance = super().__call__(*args, **kwargs)
-                cls._instances[cls] = instance
-        return cls._instances[cls]
+class BuildCacheSingletonManager(context.ContextSingletonManager):
+    """
+    Singleton metaclass for managing the BuildCache singleton.
+    """
 
 
-class LoadTableSingletonManager(type):
+class LoadTableSingletonManager(context.ContextSingletonManager):
     """
     Singleton metaclass for managing the LoadTable singleton.
     """
-    _instances = {}
-
-    _lock: Lock = Lock()
-
-    def __call__(cls, *args, **kwargs):
-        with cls._lock:
-            if cls not in cls._instances:
-                instance = super().__call__(*args, **kwargs)
-                cls._instances[cls] = instance
-        return cls._instances[cls]
 
 
 class LoadTable(metaclass=LoadTableSingletonManager):
@@ -0,0 +1,101 @@
+from __future__ import annotations
+import hashlib
+import json
+import os
+
+import framework.phase_logger as logger
+import framework.context as context
+import framework.asset.build.build_meta_classes as build_meta
+import framework.conf.mod_config as mod_config
+
+DEFAULT_MANIFEST_PATH = 'mod/build/.cache/build-manifest.json'
+CACHE_FORMAT_VERSION = 1
+
+
+class BuildCache(metaclass=build_meta.BuildCacheSingletonManager):
+    """
+    Content-addressed record of every output written by the AssetBuilder. Each output is keyed by its path and
+    stores a fingerprint of everything that went into it (source file hashes, the ordered on_load operations of
+    every asset involved and the job spec). A job whose fingerprint matches the manifest, and whose output file
+    is still on disk untouched, is skipped.
+
+    ## Instance Methods:
+        * self.job_fingerprint()
+        * self.is_fresh()
+        * self.record()
+        * self.save()
+
+    ## Instance Vars:
+        * self.enabled
+        * self.manifest_path
+        * self.manifest
+    """
+    enabled: bool = None
+    manifest_path: str = None
+    manifest: dict = None
+
+    def __init__(self) -> None:
+        _config = mod_config.ModConfigLoader()
+        self.logger = logger.AssetOutputPhaseLogger()
+        self.enabled = bool(_config.build_option("cache.enabled", True))
+        self.manifest_path = context.path(_config.build_option("cache.manifest", DEFAULT_MANIFEST_PATH))
+        self.manifest = {}
+        self._dirty = False
+
+        if self.enabled and os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r') as h:
+                _stored = json.load(h)
+            if _stored.get("version") == CACHE_FORMAT_VERSION:
+                self.manifest = _stored["outputs"]
+            else:
+                self.logger.log(
+                    logger.LoggingSeverities.MEDIUM,
+                    f"Discarding build cache manifest {self.manifest_path}, format version changed."
+                )
+
+    @staticmethod
+    def job_fingerprint(build_reference: str, output_type: str, job_spec: dict) -> str:
+        """
+        :param build_reference: the nickname of the build target the job belongs to.
+        :param output_type: the file type the job's output is saved as.
+        :param job_spec: a json-serialisable description of the job, including the fingerprints of every
+            asset it reads.
+        :return: hex digest string.
+        """
+        _blob = json.dumps(
+            [CACHE_FORMAT_VERSION, build_reference, output_type, job_spec],
+            sort_keys=True,
+            separators=(",", ":")
+        )
+        return hashlib.sha256(_blob.encode()).hexdigest()
+
+    def is_fresh(self, output_path: str, fingerprint: str) -> bool:
+        if not self.enabled or output_path not in self.manifest.keys():
+            return False
+        _entry = self.manifest[output_path]
+        if _entry["fingerprint"] != fingerprint or not os.path.exists(output_path):
+            return False
+        _stat = os.stat(output_path)
+        return _stat.st_size == _entry["size"] and _stat.st_mtime_ns == _entry["mtime_ns"]
+
+    def record(self, output_path: str, fingerprint: str) -> None:
+        if not self.enabled:
+            return
+        _stat = os.stat(output_path)
+        self.manifest[output_path] = {
+            "fingerprint": fingerprint,
+            "size": _stat.st_size,
+            "mtime_ns": _stat.st_mtime_ns
+        }
+        self._dirty = True
+
+    def save(self) -> None:
+        if not self.enabled or not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        _tmp_path = self.manifest_path + ".tmp"
+        with open(_tmp_path, 'w') as h:
+            json.dump({"version": CACHE_FORMAT_VERSION, "outputs": self.manifest}, h, indent=1, sort_keys=True)
+        os.replace(_tmp_path, self.manifest_path)
+        self._dirty = False
+        self.logger.log(logger.LoggingSeverities.LOW, "Saved build cache manifest to %s", self.manifest_path)
@@ -0,0 +1,123 @@
+from __future__ import annotations
+import contextvars
+
+import framework.conf.mod_config as mod_config
+import framework.lazy as lazy
+
+Image = lazy.lazy_import("PIL.Image")
+futures = lazy.lazy_import("concurrent.futures")
+
+# settings of `build.encoding` and `outputs.encoding`, a missing one keeps Pillow's own default
+ENCODING_KEYS = ("compress_level", "optimize", "colors")
+
+
+def is_release() -> bool:
+    """
+    Whether this is a release build (`build.release`, or `build --release`), which applies `build.encoding.release`.
+    """
+    return bool(mod_config.ModConfigLoader().build_option("release", False))
+
+
+class OutputEncoding:
+    """
+    How a build target writes its PNG outputs: the deflate level, Pillow's `optimize` search for the smallest
+    filter and deflate settings, and `colors` to quantise to a palette, which suits masks and line art. Resolved
+    from the global `build.encoding` settings, the target's own `outputs.encoding` over them, and in release builds
+    `build.encoding.release` over both. Settings left unset are not passed to Pillow, so an unconfigured build
+    writes exactly what a plain `Image.save()` does. Picklable, so worker processes write with the same settings.
+
+    ## Instance Methods:
+        * self.save()
+        * self.canonical()
+
+    ## Instance Vars:
+        * self.compress_level
+        * self.optimize
+        * self.colors
+        * self.default
+    """
+    __slots__ = ("compress_level", "optimize", "colors")
+
+    def __init__(self, compress_level: int | None = None, optimize: bool | None = None, colors: int | None = None):
+        self.compress_level = compress_level
+        self.optimize = optimize
+        self.colors = colors
+
+    @classmethod
+    def resolve(cls, target: dict | None = None) -> OutputEncoding:
+        """
+        :param target: a build target's `outputs.encoding`, as validated by the config compiler.
+        """
+        _config = mod_config.ModConfigLoader()
+        _layers = [_config.build_option("encoding") or {}, target or {}]
+        if is_release():
+            _layers.append(_config.build_option("encoding.release") or {})
+        _settings: dict = {}
+        for layer in _layers:
+            _settings.update({key: layer[key] for key in ENCODING_KEYS if layer.get(key) is not None})
+        return cls(
+            int(_settings["compress_level"]) if "compress_level" in _settings.keys() else None,
+            bool(_settings["optimize"]) if "optimize" in _settings.keys() else None,
+            int(_settings["colors"]) if "colors" in _settings.keys() else None
+        )
+
+    @property
+    def default(self) -> bool:
+        return self.compress_level is None and self.optimize is None and self.colors is None
+
+    def canonical(self) -> dict:
+        """
+        The settings as they change the written bytes, for the fingerprints of cached outputs.
+        """
+        return {"compress_level": self.compress_level, "optimize": self.optimize, "colors": self.colors}
+
+    def save(self, image: Image, path: str, output_type: str) -> None:
+        if output_type.lower() != "png":
+            image.save(path, output_type)
+            return
+        if self.colors is not None and image.mode != "P":
+            # Pillow picks the method by mode: median cut for RGB, fast octree (keeping alpha) for RGBA
+            image = image.quantize(colors=self.colors)
+        _options = {}
+        if self.compress_level is not None:
+            _options["compress_level"] = self.compress_level
+        if self.optimize is not None:
+            _options["optimize"] = self.optimize
+        image.save(path, output_type, **_options)
+
+
+class BackgroundEncoder:
+    """
+    Writes outputs on one background thread, in the order they are submitted, so a serial build composites its
+    next target while the previous one's outputs are deflated. Pillow's encoder releases the GIL, so the two run
+    at the same time. Each write runs in the BuildContext it was submitted from. The thread is started on the
+    first write, so a build with every output cached does not import `concurrent.futures` at all.
+
+    ## Instance Methods:
+        * self.submit()
+        * self.drain()
+        * self.close()
+    """
+    def __init__(self) -> None:
+        self._executor: futures.ThreadPoolExecutor | None = None
+        self._pending: list[futures.Future] = []
+
+    def submit(self, fn, *args) -> None:
+        if self._executor is None:
+            self._executor = futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="encoder")
+        self._pending.append(self._executor.submit(contextvars.copy_context().run, fn, *args))
+
+    def drain(self) -> None:
+        """
+        Wait for every submitted write, raising the first one that failed.
+        """
+        _pending, self._pending = self._pending, []
+        for future in _pending:
+            future.result()
+
+    def close(self) -> None:
+        try:
+            self.drain()
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
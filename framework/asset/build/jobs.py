@@ -1,17 +1,94 @@
 from __future__ import annotations
+import abc
+import hashlib
 import framework.asset.asset_on_load as on_load
+import framework.asset.backend.backends as backends
+import framework.asset.backend.raw_store as raw_store
 import framework.asset.build.build_meta_classes as build_meta
+import framework.asset.build.planner as planner
 import framework.asset.manager.manager as manager
+import framework.asset.on_load.memo as memo
+import framework.lazy as lazy
 
+Image = lazy.lazy_import("PIL.Image")
 
-class AbstractAssetTask:
+
+def composite_images(base: Image, overlay: Image, mask: Image | None, backend: str | None = None) -> Image:
+    """
+    The pixel work of a `composite-with` job. Kept free of any framework state so worker processes produce
+    the same bytes as the serial path.
+    """
+    return backends.get_backend(backend).composite_many(base, [(overlay, mask)])[0]
+
+
+def _pixels(source) -> Image | None:
+    """
+    An image given directly, as a raw store reference, or as the asset to read it from (only when needed).
+    """
+    if source is None or isinstance(source, Image.Image):
+        return source
+    if isinstance(source, raw_store.StoredImage):
+        return raw_store.resolve(source)
+    return source.modified_image
+
+
+def composite_layer_stack(
+        base,
+        layers: list[tuple],
+        prefix_keys: list[str],
+        shared: set[int],
+        backend: str | None = None
+) -> Image:
+    """
+    The pixel work of a `composite-layers` job: every layer accumulated, in order, into one RGBA working buffer.
+    Partial stacks at the `shared` depths are kept in the TransformMemo under their `prefix_keys`, and the
+    deepest one already there is taken as the starting buffer, so jobs sharing a layer prefix composite it once.
+    Like `composite_images`, this is free of framework state so worker processes can run it.
+
+    :param base: the target's `use` image, a `raw_store.StoredImage` or the asset to read it from.
+    :param layers: (overlay, mask, blend mode, opacity) per layer, images given like `base`. Nothing is read for
+        the layers of a memoised prefix.
+    :param prefix_keys: the key of the stack after each layer, see `LayeredCompositor.prefix_keys()`.
+    :param shared: the depths worth keeping, see `BuildPlanner.shared_prefixes()`.
+    """
+    _memo = memo.TransformMemo()
+    _backend = backends.get_backend(backend)
+    _buffer = None
+    _start = 0
+    for depth in sorted(shared, reverse=True):
+        _stack = _memo.get(prefix_keys[depth])
+        if _stack is not None:
+            # memoised stacks are shared, and may be read-only mappings, so work on a copy
+            _buffer = _stack.copy()
+            _start = depth + 1
+            break
+    if _buffer is None:
+        _base = _pixels(base)
+        _buffer = _base.copy() if _base.mode == 'RGBA' else _base.convert('RGBA')
+    for depth in range(_start, len(layers)):
+        _overlay, _mask, _blend, _opacity = layers[depth]
+        _backend.composite_layer(_buffer, _pixels(_overlay), _pixels(_mask), _blend, _opacity)
+        if depth in shared:
+            _memo.put(prefix_keys[depth], _buffer.copy())
+    return _buffer
+
+
+class AbstractAssetTask(abc.ABC):
     def __init__(self, handler_ref: tuple[int, str]):
+        # a loaded asset, or the output of an earlier build target (`asset_build.BuiltAssetOutput`)
         self.composite_mask: on_load.ParseAsset | None = None
         self.asset_to_composite_with: on_load.ParseAsset | None = None
         self.naming_map: dict | None = None
         self.manager = manager.AssetManager()
         self.handler = handler_ref
 
+    @abc.abstractmethod
+    def spec(self) -> dict:
+        """
+        A json-serialisable description of the job and the fingerprints of the assets it reads, used by the
+        build cache.
+        """
+
 
 class AssetCompositor(AbstractAssetTask):
     def __init__(self, handler_ref: tuple[int, str], job_dict: dict):
@@ -24,7 +101,7 @@ class AssetCompositor(AbstractAssetTask):
         _composite_target: str = job_dict["asset"].strip()
         self.asset_to_composite_with = self.manager.get(_composite_target)
 
-        _mask_target: str = job_dict["mask"].strip()
+        _mask_target: str = str(job_dict.get("mask", "none")).strip()
         if _mask_target == "none":
             self.composite_mask = None
         else:
@@ -33,11 +110,90 @@ class AssetCompositor(AbstractAssetTask):
         self.manager.register_substitution(
             self.handler,
             "$composite-target$",
-            self.asset_to_composite_with.asset.nickname
+            planner.reference_name(_composite_target)
+        )
+        if self.composite_mask is not None:
+            self.manager.register_substitution(
+                self.handler,
+                "$mask-target$",
+                planner.reference_name(_mask_target)
+            )
+
+    def spec(self) -> dict:
+        return {
+            "composite-with": {
+                "asset": self.asset_to_composite_with.fingerprint(),
+                "mask": self.composite_mask.fingerprint() if self.composite_mask is not None else None
+            }
+        }
+
+
+class LayeredCompositor(AbstractAssetTask):
+    class UnsupportedBlendModeException(Exception):
+        def __init__(self, *args) -> None:
+            super().__init__(*args)
+
+    def __init__(self, handler_ref: tuple[int, str], job_dict: dict, shared: set[int] | None = None):
+        """
+        A `composite-layers` job: an ordered list of layers, each an asset with an optional mask, blend mode
+        (see `backends.BLEND_MODES`) and opacity, accumulated onto the target's `use` asset and saved once.
+        The name placeholders are taken from the last layer.
+        :param job_dict:
+        :param shared: the depths whose partial stacks other jobs share, see `BuildPlanner.shared_prefixes()`.
+        """
+        super().__init__(handler_ref)
+        self.shared: set[int] = shared if shared is not None else set()
+        self.layers: list[tuple[on_load.ParseAsset, on_load.ParseAsset | None, str, float]] = []
+        _layers = planner.job_layers({"composite-layers": job_dict})
+        for layer in _layers:
+            if layer["blend"] not in backends.BLEND_MODES.keys():
+                raise self.UnsupportedBlendModeException(
+                    f"Unsupported blend mode {layer['blend']!r} in {handler_ref[1]}, expected one of "
+                    f"{', '.join(backends.BLEND_MODES.keys())}."
+                )
+            self.layers.append((
+                self.manager.get(layer["asset"]),
+                self.manager.get(layer["mask"]) if layer["mask"] != "none" else None,
+                layer["blend"],
+                layer["opacity"]
+            ))
+        _last = _layers[-1]
+        self.asset_to_composite_with = self.layers[-1][0]
+        self.composite_mask = self.layers[-1][1]
+
+        self.manager.register_substitution(
+            self.handler,
+            "$composite-target$",
+            planner.reference_name(_last["asset"])
         )
         if self.composite_mask is not None:
             self.manager.register_substitution(
                 self.handler,
                 "$mask-target$",
-                self.composite_mask.asset.nickname
+                planner.reference_name(_last["mask"])
             )
+
+    def _layer_specs(self) -> list[dict]:
+        return [
+            {
+                "asset": asset.fingerprint(),
+                "mask": mask.fingerprint() if mask is not None else None,
+                "blend": blend,
+                "opacity": opacity
+            }
+            for asset, mask, blend, opacity in self.layers
+        ]
+
+    def prefix_keys(self, base: on_load.ParseAsset) -> list[str]:
+        """
+        A key per depth identifying the partial stack of `base` and the layers up to it, by content.
+        """
+        _hash = hashlib.sha256(f"stack:{base.fingerprint()}".encode())
+        _keys = []
+        for layer in self._layer_specs():
+            _hash.update(repr(sorted(layer.items())).encode())
+            _keys.append(_hash.copy().hexdigest())
+        return _keys
+
+    def spec(self) -> dict:
+        return {"composite-layers": self._layer_specs()}
@@ -0,0 +1,103 @@
+from __future__ import annotations
+import os
+
+import framework.asset.build.encoding as encoding
+import framework.lazy as lazy
+
+Image = lazy.lazy_import("PIL.Image")
+
+# the `resolutions` key written without a prefix, every other key is prefixed to the file name (`hr-<name>.png`)
+UNPREFIXED_RESOLUTION = "normal"
+
+
+def output_variants(output_path: str, resolutions: dict | None) -> list[tuple[str, float]]:
+    """
+    The files one job output is written as, largest first.
+
+    :param output_path: the job's `<dir>/<name>.png`.
+    :param resolutions: the target's `outputs.resolutions`, prefix -> scale relative to the composite.
+    :return: (path, scale) pairs. Without `resolutions` that is the output path at full scale.
+    """
+    if not resolutions:
+        return [(output_path, 1.0)]
+    _dir, _filename = os.path.split(output_path)
+    _variants = [
+        (output_path if prefix == UNPREFIXED_RESOLUTION else os.path.join(_dir, f"{prefix}-{_filename}"), float(scale))
+        for prefix, scale in resolutions.items()
+    ]
+    return sorted(_variants, key=lambda variant: -variant[1])
+
+
+def level_size(size: tuple[int, int], scale: float) -> tuple[int, int]:
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+def strip_width(width: int, levels: int) -> int:
+    return sum(max(1, width >> level) for level in range(levels))
+
+
+def strip_level_width(total_width: int, levels: int) -> int:
+    """
+    The width of the full size level of a mipmap strip `total_width` wide.
+    """
+    for width in range(total_width // 2, total_width + 1):
+        if strip_width(width, levels) == total_width:
+            return width
+    return total_width
+
+
+class DownsampleChain:
+    """
+    Every smaller version of one image, each derived from the closest larger one already made, so an output
+    written at several resolutions with mipmaps resamples each pixel once per halving rather than once per file.
+    Exact halvings use `Image.reduce(2)` (a 2x2 box filter), other sizes a BOX resize. Pillow premultiplies alpha
+    for both, so transparent pixels do not darken their neighbours.
+
+    ## Instance Methods:
+        * self.level()
+        * self.strip()
+    """
+    def __init__(self, image: Image) -> None:
+        self.levels: dict[tuple[int, int], Image] = {image.size: image}
+
+    def level(self, size: tuple[int, int]) -> Image:
+        if size not in self.levels.keys():
+            _source = min(
+                (image for image in self.levels.values() if image.size[0] >= size[0] and image.size[1] >= size[1]),
+                key=lambda image: image.size[0] * image.size[1]
+            )
+            if (_source.size[0] == size[0] * 2) and (_source.size[1] == size[1] * 2):
+                self.levels[size] = _source.reduce(2)
+            else:
+                self.levels[size] = _source.resize(size, Image.Resampling.BOX)
+        return self.levels[size]
+
+    def strip(self, size: tuple[int, int], levels: int) -> Image:
+        """
+        The Factorio mipmap layout: `levels` successive halvings of the image at `size`, top aligned left to right.
+        """
+        _strip = Image.new(self.levels[next(iter(self.levels))].mode, (strip_width(size[0], levels), size[1]))
+        _x = 0
+        for level in range(levels):
+            _level = self.level((max(1, size[0] >> level), max(1, size[1] >> level)))
+            _strip.paste(_level, (_x, 0))
+            _x += _level.size[0]
+        return _strip
+
+
+def write_variants(
+        image: Image,
+        variants: list[tuple[str, float]],
+        mipmaps: int,
+        output_type: str,
+        output_encoding: encoding.OutputEncoding | None = None
+) -> None:
+    """
+    Write a composited output at every resolution variant, as a mipmap strip when `mipmaps` is above 1.
+    """
+    _encoding = output_encoding or encoding.OutputEncoding()
+    _chain = DownsampleChain(image)
+    for path, scale in variants:
+        _size = level_size(image.size, scale)
+        _image = _chain.strip(_size, mipmaps) if mipmaps > 1 else _chain.level(_size)
+        _encoding.save(_image, path, output_type)
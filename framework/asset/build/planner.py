@@ -0,0 +1,293 @@
+from __future__ import annotations
+import json
+import os
+
+import framework.context as context
+import framework.asset.asset_load as loader
+import framework.asset.asset_on_load as on_load
+import framework.asset.build.build_helpers as helpers
+import framework.asset.manager.manager as manager
+import framework.asset.load.compiler as compiler
+import framework.lazy as lazy
+
+Image = lazy.lazy_import("PIL.Image")
+
+# placeholders a compositing job defines for its own output name from its (last) layer, see `jobs.AssetCompositor`
+JOB_PLACEHOLDERS: dict = {"asset": "$composite-target$", "mask": "$mask-target$"}
+
+
+def reference_name(reference: str) -> str:
+    """
+    The nickname part of a `phase.nickname` reference.
+    """
+    return reference.strip().split(".", 1)[1]
+
+
+def job_layers(job: dict) -> list[dict]:
+    """
+    The layers a build job composites onto its target's `use` asset, in order, with every optional key filled in.
+    A `composite-with` job is a single layer, a `composite-layers` job lists them under `layers`.
+    """
+    _kind, _spec = next(iter(job.items()))
+    _layers = _spec["layers"] if _kind == "composite-layers" else [_spec]
+    return [
+        {
+            "asset": layer["asset"].strip(),
+            "mask": str(layer.get("mask", "none")).strip(),
+            "blend": str(layer.get("blend", "normal")).strip(),
+            "opacity": float(layer.get("opacity", 1.0))
+        }
+        for layer in _layers
+    ]
+
+
+def target_references(target_spec: dict) -> list[str]:
+    """
+    Every asset nickname a build target reads, in order: its `use` asset and each job's layer assets and masks.
+    """
+    _nicknames = [target_spec["use"].strip()]
+    for job in target_spec["jobs"]:
+        for layer in job_layers(job):
+            _nicknames.append(layer["asset"])
+            if layer["mask"] != "none":
+                _nicknames.append(layer["mask"])
+    return list(dict.fromkeys(_nicknames))
+
+
+class BuildPlanner:
+    """
+    The dependency graph of the `load` and `build` tables. Nodes are `load.*` sources, `build.*` outputs and the
+    build targets producing them; a target depends on every nickname it `use`s, composites with or masks by, and
+    through `build.*` outputs on the targets that produce them. Everything is worked out from the yaml alone, so
+    missing references, duplicate outputs and cycles are reported before any pixels are decoded.
+
+    The scheduler runs `self.waves` in order, the watcher asks `self.dependents()` what a change invalidates and
+    `self.dry_run()` reports what a build would do without doing it.
+
+    ## Instance Methods:
+        * self.references()
+        * self.dependents()
+        * self.shared_prefixes()
+        * self.dry_run()
+
+    ## Instance Vars:
+        * self.load_table
+        * self.build_table
+        * self.load_entries
+        * self.entries
+        * self.outputs
+        * self.producers
+        * self.requires
+        * self.order
+        * self.waves
+    """
+    class MissingReferenceError(Exception):
+        def __init__(self, *args) -> None:
+            super().__init__(*args)
+
+    class DuplicateOutputError(Exception):
+        def __init__(self, *args) -> None:
+            super().__init__(*args)
+
+    class DependencyCycleError(Exception):
+        def __init__(self, *args) -> None:
+            super().__init__(*args)
+
+    def __init__(
+            self, load_table: dict, build_table: dict, compiled: compiler.AssetsConfigCompiler | None = None
+    ) -> None:
+        """
+        :param compiled: the tables already compiled (see `AssetLoader.compiled`), otherwise they are compiled here.
+        """
+        self.load_table = load_table
+        self.build_table = build_table
+        if compiled is None:
+            compiled = compiler.AssetsConfigCompiler({"load": load_table, "build": build_table})
+        self.load_entries: dict[str, compiler.LoadEntry] = compiled.load
+        self.entries: dict[str, compiler.BuildEntry] = compiled.build
+        self.manager = manager.AssetManager()
+
+        self.outputs: dict[str, list[str]] = {}
+        self.producers: dict[str, str] = {}
+        for target, spec in self.build_table.items():
+            self.outputs[target] = self._output_names(target, spec)
+            for name in self.outputs[target]:
+                if f"build.{name}" in self.producers.keys():
+                    raise self.DuplicateOutputError(
+                        f"Build targets {self.producers[f'build.{name}']} and {target} both output build.{name}."
+                    )
+                self.producers[f"build.{name}"] = target
+
+        self.requires: dict[str, list[str]] = {}
+        for target in self.build_table.keys():
+            self.requires[target] = []
+            for nickname in self.references(target):
+                if nickname in self.producers.keys():
+                    if self.producers[nickname] not in self.requires[target]:
+                        self.requires[target].append(self.producers[nickname])
+                elif not (nickname.startswith("load.") and reference_name(nickname) in self.load_entries.keys()):
+                    raise self.MissingReferenceError(
+                        f"Build target {target} references {nickname}, which no load entry or build target provides."
+                    )
+
+        self.order: list[str] = self._topological_order()
+        self.waves: list[list[str]] = self._waves()
+        self.prefix_counts: dict[str, int] = self._count_prefixes()
+
+    def references(self, target: str) -> list[str]:
+        return self.entries[target].references
+
+    def dependents(self, nicknames: set[str]) -> list[str]:
+        """
+        Every build target that reads one of the given nicknames, directly or through the outputs of other
+        affected targets, in execution order.
+        """
+        _affected: set[str] = set()
+        for target in self.order:
+            if set(self.references(target)) & nicknames or set(self.requires[target]) & _affected:
+                _affected.add(target)
+        return [target for target in self.order if target in _affected]
+
+    def _prefix_signatures(self, target: str, job_idx: int) -> list[str]:
+        _spec = self.build_table[target]
+        _layers = job_layers(_spec["jobs"][job_idx])
+        return [
+            json.dumps([_spec["use"].strip(), _layers[:depth + 1]], sort_keys=True) for depth in range(len(_layers))
+        ]
+
+    def _count_prefixes(self) -> dict[str, int]:
+        _counts: dict[str, int] = {}
+        for target, spec in self.build_table.items():
+            for job_idx, job in enumerate(spec["jobs"]):
+                # composite-with jobs are batched against their base instead, see `BuildAsset.batch_runner()`
+                if "composite-layers" not in job.keys():
+                    continue
+                for signature in self._prefix_signatures(target, job_idx):
+                    _counts[signature] = _counts.get(signature, 0) + 1
+        return _counts
+
+    def shared_prefixes(self, target: str, job_idx: int) -> set[int]:
+        """
+        The depths (as the index of the last layer) at which a job's partial layer stack is worth keeping: those
+        it shares with another job of the build, where the jobs sharing it go on to differ. Keeping only these
+        branch points means one stored stack per fork, rather than one per shared layer.
+        """
+        _signatures = self._prefix_signatures(target, job_idx)
+        _counts = [self.prefix_counts.get(signature, 0) for signature in _signatures] + [0]
+        return {
+            depth for depth in range(len(_signatures)) if _counts[depth] > 1 and _counts[depth] > _counts[depth + 1]
+        }
+
+    def _output_names(self, target: str, spec: dict) -> list[str]:
+        _names = []
+        for idx, job in enumerate(spec["jobs"]):
+            _name = spec["outputs"]["name"]
+            _layer = job_layers(job)[-1]
+            for key, placeholder in JOB_PLACEHOLDERS.items():
+                if _layer[key] != "none":
+                    _name = _name.replace(placeholder, reference_name(_layer[key]))
+            if len(helpers.SUBSTITUTION_PATTERN.findall(_name)) > 0:
+                _name = self.manager.substitute((idx, target), _name)
+            _names.append(_name)
+        return _names
+
+    def _topological_order(self) -> list[str]:
+        _order: list[str] = []
+        _state: dict[str, str] = {}
+
+        def _visit(target: str, path: list[str]) -> None:
+            if _state.get(target) == "done":
+                return
+            if _state.get(target) == "visiting":
+                _cycle = path[path.index(target):] + [target]
+                raise self.DependencyCycleError(f"Build targets depend on each other: {' -> '.join(_cycle)}.")
+            _state[target] = "visiting"
+            for upstream in self.requires[target]:
+                _visit(upstream, path + [target])
+            _state[target] = "done"
+            _order.append(target)
+
+        for target in self.build_table.keys():
+            _visit(target, [])
+        return _order
+
+    def _waves(self) -> list[list[str]]:
+        _level: dict[str, int] = {}
+        for target in self.order:
+            _level[target] = 1 + max((_level[upstream] for upstream in self.requires[target]), default=-1)
+        _waves: list[list[str]] = [[] for _ in range(max(_level.values(), default=-1) + 1)]
+        # each wave keeps yaml order, so a table without build.* references runs exactly as listed
+        for target in self.build_table.keys():
+            _waves[_level[target]].append(target)
+        return _waves
+
+    def estimated_size(self, nickname: str) -> tuple[int, int]:
+        """
+        The size of an asset after its on_load operations, worked out from the source file header. A `build.*`
+        output has the size of the `use` asset of the target producing it.
+        """
+        if nickname in self.producers.keys():
+            return self.estimated_size(self.entries[self.producers[nickname]].use)
+        _entry = self.load_entries[reference_name(nickname)]
+        with Image.open(context.path(loader.BUILDABLE_ASSETS_PATH, _entry.path)) as h:
+            _size = h.size
+        for op in _entry.operations:
+            if op.function in (on_load.SupportedOnLoadFunctions.SCALE, on_load.SupportedOnLoadFunctions.TILE):
+                if op.resolution is not None:
+                    _x, _y = op.resolution.get_tup()
+                    _size = (_x if _x != -1 else _size[0], _y if _y != -1 else _size[1])
+                else:
+                    _size = (_size[0] * op.box.tup[2], _size[1] * op.box.tup[3])
+            elif op.function == on_load.SupportedOnLoadFunctions.CROP:
+                if op.resolution is not None:
+                    _x, _y = op.resolution.get_tup()
+                    _size = (_x if _x != -1 else _size[0], _y if _y != -1 else _size[1])
+                else:
+                    _size = (op.box.tup[2] - op.box.tup[0], op.box.tup[3] - op.box.tup[1])
+        return _size
+
+    def dry_run(self) -> list[str]:
+        """
+        Plan every target against the build cache without running it, and describe the result: which outputs
+        would be rebuilt or skipped, and an estimate of the pixels the rebuild would touch (on_load transforms of
+        every source a rebuilt output reads, plus one pass over the canvas per composited layer and mask).
+        Requires the `load.*` assets to be registered in the AssetManager; nothing is decoded or written.
+        :return: report lines.
+        """
+        import framework.asset.asset_build as asset_build
+
+        _lines: list[str] = []
+        _sources: set[str] = set()
+        _composite_px = 0
+        _rebuilt = 0
+        for wave_idx, wave in enumerate(self.waves):
+            _lines.append(f"wave {wave_idx}:")
+            for target in wave:
+                _build_asset = asset_build.BuildAsset(self.entries[target], self)
+                _pending = {name for name, _, _, _ in _build_asset.pending}
+                _canvas = self.estimated_size(self.build_table[target]["use"].strip())
+                for (name, _), _spec in zip(_build_asset.jobs, self.build_table[target]["jobs"]):
+                    _reads = [self.build_table[target]["use"].strip()]
+                    for layer in job_layers(_spec):
+                        _reads.append(layer["asset"])
+                        if layer["mask"] != "none":
+                            _reads.append(layer["mask"])
+                    if name in _pending:
+                        _rebuilt += 1
+                        _composite_px += _canvas[0] * _canvas[1] * (len(_reads) - 1)
+                        _sources.update(nickname for nickname in _reads if nickname.startswith("load."))
+                        _lines.append(
+                            f"  rebuild  build.{name:<40} {_canvas[0]}x{_canvas[1]}  reads {', '.join(_reads)}"
+                        )
+                    else:
+                        _lines.append(f"  fresh    build.{name:<40} {_canvas[0]}x{_canvas[1]}")
+                _build_asset.register_outputs()
+        _load_px = sum(
+            self.estimated_size(nickname)[0] * self.estimated_size(nickname)[1] for nickname in sorted(_sources)
+        )
+        _lines.append(
+            f"{_rebuilt} of {sum(len(names) for names in self.outputs.values())} outputs would be rebuilt, "
+            f"{len(_sources)} sources transformed; estimated pixel work {(_load_px + _composite_px) / 1e6:.2f} MPx "
+            f"({_load_px / 1e6:.2f} MPx on_load, {_composite_px / 1e6:.2f} MPx composite)."
+        )
+        return _lines
@@ -0,0 +1,230 @@
+from __future__ import annotations
+import os
+
+import framework.conf.mod_config as mod_config
+
+import framework.phase_logger as logger
+import framework.context as context
+import framework.asset.asset_load as loader
+import framework.asset.asset_on_load as on_load
+import framework.asset.asset_build as asset_build
+import framework.asset.build.jobs as jobs
+import framework.asset.build.mipmaps as mipmaps
+import framework.asset.build.encoding as encoding
+import framework.asset.backend.raw_store as raw_store
+import framework.asset.build.planner as planner
+import framework.asset.load.compiler as compiler
+import framework.asset.on_load.memo as memo
+import framework.asset.manager.manager as manager
+import framework.profiler as profiler
+import framework.lazy as lazy
+
+futures = lazy.lazy_import("concurrent.futures")
+Image = lazy.lazy_import("PIL.Image")
+
+
+def resolve_worker_count(setting: int | str | None) -> int:
+    """
+    Turn the `build.jobs` setting into a worker count. `auto` (or 0) uses every core, anything below 1 means
+    a serial build.
+    """
+    if setting is None:
+        return 1
+    if setting == "auto" or setting == 0:
+        return os.cpu_count() or 1
+    return max(1, int(setting))
+
+
+def composite_and_save(
+        base: Image | raw_store.StoredImage,
+        overlay: Image | raw_store.StoredImage,
+        mask: Image | raw_store.StoredImage | None,
+        output_path: str,
+        variants: list[tuple[str, float]],
+        mipmap_levels: int,
+        output_type: str,
+        output_encoding: encoding.OutputEncoding,
+        backend: str,
+        profile: bool,
+        root: str
+) -> tuple[str, list[dict]]:
+    """
+    Worker entry point. Runs in a child process, so it must stay a module level function of picklable arguments.
+    The job runs in this process's BuildContext for `root`, the root of the context that dispatched it.
+    :return: the output path and, when profiling, the worker's stage records.
+    """
+    _name = f"build.{os.path.splitext(os.path.basename(output_path))[0]}"
+    _composite_timer = profiler.StageTimer(_name, "composite")
+    _save_timer = profiler.StageTimer(_name, "save")
+    with context.BuildContext.for_root(root):
+        with _composite_timer:
+            _composited = jobs.composite_images(
+                raw_store.resolve(base), raw_store.resolve(overlay), raw_store.resolve(mask), backend
+            )
+        with _save_timer:
+            mipmaps.write_variants(_composited, variants, mipmap_levels, output_type, output_encoding)
+    return output_path, [_composite_timer.record, _save_timer.record] if profile else []
+
+
+def composite_layers_and_save(
+        base: Image | raw_store.StoredImage,
+        layers: list[tuple],
+        prefix_keys: list[str],
+        shared: set[int],
+        output_path: str,
+        variants: list[tuple[str, float]],
+        mipmap_levels: int,
+        output_type: str,
+        output_encoding: encoding.OutputEncoding,
+        backend: str,
+        profile: bool,
+        root: str
+) -> tuple[str, list[dict]]:
+    """
+    Worker entry point for `composite-layers` jobs, see `composite_and_save`. Partial stacks are shared with
+    other workers and later builds through the raw store.
+    """
+    _name = f"build.{os.path.splitext(os.path.basename(output_path))[0]}"
+    _composite_timer = profiler.StageTimer(_name, "composite")
+    _save_timer = profiler.StageTimer(_name, "save")
+    with context.BuildContext.for_root(root):
+        with _composite_timer:
+            _composited = jobs.composite_layer_stack(base, layers, prefix_keys, shared, backend)
+        with _save_timer:
+            mipmaps.write_variants(_composited, variants, mipmap_levels, output_type, output_encoding)
+    return output_path, [_composite_timer.record, _save_timer.record] if profile else []
+
+
+def transform_batch_member(entry: compiler.LoadEntry, profile: bool, root: str) -> tuple[str, list[dict]]:
+    """
+    Worker entry point for one file of a batch load entry, see `composite_and_save`. The transformed image is left
+    in the TransformMemo, where the dispatching process's ParseAsset of the same fingerprint finds it.
+    :return: the file's nickname and, when profiling, the worker's stage record.
+    """
+    _timer = profiler.StageTimer(f"load.{entry.nickname}", "on_load")
+    with context.BuildContext.for_root(root):
+        with _timer:
+            _ = on_load.ParseAsset(loader.LoadAsset(entry)).modified_image
+    return entry.nickname, [_timer.record] if profile else []
+
+
+class BuildScheduler:
+    """
+    Runs the waves of a `BuildPlanner` in order, each wave's jobs in a process pool when more than one worker is
+    configured. Every target in a wave depends only on targets of earlier waves, so a wave's jobs are independent
+    of each other and a target's `BuildAsset` is only constructed once every `build.*` output it reads is on disk.
+
+    Before the first wave, the files of batch load entries (see `compiler.AssetsConfigCompiler`) that the build
+    reads are transformed across the same pool, rather than one at a time as the jobs reading them are dispatched.
+
+    A serial build writes outputs on a BackgroundEncoder (unless `build.encoding.background` is off), so each
+    target is composited while the previous one is still being deflated. Every write is finished by the time
+    `self.run()` returns.
+
+    In streaming mode (`build.streaming`) every target retains the nicknames it reads in the AssetManager before
+    the build starts, and releases them once its outputs are saved, so each transformed image is freed as soon as
+    its last consumer is done with it.
+
+    ## Instance Methods:
+        * self.run()
+
+    ## Instance Vars:
+        * self.plan
+        * self.targets
+        * self.workers
+        * self.waves
+    """
+    def __init__(self, plan: planner.BuildPlanner, workers: int = 1, targets: list[str] | None = None) -> None:
+        """
+        :param plan: the dependency graph of the build table.
+        :param workers: worker processes, a serial build below 2.
+        :param targets: build only these targets, every target of the plan when None.
+        """
+        self.plan = plan
+        self.targets: list[str] = [
+            target for target in self.plan.order if targets is None or target in targets
+        ]
+        self.workers = workers
+        self.waves: list[list[str]] = []
+        self.logger = logger.AssetOutputPhaseLogger()
+        self.manager = manager.AssetManager()
+        self.streaming: bool = bool(mod_config.ModConfigLoader().build_option("streaming", False))
+        self.background_encoding: bool = bool(mod_config.ModConfigLoader().build_option("encoding.background", True))
+
+    def run(self) -> list[asset_build.BuildAsset]:
+        _built: list[asset_build.BuildAsset] = []
+        _pool = futures.ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        # worker processes write their own outputs, only a serial build saves on the calling process
+        _encoder = encoding.BackgroundEncoder() if _pool is None and self.background_encoding else None
+        if self.streaming:
+            for build_target in self.targets:
+                for nickname in self.plan.references(build_target):
+                    self.manager.retain(nickname)
+        try:
+            if _pool is not None:
+                self._transform_batches(_pool)
+            for plan_wave in self.plan.waves:
+                _wave = [self._plan_target(target) for target in plan_wave if target in self.targets]
+                if len(_wave) == 0:
+                    continue
+                self.waves.append([target.build_reference for target in _wave])
+                if _pool is None:
+                    for target in _wave:
+                        target.run(_encoder)
+                        self._release(target)
+                else:
+                    self._run_wave_in_pool(_pool, _wave)
+                _built.extend(_wave)
+        finally:
+            if _encoder is not None:
+                _encoder.close()
+            if _pool is not None:
+                _pool.shutdown()
+        return _built
+
+    def _transform_batches(self, pool: futures.ProcessPoolExecutor) -> None:
+        # the workers hand their results back through the memo, without it they would be computed twice
+        if not memo.TransformMemo().enabled:
+            return
+        _futures = []
+        for nickname in dict.fromkeys(nickname for target in self.targets for nickname in self.plan.references(target)):
+            if not nickname.startswith("load."):
+                continue
+            _entry = self.plan.load_entries[planner.reference_name(nickname)]
+            if _entry.batch is None or self.manager.get(nickname).transformed:
+                continue
+            _futures.append(
+                pool.submit(transform_batch_member, _entry, profiler.BuildProfiler().enabled, context.current().root)
+            )
+        for future in _futures:
+            _nickname, _stage_records = future.result()
+            profiler.BuildProfiler().extend(_stage_records)
+        if len(_futures) > 0:
+            self.logger.log(
+                logger.LoggingSeverities.LOW, "Transformed %d batch load entries in the pool.", len(_futures)
+            )
+
+    def _release(self, target: asset_build.BuildAsset) -> None:
+        if not self.streaming:
+            return
+        for nickname in self.plan.references(target.build_reference):
+            self.manager.release(nickname)
+
+    def _plan_target(self, build_target: str) -> asset_build.BuildAsset:
+        self.logger.log(logger.LoggingSeverities.LOW, "Building %s", build_target, asset=build_target)
+        return asset_build.BuildAsset(self.plan.entries[build_target], self.plan)
+
+    def _run_wave_in_pool(self, pool: futures.ProcessPoolExecutor, wave: list[asset_build.BuildAsset]) -> None:
+        _futures = []
+        for target in wave:
+            target.register_skipped()
+            for name, job, output_path, fingerprint in target.pending:
+                _worker, _args = target.job_payload(name, job, output_path)
+                _future = pool.submit(_worker, *_args)
+                _futures.append((target, name, fingerprint, _future))
+        # complete in submission order so registration and the cache manifest match a serial build
+        for target, name, fingerprint, future in _futures:
+            _output_path, _stage_records = future.result()
+            target.complete(name, _output_path, fingerprint, _stage_records)
+        for target in wave:
+            self._release(target)
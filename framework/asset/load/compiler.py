@@ -0,0 +1,372 @@
+from __future__ import annotations
+import glob
+import os
+import re
+
+import framework.context as context
+import framework.asset.asset_load as loader
+import framework.asset.asset_on_load as on_load
+import framework.asset.backend.backends as backends
+import framework.asset.build.encoding as encoding
+import framework.asset.build.planner as planner
+import framework.license as licenser
+
+# `WxH`, or `W` / `Wx` / `xH` to keep the other side of the image as it is
+RESOLUTION_PATTERN = re.compile(r"^(\d+)?x(\d+)?$|^(\d+)$")
+REFERENCE_PHASES = ("load", "build")
+# operations an amount of `until_resolution` is meaningless for
+BY_VALUE_ONLY = ("rotate",)
+# operations with an enum member but no implementation yet
+UNIMPLEMENTED = ("translate",)
+# the file name (without extension) of a batch entry's matched file, in its `nickname` template
+STEM_PLACEHOLDER = "$stem$"
+# what a batch entry's `glob` matches when it names a directory
+DIRECTORY_GLOB = "*.png"
+
+
+class OnLoadOperation:
+    """
+    One on_load operation of a load entry with its amount parsed: exactly one of `resolution` and `box` is set.
+    `params` is the operation's yaml, kept for `AssetOnLoad.canonical()`.
+    """
+    __slots__ = ("order", "function", "resolution", "box", "params")
+
+    def __init__(
+            self,
+            order: int,
+            function: on_load.SupportedOnLoadFunctions,
+            resolution: on_load.EffectResolution | None,
+            box: on_load.PixelBox | None,
+            params: dict
+    ) -> None:
+        self.order = order
+        self.function = function
+        self.resolution = resolution
+        self.box = box
+        self.params = params
+
+
+class LoadEntry:
+    """
+    A validated entry of the `load` table, or one file matched by a batch entry. `operations` are in execution
+    order, and shared by every file of a batch. `batch` is the key of the batch entry the file was matched by.
+    """
+    __slots__ = ("nickname", "path", "licensing", "operations", "batch")
+
+    def __init__(
+            self,
+            nickname: str,
+            path: str,
+            licensing: dict,
+            operations: list[OnLoadOperation],
+            batch: str | None = None
+    ) -> None:
+        self.nickname = nickname
+        self.path = path
+        self.licensing = licensing
+        self.operations = operations
+        self.batch = batch
+
+
+class BuildJob:
+    """
+    One job of a build target: its kind (`composite-with` or `composite-layers`) and its yaml.
+    """
+    __slots__ = ("kind", "spec")
+
+    def __init__(self, kind: str, spec: dict) -> None:
+        self.kind = kind
+        self.spec = spec
+
+
+class BuildEntry:
+    """
+    A validated entry of the `build` table, with its `use` reference resolved and the nicknames it reads collected
+    (see `planner.target_references()`).
+    """
+    __slots__ = (
+        "reference", "use", "output_type", "output_dir", "output_name", "resolutions", "mipmaps", "encoding", "atlas",
+        "jobs", "references"
+    )
+
+    def __init__(self, reference: str, spec: dict) -> None:
+        _outputs = spec["outputs"]
+        self.reference = reference
+        self.use: str = spec["use"].strip()
+        self.output_type: str = _outputs["filetype"]
+        self.output_dir: str = _outputs["dir"]
+        self.output_name: str = _outputs["name"]
+        self.resolutions: dict | None = _outputs.get("resolutions")
+        self.mipmaps: int = int(_outputs.get("mipmaps", 1))
+        self.encoding: dict | None = _outputs.get("encoding")
+        self.atlas: str | None = str(_outputs["atlas"]) if _outputs.get("atlas") is not None else None
+        self.jobs: list[BuildJob] = [BuildJob(*next(iter(job.items()))) for job in spec["jobs"]]
+        self.references: list[str] = planner.target_references(spec)
+
+
+class AssetsConfigCompiler:
+    """
+    Validates a parsed assets-config.yml against its schema as a whole, before anything is decoded, and compiles
+    it into `__slots__` records: LoadEntry for the `load` table, with each on_load amount parsed into an
+    EffectResolution or PixelBox, and BuildEntry for the `build` table. Every problem found is reported at once,
+    by its position in the yaml. References between build targets (`build.*`) are checked by the BuildPlanner,
+    which works out the names targets output.
+
+    A `load` entry with a `glob` instead of a `path` is a batch: its on_load recipe is compiled once and shared by
+    a LoadEntry for every file the glob matches (every `*.png` in it, when it names a directory), each named by
+    the entry's `nickname` template (`<key>-$stem$` by default):
+
+        terrain:
+          glob: tiles/graphics/terrain/*.png
+          nickname: terrain-$stem$
+          on_load: ...
+          licensing: ...
+
+    ## Instance Vars:
+        * self.load
+        * self.build
+        * self.batches
+        * self.errors
+    """
+    class InvalidAssetsConfigError(Exception):
+        def __init__(self, *args) -> None:
+            super().__init__(*args)
+
+    def __init__(self, conf: dict) -> None:
+        self.errors: list[str] = []
+        self.load: dict[str, LoadEntry] = {}
+        self.build: dict[str, BuildEntry] = {}
+        self.batches: dict[str, str] = {}
+        if not isinstance(conf, dict):
+            raise self.InvalidAssetsConfigError(f"{loader.BUILDABLE_ASSETS_CONFIG_FILE} is not a mapping.")
+
+        _load_table = self._mapping(conf.get("load"), "load")
+        for key, spec in _load_table.items():
+            for entry in self._compile_load(str(key), spec):
+                if entry.nickname in self.load.keys():
+                    self._error(f"load.{key}", f"load.{entry.nickname} is already defined")
+                    continue
+                self.load[entry.nickname] = entry
+        # entries that failed to compile still count as defined, so their references are not reported twice
+        _load_names = self.load.keys() | {
+            key for key, spec in _load_table.items() if not (isinstance(spec, dict) and "glob" in spec.keys())
+        }
+        _build_table = self._mapping(conf.get("build") or {}, "build")
+        for reference, spec in _build_table.items():
+            if self._check_build(str(reference), spec, _load_names):
+                self.build[reference] = BuildEntry(reference, spec)
+
+        if len(self.errors) > 0:
+            raise self.InvalidAssetsConfigError(
+                f"{loader.BUILDABLE_ASSETS_CONFIG_FILE} has {len(self.errors)} problem(s):\n  "
+                + "\n  ".join(self.errors)
+            )
+
+    def _error(self, where: str, problem: str) -> None:
+        self.errors.append(f"{where}: {problem}")
+
+    def _mapping(self, value, where: str) -> dict:
+        if not isinstance(value, dict):
+            self._error(where, f"expected a mapping, got {type(value).__name__}")
+            return {}
+        return value
+
+    def _string(self, value, where: str) -> bool:
+        if not isinstance(value, str) or value.strip() == "":
+            self._error(where, "expected a non-empty string")
+            return False
+        return True
+
+    def _compile_load(self, key: str, spec) -> list[LoadEntry]:
+        _where = f"load.{key}"
+        _errors = len(self.errors)
+        spec = self._mapping(spec, _where)
+        _paths: list[str] = []
+        if "glob" in spec.keys():
+            if "path" in spec.keys():
+                self._error(_where, "expected one of path and glob, not both")
+            _paths = self._expand_glob(key, spec.get("glob"))
+            _template = spec.get("nickname", f"{key}-{STEM_PLACEHOLDER}")
+            if self._string(_template, f"{_where}.nickname") and len(_paths) > 1 \
+                    and STEM_PLACEHOLDER not in _template:
+                self._error(f"{_where}.nickname", f"a template matching several files must contain {STEM_PLACEHOLDER}")
+        elif self._string(spec.get("path"), f"{_where}.path"):
+            if os.path.isfile(context.path(loader.BUILDABLE_ASSETS_PATH, spec["path"])):
+                _paths = [spec["path"]]
+            else:
+                self._error(f"{_where}.path", f"{spec['path']} does not exist in {loader.BUILDABLE_ASSETS_PATH}")
+
+        _licensing = self._mapping(spec.get("licensing"), f"{_where}.licensing")
+        for field in ("license", "attribution", "url"):
+            self._string(_licensing.get(field), f"{_where}.licensing.{field}")
+        if isinstance(_licensing.get("license"), str) \
+                and _licensing["license"].upper() not in (member.value for member in licenser.LicenseTypes):
+            self._error(f"{_where}.licensing.license", f"unknown license {_licensing['license']!r}")
+
+        _operations = []
+        for func, op_spec in self._mapping(spec.get("on_load") or {}, f"{_where}.on_load").items():
+            _operation = self._compile_operation(str(func), op_spec, f"{_where}.on_load.{func}")
+            if _operation is not None:
+                _operations.append(_operation)
+        if len(self.errors) > _errors:
+            return []
+        _operations.sort(key=lambda operation: operation.order)
+        if "glob" not in spec.keys():
+            return [LoadEntry(key, _paths[0], _licensing, _operations)]
+        return [
+            LoadEntry(
+                _template.replace(STEM_PLACEHOLDER, os.path.splitext(os.path.basename(path))[0]),
+                path, _licensing, _operations, key
+            )
+            for path in _paths
+        ]
+
+    def _expand_glob(self, key: str, pattern) -> list[str]:
+        """
+        Every file a batch entry's glob matches beneath the buildable assets dir, sorted, as config-style paths.
+        """
+        _where = f"load.{key}.glob"
+        if not self._string(pattern, _where):
+            return []
+        _root = context.path(loader.BUILDABLE_ASSETS_PATH)
+        if os.path.isdir(os.path.join(_root, pattern)):
+            pattern = os.path.join(pattern, DIRECTORY_GLOB)
+        self.batches[key] = pattern.replace(os.sep, "/")
+        _paths = sorted(
+            path.replace(os.sep, "/") for path in glob.glob(pattern, root_dir=_root, recursive=True)
+            if os.path.isfile(os.path.join(_root, path))
+        )
+        if len(_paths) == 0:
+            self._error(_where, f"{pattern} matches no files in {loader.BUILDABLE_ASSETS_PATH}")
+        return _paths
+
+    def _compile_operation(self, func: str, spec, where: str) -> OnLoadOperation | None:
+        _values = [member.value for member in on_load.SupportedOnLoadFunctions]
+        if func not in _values:
+            self._error(where, f"unknown on_load operation, expected one of {', '.join(_values)}")
+            return None
+        _function = on_load.SupportedOnLoadFunctions(func)
+        if _function.value in UNIMPLEMENTED:
+            self._error(where, "this on_load operation is not implemented yet")
+            return None
+        spec = self._mapping(spec, where)
+        _order = spec.get("order")
+        if type(_order) is not int:
+            self._error(f"{where}.order", "expected an integer")
+        _amount = self._mapping(spec.get("amount"), f"{where}.amount")
+        _kinds = [kind for kind in ("until_resolution", "by_value") if kind in _amount.keys()]
+        if len(_kinds) != 1:
+            self._error(f"{where}.amount", "expected exactly one of until_resolution and by_value")
+            return None
+
+        _resolution, _box = None, None
+        if _kinds[0] == "until_resolution":
+            _value = _amount["until_resolution"]
+            if _function.value in BY_VALUE_ONLY:
+                self._error(f"{where}.amount", f"{func} takes by_value only")
+            elif not isinstance(_value, str) or not RESOLUTION_PATTERN.match(_value) or _value == "x":
+                self._error(f"{where}.amount.until_resolution", f"expected WxH, Wx, xH or W, got {_value!r}")
+            else:
+                _resolution = on_load.EffectResolution(_value)
+        else:
+            _value = _amount["by_value"]
+            # a rotation angle may be fractional, pixel counts and factors may not
+            _number = (int, float) if _function.value in BY_VALUE_ONLY else (int,)
+            if not isinstance(_value, list) or not 1 <= len(_value) <= 4 \
+                    or not all(type(value) in _number for value in _value):
+                self._error(
+                    f"{where}.amount.by_value",
+                    f"expected a list of 1 to 4 {'numbers' if float in _number else 'integers'}, got {_value!r}"
+                )
+            else:
+                _box = on_load.PixelBox(_value)
+        if _resolution is None and _box is None or type(_order) is not int:
+            return None
+        return OnLoadOperation(_order, _function, _resolution, _box, {"amount": _amount})
+
+    def _check_reference(self, value, where: str, load_names: set[str], allow_none: bool = False) -> None:
+        if not self._string(value, where):
+            return
+        _reference = value.strip()
+        if allow_none and _reference == "none":
+            return
+        _phase, _, _nickname = _reference.partition(".")
+        if _phase not in REFERENCE_PHASES or _nickname == "":
+            self._error(where, f"expected a load.<nickname> or build.<nickname> reference, got {_reference!r}")
+        elif _phase == "load" and _nickname not in load_names:
+            self._error(where, f"{_reference} is not in the load table")
+
+    def _check_build(self, reference: str, spec, load_names: set[str]) -> bool:
+        _where = f"build.{reference}"
+        _errors = len(self.errors)
+        spec = self._mapping(spec, _where)
+        self._check_reference(spec.get("use"), f"{_where}.use", load_names)
+
+        _outputs = self._mapping(spec.get("outputs"), f"{_where}.outputs")
+        for key in ("filetype", "dir", "name"):
+            self._string(_outputs.get(key), f"{_where}.outputs.{key}")
+        if _outputs.get("resolutions") is not None:
+            _resolutions = self._mapping(_outputs["resolutions"], f"{_where}.outputs.resolutions")
+            _scales = [scale for scale in _resolutions.values() if type(scale) in (int, float) and scale > 0]
+            if len(_scales) != len(_resolutions):
+                self._error(f"{_where}.outputs.resolutions", "expected a positive scale for every prefix")
+            elif len(_scales) > 0 and max(_scales) != 1:
+                self._error(f"{_where}.outputs.resolutions", "the largest scale must be 1, the composite itself")
+        if "mipmaps" in _outputs.keys() and (type(_outputs["mipmaps"]) is not int or _outputs["mipmaps"] < 1):
+            self._error(f"{_where}.outputs.mipmaps", "expected a positive integer")
+        if _outputs.get("atlas") is not None and (_outputs.get("resolutions") is not None
+                                                  or _outputs.get("mipmaps", 1) != 1):
+            # sheets hold the full scale composite only, the variants would be left out of the package
+            self._error(f"{_where}.outputs.atlas", "cannot be combined with resolutions or mipmaps")
+        if _outputs.get("encoding") is not None:
+            _encoding_where = f"{_where}.outputs.encoding"
+            self._check_encoding(self._mapping(_outputs["encoding"], _encoding_where), _encoding_where)
+
+        _jobs = spec.get("jobs")
+        if not isinstance(_jobs, list) or len(_jobs) == 0:
+            self._error(f"{_where}.jobs", "expected a non-empty list")
+            _jobs = []
+        for idx, job in enumerate(_jobs):
+            _job_where = f"{_where}.jobs[{idx}]"
+            if not isinstance(job, dict) or len(job) != 1 \
+                    or next(iter(job)) not in ("composite-with", "composite-layers"):
+                self._error(_job_where, "expected a single composite-with or composite-layers job")
+                continue
+            _kind, _spec = next(iter(job.items()))
+            _spec = self._mapping(_spec, f"{_job_where}.{_kind}")
+            if _kind == "composite-with":
+                self._check_layer(_spec, f"{_job_where}.{_kind}", load_names)
+                continue
+            _layers = _spec.get("layers")
+            if not isinstance(_layers, list) or len(_layers) == 0:
+                self._error(f"{_job_where}.{_kind}.layers", "expected a non-empty list")
+                continue
+            for layer_idx, layer in enumerate(_layers):
+                self._check_layer(
+                    self._mapping(layer, f"{_job_where}.{_kind}.layers[{layer_idx}]"),
+                    f"{_job_where}.{_kind}.layers[{layer_idx}]",
+                    load_names
+                )
+        return len(self.errors) == _errors
+
+    def _check_encoding(self, settings: dict, where: str) -> None:
+        for key in settings.keys() - set(encoding.ENCODING_KEYS):
+            self._error(f"{where}.{key}", f"unknown setting, expected one of {', '.join(encoding.ENCODING_KEYS)}")
+        _level = settings.get("compress_level")
+        if _level is not None and (type(_level) is not int or not 0 <= _level <= 9):
+            self._error(f"{where}.compress_level", "expected an integer from 0 to 9")
+        if settings.get("optimize") is not None and type(settings["optimize"]) is not bool:
+            self._error(f"{where}.optimize", "expected true or false")
+        _colors = settings.get("colors")
+        if _colors is not None and (type(_colors) is not int or not 2 <= _colors <= 256):
+            self._error(f"{where}.colors", "expected an integer from 2 to 256")
+
+    def _check_layer(self, layer: dict, where: str, load_names: set[str]) -> None:
+        self._check_reference(layer.get("asset"), f"{where}.asset", load_names)
+        if "mask" in layer.keys():
+            self._check_reference(str(layer["mask"]), f"{where}.mask", load_names, allow_none=True)
+        if "blend" in layer.keys() and str(layer["blend"]).strip() not in backends.BLEND_MODES.keys():
+            self._error(f"{where}.blend", f"expected one of {', '.join(backends.BLEND_MODES.keys())}")
+        _opacity = layer.get("opacity", 1.0)
+        if type(_opacity) not in (int, float) or not 0 <= _opacity <= 1:
+            self._error(f"{where}.opacity", "expected a number from 0 to 1")
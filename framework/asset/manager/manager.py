@@ -1,8 +1,14 @@
 from __future__ import annotations
+from collections import ChainMap
 import framework.asset.manager.manager_meta_classes as manager_meta
 import framework.phase_logger as logger
 import framework.asset.asset_on_load as asset_on_load
 import framework.asset.asset_build as asset_build
+import framework.asset.build.build_helpers as helpers
+
+# substitution contexts resolve unknown placeholders through their parent: build-job -> build-info -> mod-info
+SUBSTITUTION_CONTEXT_PARENTS: dict = {"mod-info": None, "build-info": (0, "mod-info"), "atlas-info": (0, "mod-info")}
+DEFAULT_SUBSTITUTION_PARENT: tuple[int, str] = (0, "build-info")
 
 
 class AssetManager(metaclass=manager_meta.AssetManagerSingletonManager):
@@ -13,12 +19,18 @@ class AssetManager(metaclass=manager_meta.AssetManagerSingletonManager):
     logger: logger.AssetManagerLogger = None
     name_substitution_table: dict = None
     asset_nickname_ref_table: dict = None
+    reference_counts: dict = None
+    compiled_substitutions: dict = None
 
     def __init__(self):
         if self.name_substitution_table is None:
             self.name_substitution_table = {}
         if self.asset_nickname_ref_table is None:
             self.asset_nickname_ref_table = {"load": {}, "build": {}, "base": {}}
+        if self.reference_counts is None:
+            self.reference_counts = {}
+        if self.compiled_substitutions is None:
+            self.compiled_substitutions = {}
         if self.logger is None:
             self.logger = logger.AssetManagerLogger()
 
@@ -27,33 +39,94 @@ class AssetManager(metaclass=manager_meta.AssetManagerSingletonManager):
             self.name_substitution_table[context[1]] = {}
         if str(context[0]) not in self.name_substitution_table[context[1]].keys():
             self.name_substitution_table[context[1]][str(context[0])] = {}
+            # compiled chains hold the context tables themselves, so only a new table invalidates them
+            self.compiled_substitutions.clear()
 
         self.name_substitution_table[context[1]][str(context[0])][replace] = replace_with
         self.logger.log(
             logger.LoggingSeverities.LOW,
-            f"Registered substitution in context {context[1]}-{context[0]}: "
-            f"{replace} -> {replace_with}."
+            "Registered substitution in context %s-%s: %s -> %s.", context[1], context[0], replace, replace_with
         )
 
     def register_asset(
             self,
             nickname: str,
-            asset: asset_on_load.ParseAsset | asset_build.BuildAsset,
+            asset: asset_on_load.ParseAsset | asset_build.BuiltAssetOutput,
             phase: str
     ) -> None:
         self.asset_nickname_ref_table[phase][nickname] = asset
-        self.logger.log(logger.LoggingSeverities.LOW, f"Registered asset: {phase}.{nickname}")
+        self.logger.log(logger.LoggingSeverities.LOW, "Registered asset: %s.%s", phase, nickname, asset=nickname)
 
-    def get(self, asset_nickname: str) -> asset_on_load.ParseAsset | asset_build.BuildAsset:
+    def get(self, asset_nickname: str) -> asset_on_load.ParseAsset | asset_build.BuiltAssetOutput:
         _phase: str = asset_nickname.split(".")[0]
         _nickname: str = asset_nickname.split(".")[1]
         try:
-            _asset_ref: asset_on_load.ParseAsset | asset_build.BuildAsset = \
+            _asset_ref: asset_on_load.ParseAsset | asset_build.BuiltAssetOutput = \
                 self.asset_nickname_ref_table[_phase][_nickname]
         except KeyError:
             raise self.AssetNotFoundError(f"Could not find key {asset_nickname} in table.")
         return _asset_ref
 
+    def retain(self, asset_nickname: str) -> None:
+        """
+        Record one more pending consumer of an asset, see `self.release()`.
+        """
+        self.reference_counts[asset_nickname] = self.reference_counts.get(asset_nickname, 0) + 1
+
+    def release(self, asset_nickname: str) -> None:
+        """
+        Record that a consumer of an asset is done with it. When the last retained consumer releases a loaded
+        asset or a build output, its decoded and transformed images are freed.
+        """
+        self.reference_counts[asset_nickname] = self.reference_counts.get(asset_nickname, 0) - 1
+        if self.reference_counts[asset_nickname] > 0:
+            return
+        del self.reference_counts[asset_nickname]
+        _asset_ref = self.get(asset_nickname)
+        if isinstance(_asset_ref, (asset_on_load.ParseAsset, asset_build.BuiltAssetOutput)):
+            _asset_ref.release()
+            self.logger.log(logger.LoggingSeverities.LOW, "Released asset: %s", asset_nickname, asset=asset_nickname)
+
+    def substitution_table(self, context: tuple[int, str]) -> ChainMap:
+        """
+        The placeholders visible in a context: its own, then those inherited from its parent contexts. Compiled
+        once per context as a chain over the registered tables, nothing is copied.
+        """
+        _key = (int(context[0]), context[1])
+        if _key not in self.compiled_substitutions.keys():
+            _tables = []
+            _context = _key
+            while _context is not None:
+                _tables.append(self.name_substitution_table.get(_context[1], {}).get(str(_context[0]), {}))
+                _context = SUBSTITUTION_CONTEXT_PARENTS.get(_context[1], DEFAULT_SUBSTITUTION_PARENT)
+            self.compiled_substitutions[_key] = ChainMap(*_tables)
+        return self.compiled_substitutions[_key]
+
+    def substitute(self, context: tuple[int, str], text: str) -> str:
+        """
+        Replace every `$placeholder$` token in `text` that resolves in the given context, in a single pass.
+        Unresolved tokens are left in place.
+        """
+        _table = self.substitution_table(context)
+        _substituted = 0
+
+        def _resolve(match) -> str:
+            nonlocal _substituted
+            _token = match.group(0)
+            if _token not in _table:
+                return _token
+            _substituted += 1
+            return str(_table[_token])
+
+        _result = helpers.SUBSTITUTION_PATTERN.sub(_resolve, text)
+        if _substituted > 0:
+            self.logger.log(
+                logger.LoggingSeverities.LOG,
+                "Substituted %d placeholder(s) in context %s-%s: %s -> %s",
+                _substituted, context[1], context[0], text, _result
+            )
+        return _result
+
     def name_substitutions(self, context: tuple[int, str]) -> list[tuple[str, str]]:
         _map_with_context = self.name_substitution_table[context[1]][str(context[0])]
         _returnable = []
@@ -1,18 +1,8 @@
-from threading import Lock
+import framework.context as context
 
 
-class AssetManagerSingletonManager(type):
+class AssetManagerSingletonManager(context.ContextSingletonManager):
     """
     Singleton metaclass for managing the AssetLoader singleton. Do not attempt to directly instantiate, reference
     or otherwise use this class. Its function is autonomous.
     """
-    _instances = {}
-
-    _lock: Lock = Lock()
-
-    def __call__(cls, *args, **kwargs):
-        with cls._lock:
-            if cls not in cls._instances:
-                instance = super().__call__(*args, **kwargs)
-                cls._instances[cls] = instance
-        return cls._instances[cls]
\ No newline at end of file
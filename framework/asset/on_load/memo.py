@@ -0,0 +1,170 @@
+from __future__ import annotations
+from collections import OrderedDict
+from threading import Lock, get_ident
+import os
+
+import framework.phase_logger as logger
+import framework.context as context
+import framework.conf.mod_config as mod_config
+import framework.asset.backend.raw_store as raw_store
+import framework.asset.on_load.on_load_meta_classes as on_load_meta
+import framework.lazy as lazy
+
+Image = lazy.lazy_import("PIL.Image")
+
+DEFAULT_MEMO_DIR = 'mod/build/.cache/transforms/'
+DEFAULT_MEMO_MAX_BYTES = 512 * 1024 * 1024
+# disk budget of the PNG spill cache, pruned like the raw store, see `raw_store.prune_dir()`
+DEFAULT_MEMO_DISK_MAX_BYTES = 512 * 1024 * 1024
+
+
+class TransformMemo(metaclass=on_load_meta.TransformMemoSingletonManager):
+    """
+    Memoises transformed images by `ParseAsset.fingerprint()`, i.e. by source file hash plus the canonical form of
+    the on_load operations. Recent results are kept decoded in a size-bounded LRU; every result is also written
+    to disk so later runs (and other mods sharing the same base textures) load it instead of recomputing. Results
+    go to the RawImageStore, which maps them back without a decode; modes it cannot hold are spilled as PNG.
+    Neither disk tier grows without bound: a build runs between `begin()` and `end()`, which prunes the results
+    it did not use from the RawImageStore and the spill cache, down to `raw_store.max_bytes` and `disk_max_bytes`.
+
+    ## Instance Methods:
+        * self.get()
+        * self.put()
+        * self.ref()
+        * self.evict()
+        * self.begin()
+        * self.end()
+
+    ## Instance Vars:
+        * self.enabled
+        * self.resident
+        * self.max_bytes
+        * self.disk_max_bytes
+        * self.cache_dir
+        * self.hits
+        * self.misses
+    """
+    enabled: bool = None
+    # set by the build daemon, whose memo outlives each build
+    resident: bool = False
+    max_bytes: int = None
+    disk_max_bytes: int = None
+    cache_dir: str = None
+
+    def __init__(self) -> None:
+        _config = mod_config.ModConfigLoader()
+        self.logger = logger.AssetModifyPhaseLogger()
+        self.enabled = bool(_config.build_option("memo.enabled", True))
+        self.max_bytes = int(_config.build_option("memo.max_bytes", DEFAULT_MEMO_MAX_BYTES))
+        self.disk_max_bytes = int(_config.build_option("memo.disk_max_bytes", DEFAULT_MEMO_DISK_MAX_BYTES))
+        self.cache_dir = context.path(_config.build_option("memo.dir", DEFAULT_MEMO_DIR))
+        self.store = raw_store.RawImageStore()
+        self._entries: OrderedDict[str, Image] = OrderedDict()
+        self._bytes = 0
+        self._lock = Lock()
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".png")
+
+    def get(self, key: str) -> Image | None:
+        """
+        :param key: a `ParseAsset.fingerprint()`.
+        :return: the memoised image, or None when it has never been computed.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            if key in self._entries.keys():
+                self._entries.move_to_end(key)
+                self.hits["memory"] += 1
+                return self._entries[key]
+
+        _image = self.store.get(key)
+        if _image is None:
+            _path = self._disk_path(key)
+            if not os.path.exists(_path):
+                self.misses += 1
+                return None
+            _image = Image.open(_path)
+            _image.load()
+            raw_store.touch(_path)
+        self.hits["disk"] += 1
+        self._remember(key, _image)
+        return _image
+
+    def put(self, key: str, image: Image) -> None:
+        if not self.enabled:
+            return
+        self._remember(key, image)
+        if self.store.put(key, image):
+            return
+        _path = self._disk_path(key)
+        if not os.path.exists(_path):
+            os.makedirs(os.path.dirname(_path), exist_ok=True)
+            _tmp_path = f"{_path}.{os.getpid()}.{get_ident()}.tmp"
+            # fastest deflate level, the spill cache trades disk for encode time
+            image.save(_tmp_path, "PNG", compress_level=1)
+            os.replace(_tmp_path, _path)
+        else:
+            raw_store.touch(_path)
+
+    def ref(self, key: str) -> raw_store.StoredImage | None:
+        """
+        A reference to a memoised result that a worker process can map itself, see `raw_store.resolve()`.
+        """
+        return self.store.ref(key) if self.enabled else None
+
+    def begin(self) -> float:
+        """
+        Register a build using the memo and the RawImageStore, see `RawImageStore.begin()`.
+        """
+        return self.store.begin()
+
+    def end(self, started: float, prune: bool = True) -> None:
+        """
+        Unregister a build, pruning the RawImageStore and the spill cache of results no running build used.
+        """
+        _used_since = self.store.end(started, prune)
+        if _used_since is None or not os.path.isdir(self.cache_dir):
+            return
+        _removed, _freed = raw_store.prune_dir(
+            self.cache_dir, ".png", _used_since, self.disk_max_bytes, self.store.keep_unused
+        )
+        if _removed > 0:
+            self.logger.log(
+                logger.LoggingSeverities.LOW, "Pruned %d spilled transform files (%d bytes) unused by the last build",
+                _removed, _freed
+            )
+
+    def evict(self, key: str) -> None:
+        """
+        Drop an entry from the in-memory LRU only, it stays available from the on-disk cache. A `resident` memo
+        keeps it for later builds instead, its LRU is still bounded by `max_bytes`.
+        """
+        if self.resident:
+            return
+        with self._lock:
+            if key in self._entries.keys():
+                self._bytes -= raw_store.image_nbytes(self._entries.pop(key))
+
+    def _remember(self, key: str, image: Image) -> None:
+        _size = raw_store.image_nbytes(image)
+        if _size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries.keys():
+                self._bytes -= raw_store.image_nbytes(self._entries.pop(key))
+            self._entries[key] = image
+            self._bytes += _size
+            while self._bytes > self.max_bytes:
+                _, _evicted = self._entries.popitem(last=False)
+                self._bytes -= raw_store.image_nbytes(_evicted)
+
+    def log_stats(self) -> None:
+        self.logger.log(
+            logger.LoggingSeverities.LOW,
+            f"Transform memo: {self.hits['memory']} memory hits, {self.hits['disk']} disk hits, "
+            f"{self.misses} misses, {self._bytes} bytes held."
+        )
@@ -0,0 +1,158 @@
+from __future__ import annotations
+import math
+
+import framework.phase_logger as logger
+import framework.asset.asset_load as loader
+import framework.asset.asset_on_load as asset_on_load
+import framework.asset.load.compiler as compiler
+import framework.profiler as profiler
+import framework.lazy as lazy
+
+Image = lazy.lazy_import("PIL.Image")
+
+# Fusing a scale with a rotation resamples the source once with BICUBIC, where the step-by-step pipeline runs a
+# BICUBIC resize and a NEAREST rotation. Measured against it, the mean absolute difference per channel stays below
+# this many levels (of 255). Individual pixels can differ fully along hard alpha edges, which the fused resample
+# smooths, and in a narrow band at the canvas border, where `Image.transform` blends in transparent pixels from
+# beyond the source instead of clamping to the edge as `Image.resize` does.
+FUSED_RESAMPLE_TOLERANCE = 8.0
+
+
+def _compose(outer: list[float], inner: list[float]) -> list[float]:
+    """
+    Compose two affine maps given as Pillow AFFINE coefficient lists (output -> input).
+    The result maps through `inner` first, then `outer`.
+    """
+    a1, b1, c1, d1, e1, f1 = outer
+    a2, b2, c2, d2, e2, f2 = inner
+    return [
+        a1 * a2 + b1 * d2, a1 * b2 + b1 * e2, a1 * c2 + b1 * f2 + c1,
+        d1 * a2 + e1 * d2, d1 * b2 + e1 * e2, d1 * c2 + e1 * f2 + f1
+    ]
+
+
+def _rotation_matrix(size: tuple[int, int], degrees: float) -> list[float]:
+    """
+    The same matrix `PIL.Image.rotate` builds for a rotation about the centre without expand or translate.
+    """
+    _centre = (size[0] / 2, size[1] / 2)
+    _angle = -math.radians(degrees)
+    _matrix = [
+        round(math.cos(_angle), 15), round(math.sin(_angle), 15), 0.0,
+        round(-math.sin(_angle), 15), round(math.cos(_angle), 15), 0.0
+    ]
+    _matrix[2] = _matrix[0] * -_centre[0] + _matrix[1] * -_centre[1] + _centre[0]
+    _matrix[5] = _matrix[3] * -_centre[0] + _matrix[4] * -_centre[1] + _centre[1]
+    return _matrix
+
+
+def _fusable(op: compiler.OnLoadOperation) -> bool:
+    if op.function == asset_on_load.SupportedOnLoadFunctions.SCALE:
+        return True
+    if op.function == asset_on_load.SupportedOnLoadFunctions.ROTATE:
+        return op.box is not None
+    return False
+
+
+def _scaled_size(size: tuple[int, int], op: compiler.OnLoadOperation) -> tuple[int, int]:
+    """
+    Output size of a scale op, following `ScaleImage`.
+    """
+    if op.resolution is not None:
+        _tup = op.resolution.get_tup()
+        return _tup[0] if _tup[0] != -1 else size[0], _tup[1] if _tup[1] != -1 else size[1]
+    return size[0] * op.box.tup[2], size[1] * op.box.tup[3]
+
+
+class FusedAffineStep:
+    """
+    A run of adjacent scale/rotate operations collapsed into a single `Image.transform`.
+    """
+    def __init__(self, ops: list[compiler.OnLoadOperation]) -> None:
+        self.ops = ops
+
+    def apply(self, asset: loader.LoadAsset, image: Image, logger_: logger.AssetModifyPhaseLogger) -> Image:
+        _size = image.size
+        _matrix = [1.0, 0.0, 0.0, 0.0, 1.0, 0.0]
+        _resample = Image.Resampling.NEAREST
+        for op in self.ops:
+            if op.function == asset_on_load.SupportedOnLoadFunctions.SCALE:
+                _new_size = _scaled_size(_size, op)
+                _step = [_size[0] / _new_size[0], 0.0, 0.0, 0.0, _size[1] / _new_size[1], 0.0]
+                if image.mode not in ("1", "P"):
+                    _resample = Image.Resampling.BICUBIC
+            else:
+                _new_size = _size
+                _step = _rotation_matrix(_size, op.box.tup[0])
+            _matrix = _compose(_matrix, _step)
+            _size = _new_size
+
+        # Image.transform does not antialias, so shrink by whole factors with a box filter first (as
+        # Image.resize does through `reducing_gap`) and only resample the remainder.
+        _factor_x = int(math.hypot(_matrix[0], _matrix[3]))
+        _factor_y = int(math.hypot(_matrix[1], _matrix[4]))
+        if _factor_x >= 2 or _factor_y >= 2:
+            _factor_x, _factor_y = max(1, _factor_x), max(1, _factor_y)
+            image = image.reduce((_factor_x, _factor_y))
+            _matrix = [
+                _matrix[0] / _factor_x, _matrix[1] / _factor_x, _matrix[2] / _factor_x,
+                _matrix[3] / _factor_y, _matrix[4] / _factor_y, _matrix[5] / _factor_y
+            ]
+
+        _stages = "+".join(op.function.value for op in self.ops)
+        with profiler.BuildProfiler().stage(f"load.{asset.nickname}", _stages):
+            _modified = image.transform(_size, Image.Transform.AFFINE, _matrix, _resample)
+        logger_.log(
+            logger.LoggingSeverities.LOW, "Applied fused %s to %s", _stages, asset.nickname, asset=asset.nickname
+        )
+        return _modified
+
+
+class NativeStep:
+    """
+    A single operation run through its `ImageManipulatorFactory` class, exactly as the unfused pipeline would.
+    """
+    def __init__(self, op: compiler.OnLoadOperation) -> None:
+        self.ops = [op]
+
+    def apply(self, asset: loader.LoadAsset, image: Image, logger_: logger.AssetModifyPhaseLogger) -> Image:
+        return asset_on_load.ImageManipulatorFactory(asset, self.ops[0], image, logger_).get_modified_image()
+
+
+class FusedOnLoadPlan:
+    """
+    Turns the sorted `AssetOnLoad.operations` into a list of steps, merging adjacent scale and rotate operations
+    into one affine transform so the full-size intermediate between them is never allocated.
+
+    Crops stay native: they only copy a region and must keep clipping what later steps can see. A single
+    scale or rotate is also left native, which keeps the output pixel for pixel identical to the unfused
+    pipeline. Fused steps agree with it to within `FUSED_RESAMPLE_TOLERANCE`.
+
+    ## Instance Methods:
+        * self.execute()
+
+    ## Instance Vars:
+        * self.steps
+    """
+    def __init__(self, operations: list[compiler.OnLoadOperation]) -> None:
+        self.steps: list[FusedAffineStep | NativeStep] = []
+        _run: list[compiler.OnLoadOperation] = []
+        for op in operations:
+            if _fusable(op):
+                _run.append(op)
+                continue
+            self._close_run(_run)
+            _run = []
+            self.steps.append(NativeStep(op))
+        self._close_run(_run)
+
+    def _close_run(self, run: list[compiler.OnLoadOperation]) -> None:
+        if len(run) == 1:
+            self.steps.append(NativeStep(run[0]))
+        elif len(run) > 1:
+            self.steps.append(FusedAffineStep(run))
+
+    def execute(self, asset: loader.LoadAsset, image: Image, logger_: logger.AssetModifyPhaseLogger) -> Image:
+        for step in self.steps:
+            image = step.apply(asset, image, logger_)
+        return image
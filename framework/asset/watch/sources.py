@@ -0,0 +1,136 @@
+from __future__ import annotations
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+INOTIFY_EVENT = struct.Struct("iIII")
+
+DEFAULT_POLL_INTERVAL = 0.25
+# editors tend to write a file in several steps, events this close together are reported as one change set
+DEFAULT_SETTLE_TIME = 0.05
+
+
+class PollingSource:
+    """
+    Portable change source: compares the mtime and size of every file beneath `root` on each poll.
+    """
+    def __init__(self, root: str, interval: float = DEFAULT_POLL_INTERVAL) -> None:
+        self.root = root
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        _snapshot = {}
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                _path = os.path.normpath(os.path.join(directory, filename))
+                try:
+                    _stat = os.stat(_path)
+                except FileNotFoundError:
+                    continue
+                _snapshot[_path] = (_stat.st_mtime_ns, _stat.st_size)
+        return _snapshot
+
+    def wait(self, timeout: float | None = None) -> set[str]:
+        """
+        :return: normalised paths of every file created, changed or removed since the last call.
+        """
+        _deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            _snapshot = self._scan()
+            _changed = {path for path in _snapshot.keys() | self._snapshot.keys()
+                        if _snapshot.get(path) != self._snapshot.get(path)}
+            self._snapshot = _snapshot
+            if len(_changed) > 0 or (_deadline is not None and time.monotonic() >= _deadline):
+                return _changed
+            time.sleep(self.interval)
+
+    def close(self) -> None:
+        pass
+
+
+class InotifySource:
+    """
+    Linux change source using inotify through libc, watching `root` and every directory beneath it.
+    """
+    def __init__(self, root: str, settle_time: float = DEFAULT_SETTLE_TIME) -> None:
+        self.root = root
+        self.settle_time = settle_time
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories: dict[int, str] = {}
+        for directory, _, _ in os.walk(root):
+            self._add_watch(directory)
+
+    def _add_watch(self, directory: str) -> None:
+        _wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if _wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed on {directory}")
+        self._directories[_wd] = directory
+
+    def _drain(self) -> set[str]:
+        _changed = set()
+        while True:
+            try:
+                _buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return _changed
+            _offset = 0
+            while _offset < len(_buffer):
+                _wd, _mask, _, _length = INOTIFY_EVENT.unpack_from(_buffer, _offset)
+                _offset += INOTIFY_EVENT.size
+                _name = _buffer[_offset:_offset + _length].rstrip(b"\0")
+                _offset += _length
+                if _wd not in self._directories.keys():
+                    continue
+                _path = os.path.normpath(os.path.join(self._directories[_wd], os.fsdecode(_name)))
+                if _mask & IN_ISDIR:
+                    if _mask & (IN_CREATE | IN_MOVED_TO):
+                        self._add_watch(_path)
+                    continue
+                _changed.add(_path)
+
+    def wait(self, timeout: float | None = None) -> set[str]:
+        """
+        :return: normalised paths of every file created, changed or removed, once a burst of events settles.
+        """
+        _ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not _ready:
+            return set()
+        _changed = set()
+        while True:
+            _changed |= self._drain()
+            _ready, _, _ = select.select([self._fd], [], [], self.settle_time)
+            if not _ready:
+                return _changed
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def change_source(root: str, poll: bool = False, interval: float = DEFAULT_POLL_INTERVAL):
+    """
+    inotify where available, polling otherwise or when asked for.
+    """
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifySource(root)
+        except (OSError, AttributeError):
+            pass
+    return PollingSource(root, interval)
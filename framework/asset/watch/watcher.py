@@ -0,0 +1,181 @@
+from __future__ import annotations
+import fnmatch
+import os
+import time
+
+import framework.phase_logger as logger
+import framework.context as context
+import framework.asset.asset
+import framework.asset.asset_load as loader
+import framework.asset.asset_on_load as on_load
+import framework.asset.build.cache as cache
+import framework.asset.build.planner as planner
+import framework.asset.load.compiler as compiler
+import framework.asset.build.scheduler as scheduler
+import framework.asset.watch.sources as sources
+import framework.profiler as profiler
+import framework.conf.snapshot as snapshot
+
+
+class AssetWatcher:
+    """
+    Long-running watch mode around `Assets`. The AssetManager tables and transformed images stay in memory
+    between changes; when a source file or `assets-config.yml` changes only the affected `load.*` entries are
+    re-parsed and only the `build.*` targets downstream of them (or whose own yaml changed) are rebuilt.
+
+    ## Instance Methods:
+        * self.run_forever()
+        * self.refresh()
+
+    ## Instance Vars:
+        * self.assets
+        * self.source
+    """
+    def __init__(self, poll: bool = False, interval: float = sources.DEFAULT_POLL_INTERVAL) -> None:
+        self.assets = framework.asset.asset.Assets()
+        self.logger = logger.AssetOutputPhaseLogger()
+        self.config_path = os.path.normpath(
+            context.path(loader.BUILDABLE_ASSETS_PATH, loader.BUILDABLE_ASSETS_CONFIG_FILE)
+        )
+        self.source = sources.change_source(context.path(loader.BUILDABLE_ASSETS_PATH), poll, interval)
+        self.flush_logs()
+
+    def run_forever(self) -> None:
+        print(f"Watching {context.path(loader.BUILDABLE_ASSETS_PATH)} ({type(self.source).__name__}), Ctrl+C to stop.")
+        try:
+            while True:
+                _changed = self.source.wait()
+                if len(_changed) > 0:
+                    self.refresh(_changed)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.source.close()
+            self.assets.dispose()
+
+    def refresh(self, changed_paths: set[str]) -> list[str]:
+        """
+        Bring the build up to date with a set of changed files.
+
+        :param changed_paths: normalised paths of changed files beneath the buildable assets dir.
+        :return: the build targets that were rebuilt.
+        """
+        _start = time.perf_counter()
+        _dirty_loads: set[str] = set()
+        _dirty_builds: set[str] = set()
+
+        if self.config_path in changed_paths or self._batch_files_changed(changed_paths):
+            _dirty_loads, _dirty_builds = self._reload_config()
+
+        for asset in self.assets.load.assets:
+            if os.path.normpath(context.path(loader.BUILDABLE_ASSETS_PATH, asset.path)) in changed_paths:
+                _dirty_loads.add(asset.nickname)
+
+        for nickname in _dirty_loads:
+            self._reload_asset(nickname)
+
+        _targets = self.downstream_targets({f"load.{nickname}" for nickname in _dirty_loads}, _dirty_builds)
+        if len(_targets) > 0:
+            _scheduler = scheduler.BuildScheduler(self.assets.build.plan, self.assets.build.workers, _targets)
+            # keep transformed images hot for the next change
+            _scheduler.streaming = False
+            _rebuilt = {target.build_reference: target for target in _scheduler.run()}
+            self.assets.build.built = [_rebuilt.pop(target.build_reference, target)
+                                       for target in self.assets.build.built] + list(_rebuilt.values())
+            cache.BuildCache().save()
+            self.assets.atlas.pack()
+
+        self.logger.log(
+            logger.LoggingSeverities.LOW,
+            f"Refreshed {len(_dirty_loads)} load entries and {len(_targets)} build targets "
+            f"in {(time.perf_counter() - _start) * 1000:.0f} ms."
+        )
+        self.flush_logs()
+        return _targets
+
+    def _reload_config(self) -> tuple[set[str], set[str]]:
+        _conf = snapshot.load_yaml(self.config_path)
+        _old = self.assets.load.conf
+        _old_compiled = self.assets.load.compiled
+        try:
+            _compiled = compiler.AssetsConfigCompiler(_conf)
+            _plan = planner.BuildPlanner(_conf["load"], _conf["build"], _compiled)
+        except (compiler.AssetsConfigCompiler.InvalidAssetsConfigError,
+                planner.BuildPlanner.MissingReferenceError,
+                planner.BuildPlanner.DuplicateOutputError,
+                planner.BuildPlanner.DependencyCycleError) as e:
+            self.logger.log(logger.LoggingSeverities.MEDIUM, f"Ignoring {self.config_path} change: {e}")
+            return set(), set()
+        # a batch entry's files are dirty when its yaml changed, as they share its recipe
+        _dirty_loads = {
+            nickname for nickname, entry in _compiled.load.items()
+            if nickname not in _old_compiled.load.keys() or _old_compiled.load[nickname].path != entry.path
+            or _old["load"].get(entry.batch or nickname) != _conf["load"][entry.batch or nickname]
+        }
+        _dirty_builds = {key for key in _conf["build"].keys() if _old["build"].get(key) != _conf["build"][key]}
+        for removed in _old_compiled.load.keys() - _compiled.load.keys():
+            self._drop_asset(removed)
+        self.assets.load.conf = _conf
+        self.assets.load.compiled = _compiled
+        self.assets.build.build_table = _conf["build"]
+        self.assets.build.plan = _plan
+        return _dirty_loads, _dirty_builds
+
+    def _batch_files_changed(self, changed_paths: set[str]) -> bool:
+        """
+        Whether a file was created or removed that a batch load entry's glob matches, which changes its entries.
+        """
+        _root = context.path(loader.BUILDABLE_ASSETS_PATH)
+        _known = {
+            os.path.normpath(os.path.join(_root, entry.path)) for entry in self.assets.load.compiled.load.values()
+        }
+        for path in changed_paths:
+            if (path in _known) == os.path.exists(path):
+                continue
+            _relative = os.path.relpath(path, _root).replace(os.sep, "/")
+            if any(fnmatch.fnmatch(_relative, pattern) for pattern in self.assets.load.compiled.batches.values()):
+                return True
+        return False
+
+    def _drop_asset(self, nickname: str) -> None:
+        for idx, asset in enumerate(self.assets.load.assets):
+            if asset.nickname == nickname:
+                asset.dispose()
+                del self.assets.load.assets[idx]
+                del self.assets.triggers.parsed[idx]
+                break
+        self.assets.manager.asset_nickname_ref_table["load"].pop(nickname, None)
+
+    def _reload_asset(self, nickname: str) -> None:
+        _load_asset = loader.LoadAsset(self.assets.load.compiled.load[nickname])
+        _parsed = on_load.ParseAsset(_load_asset)
+        for idx, asset in enumerate(self.assets.load.assets):
+            if asset.nickname == nickname:
+                asset.release()
+                self.assets.load.assets[idx] = _load_asset
+                self.assets.triggers.parsed[idx] = _parsed
+                break
+        else:
+            self.assets.load.assets.append(_load_asset)
+            self.assets.triggers.parsed.append(_parsed)
+        self.assets.manager.register_asset(nickname, _parsed, "load")
+
+    def downstream_targets(self, changed_nicknames: set[str], changed_targets: set[str]) -> list[str]:
+        """
+        Every build target whose own yaml changed or that reads a changed nickname, directly or through the
+        outputs of other affected targets, in execution order.
+        """
+        _plan = self.assets.build.plan
+        _changed_targets = changed_targets & _plan.build_table.keys()
+        _nicknames = set(changed_nicknames)
+        for target in _changed_targets:
+            _nicknames |= {f"build.{name}" for name in _plan.outputs[target]}
+        _affected = _changed_targets | set(_plan.dependents(_nicknames))
+        return [target for target in _plan.order if target in _affected]
+
+    def flush_logs(self) -> None:
+        self.assets.load.logger.output()
+        logger.AssetModifyPhaseLogger().output()
+        self.assets.manager.logger.output()
+        self.logger.output()
+        profiler.BuildProfiler().output()
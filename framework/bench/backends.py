@@ -0,0 +1,78 @@
+"""
+Compare the Pillow and NumPy pixel backends on tiling and compositing.
+
+    python -m framework.bench.backends [--sizes 512 1024 2048 4096] [--layers 4] [--repeat 3]
+
+Every backend's output is checked against the Pillow backend before its timings are reported.
+"""
+from __future__ import annotations
+from PIL import Image
+import argparse
+import os
+import time
+
+import framework.asset.backend.backends as backends
+
+DEFAULT_SIZES = [512, 1024, 2048, 4096]
+TILE_SOURCE_SIZE = 64
+
+
+def random_rgba(size: tuple[int, int]) -> Image:
+    return Image.frombytes('RGBA', size, os.urandom(size[0] * size[1] * 4))
+
+
+def best_of(repeat: int, func, *args) -> tuple[float, object]:
+    _best = None
+    _result = None
+    for _ in range(repeat):
+        _start = time.perf_counter()
+        _result = func(*args)
+        _elapsed = time.perf_counter() - _start
+        _best = _elapsed if _best is None else min(_best, _elapsed)
+    return _best, _result
+
+
+def run(sizes: list[int], layers: int, repeat: int) -> list[dict]:
+    _names = [name for name in backends.SUPPORTED_BACKENDS if name == "pillow" or backends.numpy is not None]
+    _rows = []
+    _tile_source = random_rgba((TILE_SOURCE_SIZE, TILE_SOURCE_SIZE))
+    for size in sizes:
+        _base = random_rgba((size, size))
+        _layers = [(random_rgba((size, size)), None) for _ in range(layers)]
+        _reference = {}
+        for name in _names:
+            _backend = backends.get_backend(name)
+            _tile_s, _tiled = best_of(repeat, _backend.tile, _tile_source, (size, size))
+            _comp_s, _composited = best_of(repeat, _backend.composite_many, _base, _layers)
+            if name == "pillow":
+                _reference = {"tile": _tiled.tobytes(), "composite": [im.tobytes() for im in _composited]}
+            _identical = _tiled.tobytes() == _reference["tile"] and \
+                [im.tobytes() for im in _composited] == _reference["composite"]
+            _rows.append({
+                "backend": name,
+                "size": size,
+                "tile_s": _tile_s,
+                "composite_s": _comp_s,
+                "composite_mpx_s": size * size * layers / 1e6 / _comp_s,
+                "identical": _identical
+            })
+    return _rows
+
+
+def main() -> None:
+    _parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    _parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    _parser.add_argument("--layers", type=int, default=4, help="composite-with layers per target")
+    _parser.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    _args = _parser.parse_args()
+
+    print(f"{'backend':<8} {'size':>6} {'tile (s)':>10} {'composite (s)':>14} {'Mpx/s':>9} identical")
+    for row in run(_args.sizes, _args.layers, _args.repeat):
+        print(
+            f"{row['backend']:<8} {row['size']:>6} {row['tile_s']:>10.4f} {row['composite_s']:>14.4f} "
+            f"{row['composite_mpx_s']:>9.1f} {row['identical']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+End-to-end and per-stage benchmark of the asset pipeline over synthetic texture packs.
+
+    python -m framework.bench.pipeline [--counts 10 100 1000] [--sizes 64 256 1024 4096]
+                                       [--baseline FILE] [--save-baseline FILE] [--tolerance 0.1]
+
+For each (asset count, texture size) scenario a throwaway mod root is generated with its own mod-config.yml,
+assets-config.yml and source PNGs, then AssetLoader -> AssetParser -> AssetBuilder is run in a fresh interpreter
+(the pipeline classes are process singletons, and a fresh process keeps the peak memory figure honest).
+Scenarios whose total pixel count exceeds `--max-pixels` are skipped unless `--full` is given.
+"""
+from __future__ import annotations
+from PIL import Image, ImageDraw
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+DEFAULT_COUNTS = [10, 100, 1000]
+DEFAULT_SIZES = [64, 256, 1024, 4096]
+DEFAULT_MAX_PIXELS = 1 << 28
+DEFAULT_TOLERANCE = 0.10
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MOD_CONFIG = {
+    "info": {
+        "name": "bench-mod",
+        "version": "0.0.1",
+        "title": "Benchmark",
+        "description": "Synthetic texture pack",
+        "factorio_version": "1.1",
+        "homepage": "https://example.invalid/",
+        "author": "bench",
+        "dependencies": ["base >= 1.1"]
+    },
+    "build": {
+        "path_format": "linux",
+        "factorio_dirs": {"game_path": "", "mods_path": ""},
+        "zip_options": {"store_only": True, "refresh_only": True},
+        "jobs": 1,
+        "backend": "pillow",
+        "fused_on_load": True,
+        # cold numbers: nothing may be served from a previous run
+        "cache": {"enabled": False},
+        "memo": {"enabled": False},
+        "profile": {"enabled": True, "report": "profile.json"}
+    }
+}
+LICENSING = {"license": "CC0", "attribution": "bench", "url": "$mod.homepage$"}
+
+
+def generate_pack(root: str, count: int, size: int, seed: int = 0) -> None:
+    """
+    Write a mod root with `count` load entries of `size` px textures: half are bases scaled up from 3/4 size,
+    half are line overlays rotated and tiled up from 1/4 size. Each base is composited with one overlay.
+    """
+    _random = random.Random(seed)
+    _assets = os.path.join(root, "mod", "build", "assets")
+    os.makedirs(os.path.join(_assets, "src"), exist_ok=True)
+    _load = {}
+    _build = {}
+    _bases = max(1, count // 2)
+    for idx in range(count):
+        _is_base = idx < _bases
+        _nickname = f"{'base' if _is_base else 'line'}-{idx}"
+        _path = f"src/{_nickname}.png"
+        if _is_base:
+            _side = max(1, size * 3 // 4)
+            _image = Image.merge("RGBA", [Image.effect_noise((_side, _side), _random.uniform(8, 64))] * 3 +
+                                 [Image.new("L", (_side, _side), 255)])
+            _on_load = {"scale": {"order": 1, "amount": {"until_resolution": f"{size}x{size}"}}}
+        else:
+            _side = max(4, size // 4)
+            _image = Image.new("RGBA", (_side, _side))
+            _draw = ImageDraw.Draw(_image)
+            _draw.line((0, _side // 2, _side, _side // 2), fill=(240, 200, 40, 255), width=max(1, _side // 16))
+            _on_load = {
+                "rotate": {"order": 1, "amount": {"by_value": [_random.choice([0, 45, 90])]}},
+                "tile": {"order": 2, "amount": {"until_resolution": f"{size}x{size}"}}
+            }
+        _image.save(os.path.join(_assets, _path))
+        _load[_nickname] = {"path": _path, "on_load": _on_load, "licensing": dict(LICENSING)}
+
+    _lines = [nickname for nickname in _load.keys() if nickname.startswith("line-")] or list(_load.keys())
+    for idx in range(_bases):
+        _build[f"target-{idx}"] = {
+            "use": f"load.base-{idx}",
+            "outputs": {"filetype": "png", "dir": "bench/", "name": f"target-{idx}-$composite-target$"},
+            "jobs": [{"composite-with": {"asset": f"load.{_lines[idx % len(_lines)]}", "mask": "none"}}]
+        }
+
+    with open(os.path.join(root, "mod-config.yml"), "w") as h:
+        yaml.safe_dump(MOD_CONFIG, h, sort_keys=False)
+    with open(os.path.join(_assets, "assets-config.yml"), "w") as h:
+        yaml.safe_dump({"load": _load, "build": _build}, h, sort_keys=False)
+
+
+def run_one() -> None:
+    """
+    Child process entry point, run inside a generated mod root. Prints one json result line.
+    """
+    import framework.asset.asset_load as asset_load
+    import framework.asset.asset_on_load as asset_on_load
+    import framework.asset.asset_build as asset_build
+    import framework.asset.manager.manager as manager
+    import framework.conf.mod_config as mod_config
+    import framework.profiler as profiler
+
+    _stages = {}
+    _start = time.perf_counter()
+    mod_config.ModConfigLoader()
+    _manager = manager.AssetManager()
+
+    _t = time.perf_counter()
+    _loader = asset_load.AssetLoader()
+    for asset in _loader.assets:
+        asset.image
+    _stages["load"] = time.perf_counter() - _t
+
+    _t = time.perf_counter()
+    _parser = asset_on_load.AssetParser()
+    for parsed in _parser.parsed:
+        parsed.modified_image
+        _manager.register_asset(parsed.asset.nickname, parsed, "load")
+    _stages["parse"] = time.perf_counter() - _t
+
+    _t = time.perf_counter()
+    _builder = asset_build.AssetBuilder()
+    _stages["build"] = time.perf_counter() - _t
+    _total = time.perf_counter() - _start
+
+    _outputs = sum(len(target.jobs) for target in _builder.built)
+    _megapixels = sum(
+        parsed.modified_image.size[0] * parsed.modified_image.size[1] for parsed in _parser.parsed
+    ) / 1e6
+    _loader.dispose()
+    print(json.dumps({
+        "assets": len(_loader.assets),
+        "outputs": _outputs,
+        "megapixels": _megapixels,
+        "stages_s": _stages,
+        "profile_totals": profiler.BuildProfiler().stage_totals(),
+        "total_s": _total,
+        "assets_per_s": len(_loader.assets) / _total,
+        "megapixels_per_s": _megapixels / _total,
+        "peak_rss_kb": profiler.peak_rss_kb()
+    }))
+
+
+def run_scenario(count: int, size: int) -> dict:
+    with tempfile.TemporaryDirectory(prefix="bench-pack-") as root:
+        generate_pack(root, count, size)
+        _env = dict(os.environ)
+        _env["PYTHONPATH"] = REPO_ROOT + os.pathsep + _env.get("PYTHONPATH", "")
+        _proc = subprocess.run(
+            [sys.executable, "-m", "framework.bench.pipeline", "--run-one"],
+            cwd=root, env=_env, capture_output=True, text=True
+        )
+        if _proc.returncode != 0:
+            raise RuntimeError(f"Benchmark scenario {count}x{size} failed:\n{_proc.stderr}")
+        # the pipeline's loggers also write to stdout, the result is the last line
+        return json.loads(_proc.stdout.strip().splitlines()[-1])
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    :return: a line per scenario that is slower, or uses more memory, than the baseline by more than `tolerance`.
+    """
+    _regressions = []
+    for key, result in results.items():
+        if key not in baseline.keys():
+            continue
+        for metric in ("total_s", "peak_rss_kb"):
+            _old = baseline[key].get(metric)
+            _new = result.get(metric)
+            if _old and _new and _new > _old * (1 + tolerance):
+                _regressions.append(f"{key} {metric}: {_old} -> {_new} (+{(_new / _old - 1) * 100:.1f}%)")
+    return _regressions
+
+
+def main() -> None:
+    _parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    _parser.add_argument("--counts", type=int, nargs="+", default=DEFAULT_COUNTS)
+    _parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    _parser.add_argument("--max-pixels", type=int, default=DEFAULT_MAX_PIXELS)
+    _parser.add_argument("--full", action="store_true", help="run every scenario regardless of --max-pixels")
+    _parser.add_argument("--baseline", help="json results of an earlier run to compare against")
+    _parser.add_argument("--save-baseline", help="write this run's results as a baseline")
+    _parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    _parser.add_argument("--run-one", action="store_true", help=argparse.SUPPRESS)
+    _args = _parser.parse_args()
+
+    if _args.run_one:
+        run_one()
+        return
+
+    _results = {}
+    print(f"{'scenario':>12} {'total (s)':>10} {'load':>8} {'parse':>8} {'build':>8} "
+          f"{'assets/s':>9} {'Mpx/s':>8} {'peak KiB':>10}")
+    for count in _args.counts:
+        for size in _args.sizes:
+            _key = f"{count}x{size}"
+            if not _args.full and count * size * size > _args.max_pixels:
+                print(f"{_key:>12} skipped, above --max-pixels")
+                continue
+            _result = run_scenario(count, size)
+            _results[_key] = _result
+            print(
+                f"{_key:>12} {_result['total_s']:>10.3f} {_result['stages_s']['load']:>8.3f} "
+                f"{_result['stages_s']['parse']:>8.3f} {_result['stages_s']['build']:>8.3f} "
+                f"{_result['assets_per_s']:>9.1f} {_result['megapixels_per_s']:>8.1f} {_result['peak_rss_kb']:>10}"
+            )
+
+    if _args.save_baseline:
+        with open(_args.save_baseline, "w") as h:
+            json.dump(_results, h, indent=1)
+    if _args.baseline:
+        with open(_args.baseline, "r") as h:
+            _regressions = compare(_results, json.load(h), _args.tolerance)
+        for line in _regressions:
+            print(f"REGRESSION {line}")
+        if len(_regressions) > 0:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
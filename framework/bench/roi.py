@@ -0,0 +1,122 @@
+"""
+Measure region-of-interest compositing: each backend with `roi` off and on, over overlays of decreasing sparsity.
+
+    python -m framework.bench.roi [--sizes 1024 4096] [--layers 4] [--repeat 3]
+
+Overlays are a small decal on an otherwise transparent canvas, thin lines across it, and fully opaque noise
+(where ROI falls back to a full pass, so its row shows the cost of finding the regions). Both `composite-with`
+jobs (`composite_many`) and `composite-layers` stacks (`composite_layer`), plain and with a blend mode and
+opacity, are timed, and every ROI output is checked against the full-canvas one before its timings are reported.
+Both modes are run once untimed, then timed alternately, so neither pays for warming the caches of the other.
+
+`PillowBackend.composite_many` has no ROI path, it composites the whole canvas either way, so `composite-with`
+jobs under the default backend are unchanged; its column shows both timings but no speedup.
+"""
+from __future__ import annotations
+from PIL import Image, ImageDraw
+import argparse
+
+import framework.asset.backend.backends as backends
+import framework.bench.backends as bench_backends
+
+DEFAULT_SIZES = [1024, 4096]
+OVERLAY_KINDS = ("decal", "lines", "dense")
+# the decal's side, as a share of the canvas's
+DECAL_SCALE = 1 / 8
+LINE_WIDTH = 2
+# the blend mode and opacity of the blended stack
+STACK_BLEND = ("multiply", 0.75)
+# (backend, column) pairs that run the same code with `roi` off and on
+WITHOUT_ROI = {("pillow", "many")}
+
+
+def overlay(kind: str, size: int, seed: int) -> Image:
+    if kind == "dense":
+        return bench_backends.random_rgba((size, size))
+    _canvas = Image.new('RGBA', (size, size))
+    if kind == "decal":
+        _side = max(1, int(size * DECAL_SCALE))
+        _offset = (seed * _side) % (size - _side) if size > _side else 0
+        _canvas.paste(bench_backends.random_rgba((_side, _side)), (_offset, _offset))
+        return _canvas
+    _draw = ImageDraw.Draw(_canvas)
+    for row in range(size // 8 + seed, size, size // 4):
+        _draw.line([(0, row), (size, row)], fill=(200, 180, 40, 255), width=LINE_WIDTH)
+    return _canvas
+
+
+def stack(
+        backend: backends.PillowBackend, base: Image, layers: list[tuple[Image, None]], blend: str, opacity: float
+) -> Image:
+    _buffer = base.copy()
+    for layer, mask in layers:
+        backend.composite_layer(_buffer, layer, mask, blend, opacity)
+    return _buffer
+
+
+def alternating(repeat: int, func, full: backends.PillowBackend, roi: backends.PillowBackend) -> tuple:
+    """
+    Best of `repeat` timings of `func` with each backend, after an untimed warm-up run of both, alternating
+    which one goes first.
+    :return: the full and ROI timings, then the full and ROI results.
+    """
+    _results = [func(full), func(roi)]
+    _best = [None, None]
+    for round_idx in range(repeat):
+        for idx in ((0, 1) if round_idx % 2 == 0 else (1, 0)):
+            _elapsed, _results[idx] = bench_backends.best_of(1, func, (full, roi)[idx])
+            _best[idx] = _elapsed if _best[idx] is None else min(_best[idx], _elapsed)
+    return _best[0], _best[1], _results[0], _results[1]
+
+
+def run(sizes: list[int], layers: int, repeat: int) -> list[dict]:
+    _classes = [backends.PillowBackend] + ([backends.NumpyBackend] if backends.numpy is not None else [])
+    _rows = []
+    for size in sizes:
+        _base = bench_backends.random_rgba((size, size))
+        for kind in OVERLAY_KINDS:
+            _layers = [(overlay(kind, size, seed), None) for seed in range(layers)]
+            for backend_class in _classes:
+                _row = {"backend": backend_class.name, "size": size, "overlay": kind, "identical": True}
+                _runs = {
+                    "many": lambda backend: backend.composite_many(_base, _layers),
+                    "stack": lambda backend: [stack(backend, _base, _layers, "normal", 1.0)],
+                    "blended": lambda backend: [stack(backend, _base, _layers, *STACK_BLEND)]
+                }
+                for column, func in _runs.items():
+                    _row[f"{column}_s"], _row[f"{column}_roi_s"], _full, _roi = alternating(
+                        repeat, func, backend_class(roi=False), backend_class(roi=True)
+                    )
+                    _row["identical"] &= [im.tobytes() for im in _full] == [im.tobytes() for im in _roi]
+                _rows.append(_row)
+    return _rows
+
+
+def main() -> None:
+    _parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    _parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    _parser.add_argument("--layers", type=int, default=4, help="overlays per target")
+    _parser.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    _args = _parser.parse_args()
+
+    _columns = ("many", "stack", "blended")
+    print(
+        f"{'backend':<8} {'size':>6} {'overlay':<7} "
+        + " ".join(f"{column + ' (s)':>12} {'roi (s)':>9} {'x':>5}" for column in _columns) + " identical"
+    )
+    for row in run(_args.sizes, _args.layers, _args.repeat):
+        print(
+            f"{row['backend']:<8} {row['size']:>6} {row['overlay']:<7} "
+            + " ".join(
+                f"{row[column + '_s']:>12.4f} {row[column + '_roi_s']:>9.4f} "
+                + (f"{'-':>5}" if (row["backend"], column) in WITHOUT_ROI
+                   else f"{row[column + '_s'] / row[column + '_roi_s']:>5.1f}")
+                for column in _columns
+            )
+            + f" {row['identical']}"
+        )
+    print("-: no ROI path, the same full-canvas composite runs either way")
+
+
+if __name__ == "__main__":
+    main()
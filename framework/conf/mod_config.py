@@ -1,6 +1,8 @@
 import framework.asset.manager.manager as manager
+import framework.phase_logger as logger
+import framework.context as context
+import framework.conf.snapshot as snapshot
 from framework.conf.conf_meta_classes import ModConfigLoaderSingletonManager
-import yaml
 
 
 MOD_CONFIG_FILENAME: str = "mod-config.yml"
@@ -9,8 +11,13 @@ DEFAULT_CONTEXT_INSTANCE: int = 0
 
 class ModConfigLoader(metaclass=ModConfigLoaderSingletonManager):
     def __init__(self) -> None:
-        with open(MOD_CONFIG_FILENAME, 'r') as h:
-            self.config_dict: dict = yaml.safe_load(h)
+        self.config_dict: dict = snapshot.load_yaml(context.path(MOD_CONFIG_FILENAME))
+
+        logger.configure_logging(
+            min_severity=self.build_option("logging.min_severity", None),
+            stream=self.build_option("logging.stream", None),
+            jsonl=self.build_option("logging.jsonl", None)
+        )
 
         self.manager = manager.AssetManager()
         _context_info: tuple[int, str] = (DEFAULT_CONTEXT_INSTANCE, "mod-info")
@@ -30,4 +37,20 @@ class ModConfigLoader(metaclass=ModConfigLoaderSingletonManager):
         self.manager.register_substitution(_context_info, "$build.factorio_dirs.game_path$",
                                            self.config_dict["build"]["factorio_dirs"]["game_path"])
         self.manager.register_substitution(_context_info, "$build.factorio_dirs.mods_path$",
-                                           self.config_dict["build"]["factorio_dirs"]["mods_path"])
\ No newline at end of file
+                                           self.config_dict["build"]["factorio_dirs"]["mods_path"])
+
+    def build_option(self, key: str, default=None):
+        """
+        Look up an optional setting from the `build` block of the mod config by dotted key,
+        e.g. `build_option("cache.enabled", True)`.
+
+        :param key: dotted path of the setting beneath `build`.
+        :param default: value returned when any part of the path is missing.
+        :return: the configured value, or `default`.
+        """
+        _node = self.config_dict["build"]
+        for part in key.split("."):
+            if not isinstance(_node, dict) or part not in _node.keys():
+                return default
+            _node = _node[part]
+        return _node
\ No newline at end of file
@@ -0,0 +1,92 @@
+from __future__ import annotations
+from threading import get_ident
+import hashlib
+import marshal
+import os
+
+import framework.context as context
+import framework.lazy as lazy
+
+yaml = lazy.lazy_import("yaml")
+
+SNAPSHOT_DIR = 'mod/build/.cache/config/'
+SNAPSHOT_FORMAT_VERSION = 2
+# what a snapshot holds besides the data, checked before it is trusted
+SNAPSHOT_FIELDS = {"version": int, "mtime_ns": int, "size": int, "sha256": str}
+
+
+def yaml_loader() -> type:
+    """
+    The libyaml backed `CSafeLoader` when PyYAML was built with it, `SafeLoader` otherwise. Both only construct
+    plain python objects.
+    """
+    return getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def parse_yaml(stream) -> object:
+    return yaml.load(stream, Loader=yaml_loader())
+
+
+def _snapshot_path(path: str) -> str:
+    _name = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    return context.path(SNAPSHOT_DIR, f"{os.path.basename(path)}.{_name}.marshal")
+
+
+def _read_snapshot(path: str) -> dict | None:
+    """
+    A snapshot is stored with `marshal`, which only rebuilds plain values and never runs code, as the snapshot
+    directory is part of a mod tree the build daemon may be sent by anyone. Anything wrong with it, however it
+    fails, only means the file is parsed again.
+    """
+    try:
+        with open(path, 'rb') as h:
+            _snapshot = marshal.load(h)
+    except Exception:
+        return None
+    if not isinstance(_snapshot, dict) or "data" not in _snapshot.keys() or any(
+            type(_snapshot.get(field)) is not kind for field, kind in SNAPSHOT_FIELDS.items()
+    ) or _snapshot["version"] != SNAPSHOT_FORMAT_VERSION:
+        return None
+    return _snapshot
+
+
+def load_yaml(path: str) -> object:
+    """
+    Parse a yaml config file through a snapshot of its last parse. The snapshot is used while the file's mtime
+    and size are unchanged, and when they changed but the file's sha256 did not (e.g. after a checkout); otherwise
+    the file is parsed again and the snapshot replaced. Every call returns a fresh object, callers may modify it.
+
+    Only the parse is snapshotted. Compiling assets-config.yml into records also reads the file system (paths,
+    batch globs) and takes well under a millisecond for a typical config, so it is redone on every run.
+    """
+    _stat = os.stat(path)
+    _snapshot_file = _snapshot_path(path)
+    _snapshot = _read_snapshot(_snapshot_file)
+    if _snapshot is not None and _snapshot["mtime_ns"] == _stat.st_mtime_ns and _snapshot["size"] == _stat.st_size:
+        return _snapshot["data"]
+
+    with open(path, 'rb') as h:
+        _source = h.read()
+    _digest = hashlib.sha256(_source).hexdigest()
+    if _snapshot is not None and _snapshot["sha256"] == _digest:
+        _data = _snapshot["data"]
+    else:
+        _data = parse_yaml(_source)
+    _snapshot = {
+        "version": SNAPSHOT_FORMAT_VERSION,
+        "mtime_ns": _stat.st_mtime_ns,
+        "size": _stat.st_size,
+        "sha256": _digest,
+        "data": _data
+    }
+    try:
+        os.makedirs(os.path.dirname(_snapshot_file), exist_ok=True)
+        _tmp_path = f"{_snapshot_file}.{os.getpid()}.{get_ident()}.tmp"
+        _encoded = marshal.dumps(_snapshot)
+        with open(_tmp_path, 'wb') as h:
+            h.write(_encoded)
+        os.replace(_tmp_path, _snapshot_file)
+    except (OSError, ValueError):
+        # a read-only tree, or yaml values marshal cannot hold (timestamps), still builds, it just parses every time
+        pass
+    return _data
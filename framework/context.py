@@ -0,0 +1,129 @@
+from __future__ import annotations
+from contextvars import ContextVar
+from threading import Lock, RLock, local
+import os
+
+_current: ContextVar[BuildContext | None] = ContextVar("build_context", default=None)
+_default_lock: Lock = Lock()
+_default: BuildContext | None = None
+
+
+class BuildContext:
+    """
+    Owns everything one build of one mod holds on to: an instance of every framework singleton (the AssetManager,
+    AssetLoader, AssetBuilder, ModConfigLoader, the phase loggers, caches...), per-build settings, and the root
+    directory the mod project lives in. Entering a context (`with BuildContext(root):`) makes it current for the
+    calling thread or task, and every singleton class called inside it resolves to that context's instance.
+    Independent contexts can be used from different threads at once; code outside of any context uses a default
+    context rooted at the working directory, which is how a plain `python test.py` build behaves. Instances given
+    as `shared` are used by the context instead of its own, e.g. the content-keyed caches a build daemon keeps
+    warm across the contexts of its requests.
+
+    ## Instance Methods:
+        * self.path()
+        * self.instance()
+        * self.reset()
+
+    ## Instance Vars:
+        * self.root
+        * self.instances
+        * self.shared
+        * self.settings
+    """
+    # per-process contexts of worker processes, by root, see `self.for_root()`
+    _by_root: dict[str, BuildContext] = {}
+    _by_root_lock: Lock = Lock()
+
+    def __init__(self, root: str = "", shared: dict[type, object] | None = None) -> None:
+        """
+        :param root: the mod project directory, holding `mod-config.yml` and `mod/`. Empty for the working dir.
+        :param shared: [optional] singleton instances, by class, this context uses rather than creating its own.
+        """
+        self.root = root
+        self.shared: dict[type, object] = dict(shared or {})
+        self.instances: dict[type, object] = dict(self.shared)
+        self.settings: dict = {}
+        self._locks: dict[type, RLock] = {}
+        self._lock = Lock()
+        self._tokens = local()
+
+    def path(self, *parts: str) -> str:
+        """
+        A project-relative path resolved against this context's root. With the default root it is unchanged.
+        """
+        return os.path.join(self.root, *parts)
+
+    def instance(self, cls: type, factory):
+        """
+        This context's instance of a singleton class, made by `factory()` on first use.
+        """
+        _instance = self.instances.get(cls)
+        if _instance is not None:
+            return _instance
+        with self._lock:
+            _class_lock = self._locks.setdefault(cls, RLock())
+        with _class_lock:
+            if cls not in self.instances.keys():
+                self.instances[cls] = factory()
+        return self.instances[cls]
+
+    def reset(self) -> None:
+        """
+        Drop every instance and setting, so the next build in this context starts from scratch. Shared instances
+        are kept.
+        """
+        with self._lock:
+            self.instances = dict(self.shared)
+            self.settings.clear()
+
+    def __enter__(self) -> BuildContext:
+        if not hasattr(self._tokens, "stack"):
+            self._tokens.stack = []
+        self._tokens.stack.append(_current.set(self))
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        _current.reset(self._tokens.stack.pop())
+
+    @classmethod
+    def for_root(cls, root: str) -> BuildContext:
+        """
+        The context of this process for a root, created once. Worker processes use it so that every job they run
+        for the same mod shares one set of caches.
+        """
+        with cls._by_root_lock:
+            if root not in cls._by_root.keys():
+                cls._by_root[root] = BuildContext(root)
+            return cls._by_root[root]
+
+
+def current() -> BuildContext:
+    """
+    The context entered by the calling thread or task, or the default context.
+    """
+    _context = _current.get()
+    if _context is not None:
+        return _context
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = BuildContext()
+    return _default
+
+
+def path(*parts: str) -> str:
+    """
+    `current().path()`.
+    """
+    return current().path(*parts)
+
+
+class ContextSingletonManager(type):
+    """
+    Base metaclass of the framework singletons. Instead of one instance per process, a class using it has one
+    instance per BuildContext: calling the class returns the current context's instance, creating it (thread
+    safely) on first use. Do not attempt to directly instantiate, reference or otherwise use this class.
+    """
+    def __call__(cls, *args, **kwargs):
+        return current().instance(cls, lambda: type.__call__(cls, *args, **kwargs))
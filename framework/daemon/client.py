@@ -0,0 +1,29 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import socket
+
+
+def request(socket_path: str, payload: dict) -> dict:
+    """
+    Send one request to a BuildDaemon and wait for its answer.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(socket_path)
+        s.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+        with s.makefile('rb') as h:
+            _line = h.readline()
+    if not _line:
+        return {"ok": False, "error": f"The build daemon on {socket_path} closed the connection."}
+    return json.loads(_line)
+
+
+def submit(socket_path: str, roots: list[str], jobs: int | None = None, release: bool = False) -> list[dict]:
+    """
+    Request a build of every mod root at once, one connection each, so the daemon runs them concurrently.
+    :return: the build reports, in the order of `roots`.
+    """
+    _payloads = [{"root": os.path.abspath(root), "jobs": jobs, "release": release} for root in roots]
+    with ThreadPoolExecutor(max_workers=max(1, len(_payloads))) as _threads:
+        return list(_threads.map(lambda payload: request(socket_path, payload), _payloads))
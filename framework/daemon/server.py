@@ -0,0 +1,204 @@
+from __future__ import annotations
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+
+import framework.context as context
+import framework.phase_logger as logger
+import framework.conf.mod_config as mod_config
+import framework.asset.asset
+import framework.asset.asset_build as asset_build
+import framework.asset.atlas.atlas as atlas
+import framework.asset.backend.raw_store as raw_store
+import framework.asset.on_load.memo as memo
+import framework.profiler as profiler
+
+DEFAULT_SOCKET_PATH = 'mod/build/.daemon/daemon.sock'
+PHASE_LOGGERS = (
+    logger.AssetLoadPhaseLogger,
+    logger.AssetModifyPhaseLogger,
+    logger.AssetOutputPhaseLogger,
+    logger.AssetManagerLogger
+)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """
+    Reads json requests, one per line, and answers each with one json line. Every connection is served on its own
+    thread, so clients wanting concurrent builds open one connection per build.
+    """
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                _request = json.loads(line)
+            except ValueError as e:
+                _response = {"ok": False, "error": f"Malformed request: {e}"}
+            else:
+                _response = self.server.build_daemon.handle(_request)
+            self.wfile.write(json.dumps(_response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class BuildDaemon:
+    """
+    A resident build server. Builds are requested over a Unix socket as `{"root": "<mod project dir>"}` json lines
+    (optionally with `"jobs"` and `"release"`), and each runs in its own BuildContext with that root's
+    `mod-config.yml`, at most `max_builds` at once. The daemon's own context, rooted where it was started, holds
+    the TransformMemo and RawImageStore every build shares: both are keyed by content, so transformed images stay
+    decoded in memory and large sources stay mapped across requests and across mods using the same base
+    textures. Python startup and the imports are paid once. The answer to a build is its per-phase timings,
+    output manifest, atlas sheets, package path and any logged problems.
+
+    Other requests: `{"command": "stats"}` and `{"command": "shutdown"}`.
+
+    ## Instance Methods:
+        * self.run_forever()
+        * self.handle()
+        * self.build()
+        * self.stats()
+
+    ## Instance Vars:
+        * self.socket_path
+        * self.max_builds
+        * self.shared
+        * self.builds
+    """
+    class DaemonAlreadyRunningError(Exception):
+        def __init__(self, *args):
+            super().__init__(*args)
+
+    def __init__(self, socket_path: str | None = None, max_builds: int | None = None) -> None:
+        self.home = context.current()
+        self.socket_path = socket_path or context.path(DEFAULT_SOCKET_PATH)
+        self.max_builds = max(1, max_builds or os.cpu_count() or 1)
+        # the shared caches log into the daemon's own loggers, only keep what needs attention
+        logger.configure_logging(min_severity="MEDIUM")
+        self.shared = {
+            memo.TransformMemo: memo.TransformMemo(),
+            raw_store.RawImageStore: raw_store.RawImageStore()
+        }
+        # streaming builds release what they are done with, the shared memo keeps it for the next request
+        self.shared[memo.TransformMemo].resident = True
+        self.builds = 0
+        self._slots = threading.BoundedSemaphore(self.max_builds)
+        self._lock = threading.Lock()
+        self._server: socketserver.ThreadingUnixStreamServer | None = None
+
+    def run_forever(self) -> None:
+        if os.path.exists(self.socket_path):
+            if _listening(self.socket_path):
+                raise self.DaemonAlreadyRunningError(f"A build daemon is already listening on {self.socket_path}.")
+            os.remove(self.socket_path)
+        os.makedirs(os.path.dirname(self.socket_path) or ".", exist_ok=True)
+        with socketserver.ThreadingUnixStreamServer(self.socket_path, _RequestHandler) as server:
+            server.build_daemon = self
+            self._server = server
+            print(f"Build daemon listening on {self.socket_path} ({self.max_builds} concurrent builds), Ctrl+C to stop.")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                os.remove(self.socket_path)
+
+    def handle(self, request: dict) -> dict:
+        _command = request.get("command", "build")
+        if _command == "build":
+            return self.build(request)
+        if _command == "stats":
+            return self.stats()
+        if _command == "shutdown":
+            # called on a handler thread, so waiting for serve_forever() to return cannot deadlock, and closing
+            # the server waits for this answer to be written
+            self._server.shutdown()
+            return {"ok": True}
+        return {"ok": False, "error": f"Unknown command {_command!r}."}
+
+    def build(self, request: dict) -> dict:
+        """
+        Build one mod in a fresh BuildContext that uses the daemon's shared caches.
+        :param request: `{"root": str, "jobs": int | None, "release": bool}`.
+        :return: the build's json-able report, `ok` is False (with the `error`) if it failed.
+        """
+        if "root" not in request.keys():
+            return {"ok": False, "error": "Build request without a root."}
+        _root = os.path.abspath(request["root"])
+        _queued = time.perf_counter()
+        with self._slots, context.BuildContext(_root, shared=self.shared):
+            _started = time.perf_counter()
+            _report = {"root": _root, "ok": True, "timings": {"queued_s": _started - _queued}}
+            try:
+                _config = mod_config.ModConfigLoader()
+                if request.get("jobs") is not None:
+                    _config.config_dict["build"]["jobs"] = int(request["jobs"])
+                if request.get("release"):
+                    _config.config_dict["build"]["release"] = True
+                _assets = framework.asset.asset.Assets()
+                _assets.dispose()
+            except Exception as e:
+                _report.update(ok=False, error=f"{type(e).__name__}: {e}")
+            else:
+                _manifest = self._manifest(_assets)
+                _report["timings"].update(_manifest.pop("timings"))
+                _report.update(_manifest)
+            _report["timings"]["total_s"] = time.perf_counter() - _started
+            _report["problems"] = _problems()
+        with self._lock:
+            self.builds += 1
+        return _report
+
+    @staticmethod
+    def _manifest(assets: framework.asset.asset.Assets) -> dict:
+        _profiler = profiler.BuildProfiler()
+        _outputs = {}
+        _skipped = []
+        for target in asset_build.AssetBuilder().built:
+            _skipped.extend(target.skipped)
+            for name, output in target.outputs.items():
+                _outputs[name] = output.paths
+        return {
+            "timings": {**{f"{phase}_s": seconds for phase, seconds in assets.timings.items()},
+                        **({"stages": _profiler.stage_totals()} if _profiler.enabled else {})},
+            "outputs": _outputs,
+            "skipped": sorted(_skipped),
+            "atlas": {group: info["sheets"] for group, info in atlas.AtlasBuilder().maps.items()},
+            "package": assets.package.archive_path if assets.config.build_option("zip_options.enabled", True)
+            else None
+        }
+
+    def stats(self) -> dict:
+        _memo = self.shared[memo.TransformMemo]
+        return {
+            "ok": True,
+            "builds": self.builds,
+            "max_builds": self.max_builds,
+            "memo": {**_memo.hits, "misses": _memo.misses},
+            "problems": _problems(self.home)
+        }
+
+
+def _problems(build_context: context.BuildContext | None = None) -> list[str]:
+    """
+    The MEDIUM and HIGH records of a context's phase loggers, uncoloured.
+    """
+    with build_context or context.current():
+        _lines = []
+        for logger_class in PHASE_LOGGERS:
+            for record in logger_class().records:
+                if logger.SEVERITY_RANK[record[1]] >= logger.SEVERITY_RANK[logger.SEVERITIES.MEDIUM]:
+                    _lines.append(f"{record[1].value}: " + (record[3] % record[4] if record[4] else record[3]))
+        return _lines
+
+
+def _listening(socket_path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(socket_path)
+        except OSError:
+            return False
+    return True
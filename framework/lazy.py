@@ -0,0 +1,51 @@
+"""
+Deferred imports of the heavy third party and stdlib modules (Pillow, PyYAML, numpy, concurrent.futures), so that
+a run which never decodes an image or parses a changed config does not pay for importing them.
+
+This does not bring a cached no-op build (`python test.py`) down to tens of milliseconds: measured at about 80 ms
+wall, 15 ms of it is interpreter start-up and about 50 ms importing the framework and the stdlib modules it
+uses eagerly (json, re, hashlib, threading, zipfile for packaging), leaving about 15 ms of actual work.
+"""
+from __future__ import annotations
+import importlib
+import importlib.util
+import sys
+from types import ModuleType
+
+
+class _LazyModule(ModuleType):
+    """
+    Stands in for a module until its first attribute access, which imports it through the regular import
+    machinery and delegates to it from then on. Unlike `importlib.util.LazyLoader`, which on Python 3.11 lets a
+    second thread see the module before it has executed, `importlib.import_module()` holds the module's import
+    lock, so threads touching the module at once all wait for it to finish executing.
+    """
+    _module: ModuleType | None = None
+
+    def __getattr__(self, attr: str):
+        if self._module is None:
+            self._module = importlib.import_module(self.__name__)
+        return getattr(self._module, attr)
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    The named module, executed on first attribute access rather than now. A module that is already imported is
+    returned as is. Safe to touch from several threads at once.
+    :raises ModuleNotFoundError: if the module cannot be found, without importing it.
+    """
+    if name in sys.modules.keys():
+        return sys.modules[name]
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    return _LazyModule(name)
+
+
+def optional_import(name: str) -> ModuleType | None:
+    """
+    `lazy_import()` for optional dependencies: None when the module is not installed.
+    """
+    try:
+        return lazy_import(name)
+    except ModuleNotFoundError:
+        return None
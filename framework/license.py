@@ -1,8 +1,7 @@
 from enum import Enum
 import framework.asset.manager.manager as manager
 import framework.phase_logger as logger
-from framework.asset.build.build_helpers import SUBSTITUTION_REGEX
-import re
+from framework.asset.build.build_helpers import SUBSTITUTION_PATTERN
 
 
 class LicenseTypes(Enum):
@@ -33,7 +32,6 @@ class AbstractLicense:
     def __init__(self, license_dict: dict):
         self.manager = manager.AssetManager()
         self.logger = logger.AssetLoadPhaseLogger()
-        _mod_info = self.manager.name_substitutions((0, "mod-info"))
 
         self.license = LicenseTypes(license_dict["license"].upper())
         self.attribution = license_dict["attribution"]
@@ -41,22 +39,12 @@ class AbstractLicense:
 
         #
 
-        if re.search(SUBSTITUTION_REGEX, self.url):
-            self.logger.log(
-                logger.LoggingSeverities.LOG,
-                f"Running name-substitution on {self.url}."
-            )
-            for replace, replace_with in _mod_info:
-                if replace in self.url:
-                    self.url = self.url.replace(replace, replace_with)
-                    self.logger.log(
-                        logger.LoggingSeverities.LOG,
-                        f"+--> substituted {replace} with {replace_with}."
-                    )
+        if SUBSTITUTION_PATTERN.search(self.url):
+            self.url = self.manager.substitute((0, "mod-info"), self.url)
 
         self.logger.log(
             logger.LoggingSeverities.LOW,
-            f"Instanced a {self.license.value} license for {self.attribution}({self.url})"
+            "Instanced a %s license for %s(%s)", self.license.value, self.attribution, self.url
         )
 
     def substitute_url(self, sub_map: dict) -> None:
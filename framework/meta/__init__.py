@@ -1,74 +1,45 @@
+from __future__ import annotations
 from threading import Lock
+import json
 import sys
+import time
 from enum import Enum
+import framework.context as context
 
 
-class AssetLoadPhaseLoggerSingletonManager(type):
+class AssetLoadPhaseLoggerSingletonManager(context.ContextSingletonManager):
     """
     Singleton metaclass for managing the AssetLoadPhaseLogger singleton. Do not attempt to directly instantiate,
     reference or otherwise use this class. Its function is autonomous.
     """
-    _instances = {}
 
-    _lock: Lock = Lock()
 
-    def __call__(cls, *args, **kwargs):
-        with cls._lock:
-            if cls not in cls._instances:
-                instance = super().__call__(*args, **kwargs)
-                cls._instances[cls] = instance
-        return cls._instances[cls]
-
-
-class AssetModifyPhaseLoggerSingletonManager(type):
+class AssetModifyPhaseLoggerSingletonManager(context.ContextSingletonManager):
     """
     Singleton metaclass for managing the AssetModifyPhaseLogger singleton. Do not attempt to directly instantiate,
     reference or otherwise use this class. Its function is autonomous.
     """
-    _instances = {}
-
-    _lock: Lock = Lock()
 
-    def __call__(cls, *args, **kwargs):
-        with cls._lock:
-            if cls not in cls._instances:
-                instance = super().__call__(*args, **kwargs)
-                cls._instances[cls] = instance
-        return cls._instances[cls]
 
-
-class AssetOutputPhaseLoggerSingletonManager(type):
+class AssetOutputPhaseLoggerSingletonManager(context.ContextSingletonManager):
     """
     Singleton metaclass for managing the AssetOutputPhaseLogger singleton. Do not attempt to directly instantiate,
     reference or otherwise use this class. Its function is autonomous.
     """
-    _instances = {}
-
-    _lock: Lock = Lock()
-
-    def __call__(cls, *args, **kwargs):
-        with cls._lock:
-            if cls not in cls._instances:
-                instance = super().__call__(*args, **kwargs)
-                cls._instances[cls] = instance
-        return cls._instances[cls]
 
 
-class AssetManagerLoggerSingletonManager(type):
+class AssetManagerLoggerSingletonManager(context.ContextSingletonManager):
     """
     Singleton metaclass for managing the AssetOutputPhaseLogger singleton. Do not attempt to directly instantiate,
     reference or otherwise use this class. Its function is autonomous.
     """
-    _instances = {}
 
-    _lock: Lock = Lock()
 
-    def __call__(cls, *args, **kwargs):
-        with cls._lock:
-            if cls not in cls._instances:
-                instance = super().__call__(*args, **kwargs)
-                cls._instances[cls] = instance
-        return cls._instances[cls]
+class BuildProfilerSingletonManager(context.ContextSingletonManager):
+    """
+    Singleton metaclass for managing the BuildProfiler singleton. Do not attempt to directly instantiate,
+    reference or otherwise use this class. Its function is autonomous.
+    """
 
 
 class LoggingSeverities(Enum):
@@ -80,6 +51,16 @@ class LoggingSeverities(Enum):
     CRITICAL = "Critical"
 
 
+SEVERITY_RANK = {
+    LoggingSeverities.LOG: 0,
+    LoggingSeverities.LOW: 1,
+    LoggingSeverities.MEDIUM: 2,
+    LoggingSeverities.HIGH: 3,
+    LoggingSeverities.SEVERE: 4,
+    LoggingSeverities.CRITICAL: 5
+}
+
+
 class LoggingColours:
     HEADER = '\033[95m'
     OKBLUE = '\033[94m'
@@ -113,51 +94,125 @@ class LoggingColours:
             return _str + self.ENDC
 
 
+class JsonLinesSink:
+    """
+    Appends every accepted log record to a file as one json object per line, for log aggregation. The file is
+    opened per record, so a sink left behind by a finished BuildContext holds no file handle.
+    """
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self._lock = Lock()
+
+    def emit(self, logger_name: str, record: tuple) -> None:
+        _timestamp, _severity, _asset, _message, _args = record
+        _line = json.dumps({
+            "ts": _timestamp,
+            "logger": logger_name,
+            "severity": _severity.value,
+            "asset": _asset,
+            "message": _message % _args if _args else _message
+        })
+        with self._lock, open(self.filename, 'a', encoding="utf-8") as fd:
+            fd.write(_line + "\n")
+
+
 class AbstractLogger:
+    """
+    Records log events as compact `(timestamp, severity, asset, message, args)` tuples. Records below the
+    `min_severity` threshold are dropped before anything is formatted, and messages given with %-style `args` are
+    only formatted when they are written out. Records are written to `stdout` (or a file) by `output()`, one at
+    a time, or immediately on `log()` when `stream` is set. Every accepted record is also passed to the extra
+    `sinks`, e.g. a JsonLinesSink. The class attributes are the defaults; `configure()` overrides them for the
+    loggers of the current BuildContext only.
+    """
     class CriticalLogRecievedError(Exception):
         def __init__(self, *args):
             super().__init__(*args)
 
-    lines: list[(LoggingSeverities, str)] = None
+    records: list[tuple] = None
     logger_pprint: LoggingColours = LoggingColours()
 
-    def __init__(self):
-        self.lines = []
+    min_severity: LoggingSeverities = LoggingSeverities.LOG
+    stream: bool = False
+    sinks: list = []
 
-    def log(self, severity: LoggingSeverities, log: str) -> None:
+    def __init__(self):
+        self.records = []
+        self.context = context.current()
+
+    @classmethod
+    def configure(
+            cls,
+            min_severity: LoggingSeverities | None = None,
+            stream: bool | None = None,
+            sinks: list | None = None
+    ) -> None:
+        """
+        Apply settings shared by every logger of the current BuildContext.
+        """
+        _settings = context.current().settings
+        if min_severity is not None:
+            _settings["logging.min_severity"] = min_severity
+        if stream is not None:
+            _settings["logging.stream"] = stream
+        if sinks is not None:
+            _settings["logging.sinks"] = sinks
+
+    @property
+    def lines(self) -> list[str]:
+        return [self._format(record) for record in self.records]
+
+    def _format(self, record: tuple) -> str:
+        _message = record[3] % record[4] if record[4] else record[3]
+        return self.logger_pprint.log((record[1], _message))
+
+    def log(self, severity: LoggingSeverities, log: str, *args, asset: str = None) -> None:
         """
-        Add a log line to the class `self.lines` instance var.
+        Add a log record to the class `self.records` instance var.
 
         Raises:
             AbstractLogger.CriticalLogRecievedError if a log of SEVERE or CRITICAL severity is added.
             Do not attempt to catch this exception as the program has entered an unrecoverable state.
 
         :param severity: A LoggingSeverities enum element indicating the severity of the logged event.
-        :param log: A string describing the event.
+        :param log: A string describing the event, optionally a %-style format string for `args`.
+        :param args: [optional] values for `log`, only formatted if the record is written out.
+        :param asset: [optional] nickname of the asset the event concerns.
         :return: None
         """
-        self.lines.append(self.logger_pprint.log((severity, log)))
-        if severity == LoggingSeverities.CRITICAL or severity == LoggingSeverities.SEVERE:
-            _log = "\n".join(self.lines)
-            raise self.CriticalLogRecievedError(_log)
+        _fatal = severity == LoggingSeverities.CRITICAL or severity == LoggingSeverities.SEVERE
+        _settings = self.context.settings
+        _min_severity = _settings.get("logging.min_severity", AbstractLogger.min_severity)
+        if not _fatal and SEVERITY_RANK[severity] < SEVERITY_RANK[_min_severity]:
+            return
+        _record = (time.time(), severity, asset, log, args)
+        for sink in _settings.get("logging.sinks", AbstractLogger.sinks):
+            sink.emit(type(self).__name__, _record)
+        if _settings.get("logging.stream", AbstractLogger.stream) and not _fatal:
+            sys.stdout.write(self._format(_record) + "\n")
+            return
+        self.records.append(_record)
+        if _fatal:
+            raise self.CriticalLogRecievedError("\n".join(self.lines))
 
     def output(self, filename: str = None, flush: bool = True) -> None:
         """
-        output the currently stored logging data in `self.lines` to a file of the given filename.
+        output the currently stored logging data in `self.records` to a file of the given filename.
         If no filename is given, send to `stdout`.
 
-        :param filename: [optional] name of the file to write log output too. stdout if not specified.
-        :param flush: [optional] whether to flush the `self.lines` list once output.
+        :param filename: [optional] name of the file to append log output to. stdout if not specified.
+        :param flush: [optional] whether to flush the `self.records` list once output.
         :return: None
         """
-        _sep = "\n\n" if len(self.lines) > 0 else ""
-        _log = "\n".join(self.lines) + _sep
         if filename:
-            fd = open(filename)
+            fd = open(filename, 'a')
         else:
             fd = sys.stdout
-        fd.write(_log)
+        for record in self.records:
+            fd.write(self._format(record) + "\n")
+        if len(self.records) > 0:
+            fd.write("\n")
         if fd is not sys.stdout:
             fd.close()
         if flush:
-            self.lines = []
+            self.records = []
@@ -0,0 +1,139 @@
+from __future__ import annotations
+import json
+import os
+import stat
+import time
+import zlib
+
+import framework.phase_logger as logger
+import framework.context as context
+import framework.conf.mod_config as mod_config
+import framework.packaging.packaging_meta_classes as packaging_meta
+import framework.packaging.zip_writer as zip_writer
+import framework.asset.build.scheduler as scheduler
+import framework.asset.atlas.atlas as atlas
+import framework.lazy as lazy
+
+futures = lazy.lazy_import("concurrent.futures")
+
+MOD_ROOT_PATH = 'mod/'
+MOD_SOURCES_PATH = 'mod/build/'
+MOD_INFO_FILENAME = 'info.json'
+FALLBACK_PACKAGE_DIR = 'mod/build/dist/'
+DEFAULT_COMPRESS_LEVEL = 6
+
+
+class ModPackager(metaclass=packaging_meta.ModPackagerSingletonManager):
+    """
+    Packages the built mod as `<name>_<version>.zip` into `factorio_dirs.mods_path`. `info.json` is written from
+    the `info` block of the mod config, and everything under `mod/` except the `mod/build/` sources goes into the
+    archive beneath a `<name>_<version>/` folder, as Factorio expects. Sprites the AtlasBuilder packed into
+    sheets are left out.
+
+    Entries are deflated in parallel on a thread pool (zlib releases the GIL) sized by `build.jobs` (in the
+    calling thread for a single job), or stored as-is when `zip_options.store_only` is set. With
+    `zip_options.refresh_only`, entries whose content is unchanged since the previous archive are copied across
+    still compressed instead of being deflated again.
+
+    ## Instance Methods:
+        * self.package()
+
+    ## Instance Vars:
+        * self.archive_path
+        * self.reused
+        * self.compressed
+    """
+    def __init__(self) -> None:
+        self.config = mod_config.ModConfigLoader()
+        self.logger = logger.AssetOutputPhaseLogger()
+        self.info: dict = self.config.config_dict["info"]
+        self.package_name = f"{self.info['name']}_{self.info['version']}"
+        self.store_only = bool(self.config.build_option("zip_options.store_only", False))
+        self.refresh_only = bool(self.config.build_option("zip_options.refresh_only", False))
+        self.compress_level = int(self.config.build_option("zip_options.compress_level", DEFAULT_COMPRESS_LEVEL))
+        self.workers = scheduler.resolve_worker_count(self.config.build_option("jobs", 1))
+
+        _mods_path = self.config.build_option("factorio_dirs.mods_path", "")
+        if not _mods_path or not os.path.isdir(_mods_path):
+            _fallback = context.path(FALLBACK_PACKAGE_DIR)
+            self.logger.log(
+                logger.LoggingSeverities.MEDIUM,
+                f"Factorio mods_path {_mods_path!r} does not exist, packaging into {_fallback} instead."
+            )
+            _mods_path = _fallback
+            os.makedirs(_mods_path, exist_ok=True)
+        self.archive_path: str = os.path.join(_mods_path, self.package_name + ".zip")
+        self.reused: int = 0
+        self.compressed: int = 0
+
+        if self.config.build_option("zip_options.enabled", True):
+            self.package()
+
+    def write_info(self) -> bytes:
+        _info = json.dumps(self.info, indent=2).encode("utf-8") + b"\n"
+        with open(context.path(MOD_ROOT_PATH, MOD_INFO_FILENAME), 'wb') as h:
+            h.write(_info)
+        return _info
+
+    def _source_files(self) -> list[tuple[str, str]]:
+        """
+        :return: (path on disk, name in the archive) for every packaged file, in a stable order.
+        """
+        _files = []
+        _sources = os.path.normpath(context.path(MOD_SOURCES_PATH))
+        _packed = atlas.AtlasBuilder().packed_paths
+        for directory, subdirectories, filenames in os.walk(context.path(MOD_ROOT_PATH)):
+            if os.path.normpath(directory) == _sources:
+                subdirectories.clear()
+                continue
+            subdirectories.sort()
+            for filename in sorted(filenames):
+                _path = os.path.join(directory, filename)
+                _relative = os.path.relpath(_path, context.path(MOD_ROOT_PATH)).replace(os.sep, "/")
+                if _relative == MOD_INFO_FILENAME or os.path.normpath(_path) in _packed:
+                    continue
+                _files.append((_path, f"{self.package_name}/{_relative}"))
+        return _files
+
+    def package(self) -> None:
+        _previous = {}
+        if self.refresh_only and os.path.exists(self.archive_path):
+            _previous = zip_writer.read_raw_entries(self.archive_path)
+        _method = zip_writer.ZIP_STORED if self.store_only else zip_writer.ZIP_DEFLATED
+
+        _info = self.write_info()
+        _contents = [(None, f"{self.package_name}/{MOD_INFO_FILENAME}")] + self._source_files()
+
+        def encode(item: tuple[str | None, str]) -> zip_writer.ZipEntry:
+            _path, _name = item
+            if _path is None:
+                _content, _mtime, _mode = _info, time.time(), stat.S_IFREG | 0o644
+            else:
+                with open(_path, 'rb') as h:
+                    _content = h.read()
+                _stat = os.stat(_path)
+                _mtime, _mode = _stat.st_mtime, _stat.st_mode
+            _old = _previous.get(_name)
+            if _old is not None and _old.method == _method and _old.size == len(_content) \
+                    and _old.crc == zlib.crc32(_content):
+                _old.mtime, _old.mode = _mtime, _mode
+                return _old
+            return zip_writer.compress_entry(_name, _content, self.store_only, self.compress_level, _mtime, _mode)
+
+        if self.workers > 1:
+            with futures.ThreadPoolExecutor(max_workers=self.workers) as pool:
+                _entries = list(pool.map(encode, _contents))
+        else:
+            _entries = [encode(item) for item in _contents]
+        self.reused = len([entry for entry in _entries if entry.name in _previous.keys()
+                           and entry is _previous[entry.name]])
+        self.compressed = len(_entries) - self.reused
+
+        _tmp_path = self.archive_path + ".tmp"
+        zip_writer.write_archive(_tmp_path, _entries)
+        os.replace(_tmp_path, self.archive_path)
+        self.logger.log(
+            logger.LoggingSeverities.LOW,
+            f"Packaged {len(_entries)} entries into {self.archive_path} "
+            f"({self.compressed} {'stored' if self.store_only else 'deflated'}, {self.reused} reused)."
+        )
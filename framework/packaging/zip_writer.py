@@ -0,0 +1,109 @@
+from __future__ import annotations
+import struct
+import time
+import zipfile
+import zlib
+
+ZIP_STORED = zipfile.ZIP_STORED
+ZIP_DEFLATED = zipfile.ZIP_DEFLATED
+ZIP_VERSION = 20
+ZIP_UTF8_FLAG = 0x800
+ZIP32_LIMIT = 0xFFFFFFFF
+ZIP16_LIMIT = 0xFFFF
+
+LOCAL_HEADER = struct.Struct("<4sHHHHHLLLHH")
+CENTRAL_HEADER = struct.Struct("<4sHHHHHHLLLHHHHHLL")
+END_OF_CENTRAL_DIRECTORY = struct.Struct("<4sHHHHLLH")
+
+
+class ZipEntry:
+    """
+    One archive member, held in its final (stored or raw deflate) form so it can be produced on any thread, or
+    copied verbatim out of a previous archive.
+    """
+    __slots__ = ("name", "method", "crc", "size", "data", "mtime", "mode")
+
+    def __init__(self, name: str, method: int, crc: int, size: int, data: bytes, mtime: float, mode: int) -> None:
+        self.name = name
+        self.method = method
+        self.crc = crc
+        self.size = size
+        self.data = data
+        self.mtime = mtime
+        self.mode = mode
+
+
+def compress_entry(name: str, content: bytes, store_only: bool, level: int, mtime: float, mode: int) -> ZipEntry:
+    """
+    Build a ZipEntry from uncompressed content. zlib releases the GIL, so this scales across a thread pool.
+    """
+    _crc = zlib.crc32(content)
+    if store_only:
+        return ZipEntry(name, ZIP_STORED, _crc, len(content), content, mtime, mode)
+    _deflate = zlib.compressobj(level, zlib.DEFLATED, -15)
+    _data = _deflate.compress(content) + _deflate.flush()
+    return ZipEntry(name, ZIP_DEFLATED, _crc, len(content), _data, mtime, mode)
+
+
+def read_raw_entries(path: str) -> dict[str, ZipEntry]:
+    """
+    Every member of an existing archive with its data still compressed, keyed by name.
+    """
+    _entries = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as h:
+        for info in archive.infolist():
+            h.seek(info.header_offset)
+            _header = LOCAL_HEADER.unpack(h.read(LOCAL_HEADER.size))
+            h.seek(_header[9] + _header[10], 1)
+            _entries[info.filename] = ZipEntry(
+                info.filename,
+                info.compress_type,
+                info.CRC,
+                info.file_size,
+                h.read(info.compress_size),
+                time.mktime(info.date_time + (0, 0, -1)),
+                (info.external_attr >> 16) & 0xFFFF
+            )
+    return _entries
+
+
+def _dos_time(mtime: float) -> tuple[int, int]:
+    _t = time.localtime(max(mtime, 315532800))  # the dos epoch is 1980
+    return (_t.tm_hour << 11) | (_t.tm_min << 5) | (_t.tm_sec // 2), \
+        ((_t.tm_year - 1980) << 9) | (_t.tm_mon << 5) | _t.tm_mday
+
+
+def write_archive(path: str, entries: list[ZipEntry]) -> None:
+    """
+    Write a plain (non zip64) archive of already encoded entries.
+
+    :raises ValueError: when an entry, the entry count or the central directory does not fit the zip32 fields.
+    """
+    if len(entries) > ZIP16_LIMIT:
+        raise ValueError(f"{len(entries)} entries do not fit a zip32 archive.")
+    _central = []
+    with open(path, 'wb') as h:
+        for entry in entries:
+            if len(entry.data) > ZIP32_LIMIT or entry.size > ZIP32_LIMIT or h.tell() > ZIP32_LIMIT:
+                raise ValueError(f"{entry.name} does not fit a zip32 archive.")
+            _name = entry.name.encode("utf-8")
+            _time, _date = _dos_time(entry.mtime)
+            _offset = h.tell()
+            h.write(LOCAL_HEADER.pack(
+                b"PK\x03\x04", ZIP_VERSION, ZIP_UTF8_FLAG, entry.method, _time, _date,
+                entry.crc, len(entry.data), entry.size, len(_name), 0
+            ))
+            h.write(_name)
+            h.write(entry.data)
+            _central.append(CENTRAL_HEADER.pack(
+                b"PK\x01\x02", ZIP_VERSION, ZIP_VERSION, ZIP_UTF8_FLAG, entry.method, _time, _date,
+                entry.crc, len(entry.data), entry.size, len(_name), 0, 0, 0, 0, entry.mode << 16, _offset
+            ) + _name)
+        _central_offset = h.tell()
+        for record in _central:
+            h.write(record)
+        if _central_offset > ZIP32_LIMIT or h.tell() - _central_offset > ZIP32_LIMIT:
+            raise ValueError(f"The central directory of {path} does not fit a zip32 archive.")
+        h.write(END_OF_CENTRAL_DIRECTORY.pack(
+            b"PK\x05\x06", 0, 0, len(entries), len(entries), h.tell() - _central_offset, _central_offset, 0
+        ))
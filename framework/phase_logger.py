@@ -1,3 +1,4 @@
+import framework.context
 import framework.meta
 from framework.meta import *
 
@@ -6,6 +7,21 @@ SEVERITIES = framework.meta.LoggingSeverities
 COLOURS = framework.meta.LoggingColours
 
 
+def configure_logging(min_severity: str = None, stream: bool = None, jsonl: str = None) -> None:
+    """
+    Apply the `build.logging` settings of the mod config to every phase logger of the current BuildContext.
+
+    :param min_severity: [optional] name of the lowest LoggingSeverities member that is recorded, e.g. "LOW".
+    :param stream: [optional] write records as they are logged instead of buffering them until `output()`.
+    :param jsonl: [optional] path of a json-lines file that receives every recorded event.
+    """
+    AbstractLogger.configure(
+        min_severity=SEVERITIES[min_severity.upper()] if min_severity else None,
+        stream=stream,
+        sinks=[framework.meta.JsonLinesSink(framework.context.path(jsonl))] if jsonl else None
+    )
+
+
 class AssetLoadPhaseLogger(AbstractLogger, metaclass=AssetLoadPhaseLoggerSingletonManager):
     def __init__(self):
         super().__init__()
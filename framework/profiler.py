@@ -0,0 +1,150 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from threading import Lock
+import csv
+import json
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from framework.meta import BuildProfilerSingletonManager
+import framework.conf.mod_config as mod_config
+import framework.context as context
+
+DEFAULT_REPORT_PATH = 'mod/build/.profile/profile.json'
+DEFAULT_TOP_N = 10
+REPORT_FIELDS = ["asset", "stage", "wall_s", "cpu_s", "peak_rss_kb", "pid"]
+
+
+def peak_rss_kb() -> int | None:
+    """
+    High-water mark of the process' resident set size in KiB, or None where the platform does not report it.
+    """
+    if resource is None:
+        return None
+    _peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, linux reports KiB
+    return _peak // 1024 if sys.platform == "darwin" else _peak
+
+
+class StageTimer:
+    """
+    Measures one stage of one asset: wall time, CPU time of the calling thread and peak RSS when it finishes.
+    Usable without the profiler singleton, so worker processes can time their own stages and send the records back.
+    """
+    def __init__(self, asset: str, stage: str) -> None:
+        self.asset = asset
+        self.stage = stage
+        self.record: dict | None = None
+
+    def __enter__(self) -> StageTimer:
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.record = {
+            "asset": self.asset,
+            "stage": self.stage,
+            "wall_s": time.perf_counter() - self._wall,
+            "cpu_s": time.thread_time() - self._cpu,
+            "peak_rss_kb": peak_rss_kb(),
+            "pid": os.getpid()
+        }
+
+
+class BuildProfiler(metaclass=BuildProfilerSingletonManager):
+    """
+    Collects per-asset, per-stage timings across the build phases: yaml parsing, source loads, every on_load
+    operation, composite jobs and saves. Writes them as a JSON or CSV report and prints a top-N slowest summary
+    alongside the phase logger output.
+
+    ## Instance Methods:
+        * self.stage()
+        * self.extend()
+        * self.write_report()
+        * self.output()
+
+    ## Instance Vars:
+        * self.enabled
+        * self.records
+    """
+    enabled: bool = None
+    records: list[dict] = None
+
+    def __init__(self) -> None:
+        _config = mod_config.ModConfigLoader()
+        self.enabled = bool(_config.build_option("profile.enabled", False))
+        self.report_path = context.path(_config.build_option("profile.report", DEFAULT_REPORT_PATH))
+        self.top_n = int(_config.build_option("profile.top", DEFAULT_TOP_N))
+        self.records = []
+        self._lock = Lock()
+
+    @contextmanager
+    def stage(self, asset: str, stage: str):
+        if not self.enabled:
+            yield
+            return
+        _timer = StageTimer(asset, stage)
+        with _timer:
+            yield
+        self.extend([_timer.record])
+
+    def extend(self, records: list[dict]) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self.records.extend(records)
+
+    def write_report(self, path: str | None = None) -> None:
+        """
+        :param path: [optional] report file, `.csv` for CSV and anything else for JSON. Defaults to
+            `build.profile.report`.
+        """
+        if not self.enabled:
+            return
+        _path = path if path is not None else self.report_path
+        os.makedirs(os.path.dirname(_path) or ".", exist_ok=True)
+        with open(_path, 'w', newline="") as h:
+            if _path.endswith(".csv"):
+                _writer = csv.DictWriter(h, fieldnames=REPORT_FIELDS)
+                _writer.writeheader()
+                _writer.writerows(self.records)
+            else:
+                json.dump({"records": self.records, "totals": self.stage_totals()}, h, indent=1)
+
+    def stage_totals(self) -> dict:
+        _totals = {}
+        for record in self.records:
+            _total = _totals.setdefault(record["stage"], {"count": 0, "wall_s": 0.0, "cpu_s": 0.0})
+            _total["count"] += 1
+            _total["wall_s"] += record["wall_s"]
+            _total["cpu_s"] += record["cpu_s"]
+        return _totals
+
+    def output(self, filename: str = None) -> None:
+        """
+        Write the per-stage totals and the top-N slowest records, to a file of the given filename or `stdout`.
+        """
+        if not self.enabled:
+            return
+        _lines = ["Build profile, totals per stage:"]
+        for stage, total in sorted(self.stage_totals().items(), key=lambda item: -item[1]["wall_s"]):
+            _lines.append(f"  {stage:<16} x{total['count']:<5} wall {total['wall_s']:.4f}s cpu {total['cpu_s']:.4f}s")
+        _lines.append(f"Top {self.top_n} slowest:")
+        for record in sorted(self.records, key=lambda rec: -rec["wall_s"])[:self.top_n]:
+            _lines.append(
+                f"  {record['asset']:<40} {record['stage']:<16} wall {record['wall_s']:.4f}s "
+                f"cpu {record['cpu_s']:.4f}s peak rss {record['peak_rss_kb']} KiB"
+            )
+        _log = "\n".join(_lines) + "\n\n"
+        if filename:
+            with open(filename, 'w') as fd:
+                fd.write(_log)
+        else:
+            sys.stdout.write(_log)
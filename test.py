@@ -1,13 +1,16 @@
 import framework.asset.asset
 import framework.phase_logger
+import framework.profiler
 
-_inst = framework.asset.asset.Assets()
-# _inst.triggers.save_test_images()
-_inst.dispose()
-
-_inst.load.logger.output()
-framework.phase_logger.AssetModifyPhaseLogger().output()
-_inst.manager.logger.output()
-_inst.build.logger.output()
 
+if __name__ == "__main__":
+    # guarded so worker processes spawned by the build scheduler do not re-run the build on import
+    _inst = framework.asset.asset.Assets()
+    # _inst.triggers.save_test_images()
+    _inst.dispose()
 
+    _inst.load.logger.output()
+    framework.phase_logger.AssetModifyPhaseLogger().output()
+    _inst.manager.logger.output()
+    _inst.build.logger.output()
+    framework.profiler.BuildProfiler().output()
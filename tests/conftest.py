@@ -0,0 +1,34 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def mod_root(tmp_path):
+    """
+    Copies the repo's mod project (mod-config.yml and mod/, without caches or packages) into a new directory.
+    """
+    _count = 0
+
+    def copy() -> str:
+        nonlocal _count
+        _count += 1
+        _root = tmp_path / f"root{_count}"
+        _root.mkdir()
+        shutil.copy(os.path.join(REPO_ROOT, "mod-config.yml"), _root)
+        shutil.copytree(
+            os.path.join(REPO_ROOT, "mod"), _root / "mod", ignore=shutil.ignore_patterns(".cache", ".profile", "dist")
+        )
+        return str(_root)
+    return copy
+
+
+def run_framework(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-m", "framework", *args], cwd=REPO_ROOT, check=True, capture_output=True, text=True
+    )
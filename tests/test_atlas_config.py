@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+import framework.asset.load.compiler as compiler
+import framework.context as context
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _conf(outputs: dict) -> dict:
+    return {
+        "load": {
+            "roadbase": {
+                "path": "tiles/graphics/base/roadbase.png",
+                "licensing": {"license": "CC 1.0", "attribution": "test", "url": "$mod.homepage$"}
+            }
+        },
+        "build": {
+            "t": {
+                "use": "load.roadbase",
+                "outputs": {"filetype": "png", "dir": "graphics/test/", "name": "t", **outputs},
+                "jobs": [{"composite-with": {"asset": "load.roadbase", "mask": "none"}}]
+            }
+        }
+    }
+
+
+@pytest.mark.parametrize("variants", [{"resolutions": {"hr": 1, "normal": 0.5}}, {"mipmaps": 3}])
+def test_atlas_rejects_resolution_and_mipmap_variants(variants):
+    with context.BuildContext(REPO_ROOT):
+        with pytest.raises(compiler.AssetsConfigCompiler.InvalidAssetsConfigError, match="build.t.outputs.atlas"):
+            compiler.AssetsConfigCompiler(_conf({"atlas": "grp", **variants}))
+
+
+def test_atlas_and_variants_compile_on_their_own():
+    with context.BuildContext(REPO_ROOT):
+        _compiled = compiler.AssetsConfigCompiler(_conf({"atlas": "grp"}))
+        assert _compiled.build["t"].atlas == "grp"
+        _compiled = compiler.AssetsConfigCompiler(_conf({"resolutions": {"hr": 1, "normal": 0.5}, "mipmaps": 3}))
+        assert _compiled.build["t"].mipmaps == 3
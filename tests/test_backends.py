@@ -0,0 +1,67 @@
+import os
+
+import pytest
+from PIL import Image
+
+import framework.asset.backend.backends as backends
+
+pytest.importorskip("numpy")
+
+SIZE = (96, 64)
+
+
+def _random(mode: str, size: tuple[int, int] = SIZE) -> Image.Image:
+    return Image.frombytes(mode, size, os.urandom(size[0] * size[1] * len(mode)))
+
+
+def _sparse() -> Image.Image:
+    _canvas = Image.new('RGBA', SIZE)
+    _canvas.paste(_random('RGBA', (17, 11)), (40, 30))
+    return _canvas
+
+
+def _hard_alpha() -> Image.Image:
+    # only fully transparent and fully opaque pixels, the ends of the fixed point tables
+    _image = _random('RGBA')
+    _image.putalpha(_random('L').point(lambda value: 255 if value >= 128 else 0))
+    return _image
+
+
+OVERLAYS = {
+    "random": lambda: _random('RGBA'),
+    "sparse": _sparse,
+    "hard_alpha": _hard_alpha,
+    "transparent": lambda: Image.new('RGBA', SIZE)
+}
+MASKS = {"none": lambda: None, "l": lambda: _random('L'), "rgba": lambda: _random('RGBA')}
+
+
+@pytest.mark.parametrize("roi", [False, True])
+@pytest.mark.parametrize("mask", MASKS.keys())
+def test_numpy_composite_many_matches_pillow(mask, roi):
+    _base = _random('RGBA')
+    _layers = [(make(), MASKS[mask]()) for make in OVERLAYS.values()]
+    _pillow = backends.PillowBackend(roi).composite_many(_base, _layers)
+    _numpy = backends.NumpyBackend(roi).composite_many(_base, _layers)
+    assert len(_numpy) == len(_pillow)
+    for name, expected, actual in zip(OVERLAYS.keys(), _pillow, _numpy):
+        assert actual.mode == expected.mode and actual.size == expected.size, name
+        assert actual.tobytes() == expected.tobytes(), name
+
+
+def test_numpy_composite_many_matches_pillow_with_mixed_masks():
+    _base = _random('RGBA')
+    _layers = [(_random('RGBA'), None), (_sparse(), _random('L')), (Image.new('RGBA', SIZE), None)]
+    _pillow = backends.PillowBackend().composite_many(_base, _layers)
+    _numpy = backends.NumpyBackend().composite_many(_base, _layers)
+    assert [image.tobytes() for image in _numpy] == [image.tobytes() for image in _pillow]
+
+
+@pytest.mark.parametrize("mode", ['RGBA', 'RGB'])
+@pytest.mark.parametrize("size", [(96, 64), (100, 70), (17, 5)])
+def test_numpy_tile_matches_pillow(mode, size):
+    _source = _random(mode, (37, 23))
+    _pillow = backends.PillowBackend().tile(_source, size)
+    _numpy = backends.NumpyBackend().tile(_source, size)
+    assert _numpy.mode == _pillow.mode and _numpy.size == _pillow.size
+    assert _numpy.tobytes() == _pillow.tobytes()
@@ -0,0 +1,66 @@
+import pytest
+from PIL import ImageChops, ImageStat
+
+import framework.asset.asset_load as loader
+import framework.asset.asset_on_load as asset_on_load
+import framework.asset.load.compiler as compiler
+import framework.asset.on_load.planner as planner
+import framework.context as context
+import framework.phase_logger as logger
+
+from conftest import REPO_ROOT
+
+SOURCES = {
+    "roadbase": "tiles/graphics/base/roadbase.png",
+    # hard alpha edges, where the fused resample differs most
+    "line": "tiles/graphics/base/line-solid-64.png"
+}
+
+
+def _entry(path: str, on_load: dict) -> compiler.LoadEntry:
+    _compiled = compiler.AssetsConfigCompiler({"load": {"asset": {
+        "path": path,
+        "on_load": on_load,
+        "licensing": {"license": "CC 1.0", "attribution": "test", "url": "$mod.homepage$"}
+    }}})
+    return _compiled.load["asset"]
+
+
+def _both_ways(path: str, on_load: dict):
+    """
+    The on_load recipe applied step by step, then through the FusedOnLoadPlan.
+    """
+    _asset = loader.LoadAsset(_entry(path, on_load))
+    _logger = logger.AssetModifyPhaseLogger()
+    _stepwise = _asset.image
+    for op in _asset.operations:
+        _stepwise = asset_on_load.ImageManipulatorFactory(_asset, op, _stepwise, _logger).get_modified_image()
+    _fused = planner.FusedOnLoadPlan(_asset.operations).execute(_asset, _asset.image, _logger)
+    return _stepwise, _fused
+
+
+@pytest.mark.parametrize("source", SOURCES.keys())
+@pytest.mark.parametrize("size, degrees", [("512x512", 30), ("256x256", 45), ("1024x1024", 10)])
+def test_fused_scale_rotate_stays_within_tolerance(source, size, degrees):
+    with context.BuildContext(REPO_ROOT):
+        _stepwise, _fused = _both_ways(SOURCES[source], {
+            "scale": {"order": 1, "amount": {"until_resolution": size}},
+            "rotate": {"order": 2, "amount": {"by_value": [degrees]}}
+        })
+    assert _fused.size == _stepwise.size
+    assert _fused.mode == _stepwise.mode
+    # the bound is per channel, an average over them would hide the colour channels behind an unchanged alpha
+    _means = ImageStat.Stat(ImageChops.difference(_stepwise, _fused)).mean
+    assert max(_means) < planner.FUSED_RESAMPLE_TOLERANCE
+
+
+@pytest.mark.parametrize("source", SOURCES.keys())
+@pytest.mark.parametrize("on_load", [
+    {"scale": {"order": 1, "amount": {"until_resolution": "512x512"}}},
+    {"rotate": {"order": 1, "amount": {"by_value": [30]}}}
+])
+def test_lone_scale_or_rotate_is_identical(source, on_load):
+    with context.BuildContext(REPO_ROOT):
+        _stepwise, _fused = _both_ways(SOURCES[source], on_load)
+    assert _fused.size == _stepwise.size
+    assert _fused.tobytes() == _stepwise.tobytes()
@@ -0,0 +1,12 @@
+import glob
+import os
+
+from conftest import run_framework
+
+
+def test_two_roots_build_in_one_process(mod_root):
+    _roots = [mod_root(), mod_root()]
+    # the roots are built on threads of one process, which first touch the lazily imported modules together
+    run_framework("--root", _roots[0], "--root", _roots[1], "build")
+    for root in _roots:
+        assert len(glob.glob(os.path.join(root, "mod", "build", "dist", "*.zip"))) == 1
@@ -0,0 +1,25 @@
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import zipfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_package_of_another_root_leaves_out_mod_build(tmp_path):
+    shutil.copy(os.path.join(REPO_ROOT, "mod-config.yml"), tmp_path)
+    shutil.copytree(os.path.join(REPO_ROOT, "mod"), tmp_path / "mod", ignore=shutil.ignore_patterns("dist"))
+    # built twice, so the first archive in mod/build/dist/ is there to be picked up by the second
+    for _ in range(2):
+        subprocess.run(
+            [sys.executable, "-m", "framework", "--root", str(tmp_path), "build"],
+            cwd=REPO_ROOT, check=True, capture_output=True
+        )
+    _archives = glob.glob(str(tmp_path / "mod" / "build" / "dist" / "*.zip"))
+    assert len(_archives) == 1
+    with zipfile.ZipFile(_archives[0]) as archive:
+        _names = archive.namelist()
+    assert any(name.endswith("/info.json") for name in _names)
+    assert [name for name in _names if name.split("/")[1] == "build"] == []
@@ -0,0 +1,28 @@
+import os
+import shutil
+
+from conftest import run_framework
+
+
+def _outputs(root: str) -> dict[str, bytes]:
+    _built = os.path.join(root, "mod", "assets")
+    _files = {}
+    for directory, _, filenames in os.walk(_built):
+        for filename in filenames:
+            _path = os.path.join(directory, filename)
+            with open(_path, 'rb') as h:
+                _files[os.path.relpath(_path, _built)] = h.read()
+    return _files
+
+
+def test_parallel_build_writes_the_same_bytes_as_a_serial_one(mod_root):
+    _roots = {jobs: mod_root() for jobs in (1, 2)}
+    for jobs, root in _roots.items():
+        # every output is written by this build, none is left over from the copied tree
+        shutil.rmtree(os.path.join(root, "mod", "assets"))
+        run_framework("--root", root, "build", "--jobs", str(jobs))
+    _serial, _parallel = _outputs(_roots[1]), _outputs(_roots[2])
+    assert len(_serial) > 0
+    assert sorted(_parallel.keys()) == sorted(_serial.keys())
+    for name, content in _serial.items():
+        assert _parallel[name] == content, name